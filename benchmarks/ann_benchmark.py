@@ -0,0 +1,229 @@
+"""
+Recall / latency benchmark for the FAISS index types in rag.index.ann.
+
+Compares each index type against the exact IndexFlatIP and reports
+recall@k, p50/p99 single-query latency, build time and index bytes per
+vector. Lossy types are also measured with re-scoring of RESCORE_FACTOR * k
+candidates against the float32 vectors. A second table shows the storage
+size and recall of the embedding cache dtypes (float32 / float16 / int8).
+
+    PYTHONPATH=src python benchmarks/ann_benchmark.py --synthetic 200000
+    PYTHONPATH=src python benchmarks/ann_benchmark.py --from-cache
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+import config
+from rag.index import ann
+from rag.index.embed_cache import DTYPES, EmbeddingCache, get_cache
+
+
+def synthetic_vectors(n, dim, seed=0):
+    """Normalized vectors drawn around random cluster centres (like topics)."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(max(1, n // 500), dim)).astype("float32")
+    x = centres[rng.integers(len(centres), size=n)] + 0.5 * rng.normal(size=(n, dim))
+    x = x.astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def cached_vectors():
+    """All vectors in the embedding cache of the configured model."""
+    matrix = get_cache().vectors()
+    if matrix is None:
+        raise SystemExit("Embedding cache is empty; build an index first.")
+    return np.asarray(matrix, dtype="float32")
+
+
+def make_queries(vectors, n_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    q = vectors[rng.choice(len(vectors), n_queries, replace=False)]
+    q = q + 0.1 * rng.normal(size=q.shape).astype("float32")
+    return (q / np.linalg.norm(q, axis=1, keepdims=True)).astype("float32")
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / sum(len(t) for t in truth)
+
+
+def time_queries(index, queries, k, rescore_vectors=None):
+    """
+    Top-k ids and p50/p99 latency (ms). With rescore_vectors, fetch
+    RESCORE_FACTOR * k candidates and re-rank them by exact inner product.
+    """
+    latencies = []
+    ids = []
+    fetch_k = k * config.RESCORE_FACTOR if rescore_vectors is not None else k
+    for q in queries:
+        start = time.perf_counter()
+        _, I = index.search(q[None, :], fetch_k)
+        found = I[0]
+        if rescore_vectors is not None:
+            found = found[found >= 0]
+            exact = rescore_vectors[found] @ q
+            found = found[np.argsort(-exact)[:k]]
+        latencies.append(time.perf_counter() - start)
+        ids.append(found)
+    latencies = np.array(latencies) * 1000
+    return ids, float(np.percentile(latencies, 50)), float(
+        np.percentile(latencies, 99)
+    )
+
+
+def index_bytes(index):
+    return len(faiss.serialize_index(index)) / max(index.ntotal, 1)
+
+
+def run(vectors, index_types, k=10, n_queries=500, nprobes=(), ef_searches=()):
+    dim = vectors.shape[1]
+    queries = make_queries(vectors, n_queries)
+    # force the ANN types even on small benchmark corpora
+    config.ANN_MIN_VECTORS = 0
+
+    exact = faiss.IndexFlatIP(dim)
+    exact.add(vectors)
+    truth, p50, p99 = time_queries(exact, queries, k)
+    rows = [
+        {
+            "type": "flat",
+            "param": "",
+            "recall": 1.0,
+            "p50_ms": p50,
+            "p99_ms": p99,
+            "build_s": 0.0,
+            "bytes_per_vector": index_bytes(exact),
+        }
+    ]
+
+    for index_type in index_types:
+        if index_type == "flat":
+            continue
+        start = time.perf_counter()
+        index = ann.make_index(dim, vectors, index_type)
+        index.add(vectors)
+        build_s = time.perf_counter() - start
+
+        if index_type == "hnsw":
+            settings = [("efSearch", ef) for ef in ef_searches or [config.HNSW_EF_SEARCH]]
+        elif index_type in ann.IVF_TYPES:
+            settings = [("nprobe", n) for n in nprobes or [config.IVF_NPROBE]]
+        else:
+            settings = [("", None)]
+        rescore_options = [False, True] if index_type in ann.LOSSY_TYPES else [False]
+        for param, value in settings:
+            if param == "nprobe":
+                ann.configure_search(index, nprobe=value)
+            elif param == "efSearch":
+                ann.configure_search(index, ef_search=value)
+            for rescore in rescore_options:
+                found, p50, p99 = time_queries(
+                    index, queries, k, vectors if rescore else None
+                )
+                label = f"{param}={value}" if param else ""
+                rows.append(
+                    {
+                        "type": index_type,
+                        "param": label + ("+rescore" if rescore else ""),
+                        "recall": recall_at_k(found, truth),
+                        "p50_ms": p50,
+                        "p99_ms": p99,
+                        "build_s": build_s,
+                        "bytes_per_vector": index_bytes(index),
+                    }
+                )
+    return rows
+
+
+def run_cache_dtypes(vectors, k=10, n_queries=500):
+    """Bytes per vector and flat-search recall of each embedding cache dtype."""
+    queries = make_queries(vectors, n_queries)
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    keys = [str(i) for i in range(len(vectors))]
+    for dtype in DTYPES:
+        cache = EmbeddingCache("bench", tempfile.mkdtemp(), dtype=dtype)
+        start = time.perf_counter()
+        cache.add(keys, vectors)
+        write_s = time.perf_counter() - start
+        stored = np.ascontiguousarray(cache.vectors(), dtype="float32")
+        index = faiss.IndexFlatIP(stored.shape[1])
+        index.add(stored)
+        _, found = index.search(queries, k)
+        rows.append(
+            {
+                "dtype": dtype,
+                "bytes_per_vector": cache.bytes_per_vector,
+                "recall": recall_at_k(found, truth),
+                "max_abs_error": float(np.abs(stored - vectors).max()),
+                "write_s": write_s,
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--synthetic", type=int, help="number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--from-cache", action="store_true")
+    parser.add_argument("--types", default=",".join(ann.INDEX_TYPES))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--nprobe", default="4,16,64")
+    parser.add_argument("--ef-search", default="32,64,128")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.from_cache:
+        vectors = cached_vectors()
+    else:
+        vectors = synthetic_vectors(args.synthetic or 100_000, args.dim)
+    print(f"Benchmarking on {vectors.shape[0]} x {vectors.shape[1]} vectors")
+
+    rows = run(
+        vectors,
+        args.types.split(","),
+        k=args.k,
+        n_queries=min(args.queries, len(vectors)),
+        nprobes=[int(x) for x in args.nprobe.split(",") if x],
+        ef_searches=[int(x) for x in args.ef_search.split(",") if x],
+    )
+
+    cache_rows = run_cache_dtypes(
+        vectors, k=args.k, n_queries=min(args.queries, len(vectors))
+    )
+
+    print(
+        f"{'type':<10}{'param':<22}{'recall@' + str(args.k):>10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'build s':>10}{'bytes':>8}"
+    )
+    for r in rows:
+        print(
+            f"{r['type']:<10}{r['param']:<22}{r['recall']:>10.3f}"
+            f"{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['build_s']:>10.1f}"
+            f"{r['bytes_per_vector']:>8.0f}"
+        )
+    print(f"\n{'cache':<10}{'bytes':>8}{'recall@' + str(args.k):>10}{'max err':>10}")
+    for r in cache_rows:
+        print(
+            f"{r['dtype']:<10}{r['bytes_per_vector']:>8}{r['recall']:>10.3f}"
+            f"{r['max_abs_error']:>10.4f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"indexes": rows, "embed_cache": cache_rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Speed / fidelity benchmark for text chunking.
+
+Compares the offset-based chunker in rag.io.text_utils with the previous
+implementations (encode + decode per window, and whitespace words) and
+reports documents per second, chunk counts, chunks over the model's token
+limit (silently truncated at embed time) and chunks that are not verbatim
+slices of the source text (lossy decoding).
+
+    PYTHONPATH=src python benchmarks/chunk_benchmark.py --synthetic 500
+    PYTHONPATH=src python benchmarks/chunk_benchmark.py --from-text-cache
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+import config
+from rag.io.text_utils import chunk_texts
+from rag.models import get_tokenizer
+
+WORDS = (
+    "transformer attention retrieval embedding model layer dataset baseline "
+    "state-of-the-art fine-tuning zero-shot evaluation corpus benchmark "
+    "gradient optimisation convolutional Schrödinger naïve e.g. i.e. "
+    "BERT-based 3.5% (Table 2) [12] ≤ α-helix"
+).split()
+
+
+def synthetic_texts(n, words_per_doc=6000, seed=0):
+    """Paper-length documents of random sentences."""
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(n):
+        sentences = []
+        remaining = words_per_doc
+        while remaining > 0:
+            length = int(rng.integers(8, 30))
+            words = rng.choice(WORDS, size=length)
+            sentences.append(" ".join(words).capitalize() + ".")
+            remaining -= length
+        texts.append(" ".join(sentences))
+    return texts
+
+
+def cached_texts():
+    """Extracted PDF texts from the text cache."""
+    paths = glob.glob(os.path.join(config.TEXT_CACHE_DIR, "*", "*.txt"))
+    if not paths:
+        raise SystemExit("Text cache is empty; build the full-text index first.")
+    texts = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read())
+    return texts
+
+
+def legacy_chunk_text(text, max_tokens=300, overlap=50, tokenize=False):
+    """chunk_text before the offset-based rewrite."""
+    if tokenize:
+        tokenizer = get_tokenizer()
+        tokens = tokenizer.encode(text)
+    else:
+        tokens = text.split()
+
+    chunks = []
+    start = 0
+    while start < len(tokens):
+        end = start + max_tokens
+        chunk_tokens = tokens[start:end]
+        if tokenize:
+            chunks.append(tokenizer.decode(chunk_tokens))
+        else:
+            chunks.append(" ".join(chunk_tokens))
+        start = end - overlap
+    return chunks
+
+
+def token_counts(chunks):
+    tokenizer = get_tokenizer()
+    encoding = tokenizer(
+        chunks,
+        add_special_tokens=False,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+        truncation=False,
+        verbose=False,
+    )
+    return np.array([len(ids) for ids in encoding["input_ids"]])
+
+
+def measure(name, chunker, texts):
+    start = time.perf_counter()
+    all_chunks = chunker(texts)
+    seconds = time.perf_counter() - start
+
+    flat = [c for chunks in all_chunks for c in chunks]
+    counts = token_counts(flat) if flat else np.zeros(0)
+    verbatim = sum(c in text for text, chunks in zip(texts, all_chunks) for c in chunks)
+    return {
+        "chunker": name,
+        "docs_per_s": len(texts) / seconds,
+        "seconds": seconds,
+        "chunks": len(flat),
+        "mean_tokens": float(counts.mean()) if len(counts) else 0.0,
+        "over_limit": int(np.sum(counts > config.CHUNK_MAX_TOKENS)),
+        "not_verbatim": len(flat) - verbatim,
+    }
+
+
+def run(texts):
+    get_tokenizer()  # load the model outside the timed sections
+    chunkers = {
+        "legacy_words": lambda ts: [legacy_chunk_text(t) for t in ts],
+        "legacy_decode": lambda ts: [legacy_chunk_text(t, tokenize=True) for t in ts],
+        "offsets": lambda ts: chunk_texts(ts),
+        "offsets_sentences": lambda ts: chunk_texts(ts, sentences=True),
+    }
+    return [measure(name, fn, texts) for name, fn in chunkers.items()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--synthetic", type=int, help="number of synthetic documents")
+    parser.add_argument("--words", type=int, default=6000, help="words per document")
+    parser.add_argument("--from-text-cache", action="store_true")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.from_text_cache:
+        texts = cached_texts()
+    else:
+        texts = synthetic_texts(args.synthetic or 200, args.words)
+
+    rows = run(texts)
+    print(f"{len(texts)} documents, limit {config.CHUNK_MAX_TOKENS} tokens")
+    print(
+        f"{'chunker':<18} {'docs/s':>9} {'chunks':>8} {'tokens':>7} "
+        f"{'over':>6} {'lossy':>6}"
+    )
+    for r in rows:
+        print(
+            f"{r['chunker']:<18} {r['docs_per_s']:>9.1f} {r['chunks']:>8} "
+            f"{r['mean_tokens']:>7.1f} {r['over_limit']:>6} {r['not_verbatim']:>6}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
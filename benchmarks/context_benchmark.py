@@ -0,0 +1,134 @@
+"""
+Tokens saved by context packing, on full-text search results.
+
+A synthetic corpus (see offline.py) is indexed with the stub models, then
+every query is searched with increasing top_k_final and its results packed
+(rag.pipelines.context) twice: without a budget, which shows what merging
+overlapping chunks and dropping duplicated sentences saves on its own, and
+with ``--budget``. Reported per top_k_final, summed over queries: LLM tokens
+of the verbatim chunks and of the packed passages, and evidence retention,
+the share of the chunks' distinct sentences still present after packing.
+
+    PYTHONPATH=src python benchmarks/context_benchmark.py --papers 100
+    PYTHONPATH=src python benchmarks/context_benchmark.py --top-k 10,30 \\
+        --budget 4000 --json context.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import re
+import shutil
+
+import config
+import offline
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_SPACE = re.compile(r"\s+")
+
+
+def _normalize(text):
+    return _SPACE.sub(" ", text).strip().lower()
+
+
+def retention(results, packed):
+    """Share of the results' distinct sentences found in the packed text."""
+    packed_text = {
+        entry["paperId"]: _normalize(" ".join(entry["chunk_texts"])) for entry in packed
+    }
+    kept, total = 0, 0
+    for entry in results:
+        text = packed_text.get(entry["paperId"], "")
+        sentences = {
+            _normalize(s)
+            for chunk in entry["chunk_texts"]
+            for s in _SENTENCE.split(chunk)
+        }
+        sentences.discard("")
+        total += len(sentences)
+        kept += sum(s in text for s in sentences)
+    return kept / max(total, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--papers", type=int, default=100)
+    parser.add_argument("--words", type=int, default=3000, help="words per paper")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", default="5,10,20,40", help="top_k_final values")
+    parser.add_argument("--budget", type=int, default=config.CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--root", help="scratch directory (default: a temp dir)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    root = offline.sandbox_config(args.root)
+    offline.install_stub_models()
+
+    from rag.collections import get_collection
+    from rag.index.build_index_paper import build_chunk_index
+    from rag.index.search_paper import search_fulltext
+    from rag.pipelines.context import pack_context
+
+    rows = []
+    try:
+        corpus = offline.Corpus(args.papers, args.words, seed=args.papers)
+        papers = corpus.papers()
+        collection = get_collection("bench-context")
+        collection.store.replace(papers)
+        offline.write_pdfs(corpus, papers, config.PDF_DIR)
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_chunk_index(papers, collection=collection)
+        queries = corpus.queries(args.queries)
+
+        for top_k in (int(k) for k in args.top_k.split(",")):
+            row = {"top_k_final": top_k, "before": 0, "merged": 0, "packed": 0}
+            merged_retention, packed_retention = [], []
+            for query, _ in queries:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results = search_fulltext(
+                        query,
+                        top_k_raw=max(config.TOP_K_RAW, top_k),
+                        top_k_final=top_k,
+                        collection=collection,
+                    )
+                merged, stats = pack_context(results, budget=float("inf"))
+                row["before"] += stats["tokens_before"]
+                row["merged"] += stats["tokens_after"]
+                merged_retention.append(retention(results, merged))
+                packed, stats = pack_context(results, budget=args.budget)
+                row["packed"] += stats["tokens_after"]
+                packed_retention.append(retention(results, packed))
+            row["merged_retention"] = sum(merged_retention) / len(queries)
+            row["packed_retention"] = sum(packed_retention) / len(queries)
+            rows.append(row)
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(
+        f"{args.papers} papers, {args.queries} queries, budget {args.budget} "
+        f"tokens per query"
+    )
+    print(
+        f"{'top_k':>5} {'tokens':>8} {'merged':>8} {'saved':>6} {'kept':>6} "
+        f"{'packed':>8} {'saved':>6} {'kept':>6}"
+    )
+    for r in rows:
+        print(
+            f"{r['top_k_final']:>5} {r['before']:>8} "
+            f"{r['merged']:>8} {1 - r['merged'] / max(r['before'], 1):>6.1%} "
+            f"{r['merged_retention']:>6.1%} "
+            f"{r['packed']:>8} {1 - r['packed'] / max(r['before'], 1):>6.1%} "
+            f"{r['packed_retention']:>6.1%}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"budget": args.budget, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Candidate recall of dense vs hybrid (dense + BM25, reciprocal-rank fusion)
+retrieval at a given number of reranked pairs per query.
+
+Queries are sampled from the index itself: "keyword" queries use the rarest
+terms of a chunk (gene names, acronyms), "passage" queries a random span of
+its text. A query counts as recalled if its source paper is among the
+candidates that would be sent to the cross-encoder.
+
+    PYTHONPATH=src python benchmarks/hybrid_benchmark.py --index abs_chunk
+    PYTHONPATH=src python benchmarks/hybrid_benchmark.py --synthetic 2000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from rag.index import bm25
+from rag.index.index_manager import IndexManager, get_manager
+from rag.index.retrieval import encode_queries, fuse_hybrid
+from rag.index.streaming import stream_into_index
+
+WORDS = (
+    "cells protein expression model network training dataset accuracy tumour "
+    "signal pathway regulation learning representation benchmark attention "
+    "mutation sequencing patients cohort baseline transformer inhibition"
+).split()
+
+
+def synthetic_index(n_papers, seed=0):
+    """Temporary index of abstracts mixing common words and rare identifiers."""
+    rng = np.random.default_rng(seed)
+    manager = IndexManager(tempfile.mkdtemp())
+    chunks = []
+    for i in range(n_papers):
+        ids = [f"GENE{rng.integers(10_000)}", f"DS-{rng.integers(1_000)}k"]
+        words = list(rng.choice(WORDS, size=120)) + ids
+        rng.shuffle(words)
+        chunks.append({"paperId": f"P{i}", "chunk_id": 0, "text": " ".join(words)})
+    with manager.update("bench") as writer:
+        stream_into_index(writer, chunks)
+    return manager.get("bench")
+
+
+def make_queries(snapshot, n_queries, seed=1):
+    """(query, kind, source paperId) triples sampled from the chunk store."""
+    rng = np.random.default_rng(seed)
+    index = snapshot.keyword_index
+    df = {t: index.indptr[i + 1] - index.indptr[i] for i, t in enumerate(index.vocab)}
+    queries = []
+    for row in rng.choice(len(snapshot.store), n_queries, replace=False):
+        chunk = snapshot.store.get(row)
+        terms = sorted(set(bm25.tokenize(chunk["text"])), key=lambda t: df.get(t, 0))
+        if len(terms) < 4:
+            continue
+        common = list(rng.choice(terms[len(terms) // 2 :], 2))
+        queries.append((" ".join(terms[:2] + common), "keyword", chunk["paperId"]))
+        words = chunk["text"].split()
+        start = int(rng.integers(max(1, len(words) - 12)))
+        queries.append((" ".join(words[start : start + 12]), "passage", chunk["paperId"]))
+    return queries
+
+
+def recall(snapshot, candidate_ids, sources):
+    found = 0
+    for ids, source in zip(candidate_ids, sources):
+        found += any(c["paperId"] == source for c in snapshot.lookup(ids))
+    return found / max(len(sources), 1)
+
+
+def run(snapshot, queries, candidate_counts):
+    texts = [q for q, _, _ in queries]
+    depth = max(candidate_counts)
+
+    start = time.perf_counter()
+    embs = encode_queries(texts)
+    distances, indices = snapshot.search(embs, k=depth)
+    dense_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    keyword = snapshot.keyword_search(texts, depth)
+    keyword_seconds = time.perf_counter() - start
+
+    rows = []
+    for kind in ("keyword", "passage", "all"):
+        picked = [i for i, q in enumerate(queries) if kind in ("all", q[1])]
+        sources = [queries[i][2] for i in picked]
+        for n in candidate_counts:
+            dense = [indices[i][:n] for i in picked]
+            hybrid = [
+                fuse_hybrid(indices[i][:n], distances[i][:n], keyword[i][1][:n], n)[0]
+                for i in picked
+            ]
+            rows.append(
+                {
+                    "queries": kind,
+                    "pairs_per_query": n,
+                    "recall_dense": recall(snapshot, dense, sources),
+                    "recall_hybrid": recall(snapshot, hybrid, sources),
+                }
+            )
+    timing = {
+        "dense_ms_per_query": 1000 * dense_seconds / len(queries),
+        "bm25_ms_per_query": 1000 * keyword_seconds / len(queries),
+    }
+    return rows, timing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--index", default="abs_chunk", help="existing index name")
+    parser.add_argument("--synthetic", type=int, help="number of synthetic papers")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--candidates", default="5,10,20,50")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        snapshot = synthetic_index(args.synthetic)
+    else:
+        snapshot = get_manager().get(args.index)
+    if snapshot is None or snapshot.keyword_index is None:
+        raise SystemExit(f"Index {args.index!r} has no BM25 index; rebuild it first.")
+
+    queries = make_queries(snapshot, min(args.queries, len(snapshot.store)))
+    counts = [int(n) for n in args.candidates.split(",")]
+    rows, timing = run(snapshot, queries, counts)
+
+    print(f"{len(queries)} queries over {len(snapshot.store)} chunks")
+    print(f"{'queries':<8} {'pairs/q':>8} {'dense':>7} {'hybrid':>7}")
+    for r in rows:
+        print(
+            f"{r['queries']:<8} {r['pairs_per_query']:>8} "
+            f"{r['recall_dense']:>7.3f} {r['recall_hybrid']:>7.3f}"
+        )
+    print(
+        f"retrieval: dense {timing['dense_ms_per_query']:.2f} ms/query, "
+        f"bm25 {timing['bm25_ms_per_query']:.2f} ms/query"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"rows": rows, "timing": timing}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
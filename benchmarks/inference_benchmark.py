@@ -0,0 +1,178 @@
+"""
+Speed / fidelity benchmark for the CPU inference backends in rag.inference.
+
+Every backend embeds the same documents and reranks the same query-document
+pairs as the plain PyTorch reference. Reported per backend: texts/s and
+pairs/s (and the speedup over the reference), the mean cosine between its
+embeddings and the reference ones, the overlap of the top-10 documents
+retrieved per query, and the overlap of the top-10 reranked documents.
+Backends whose top-10 overlap drops below 1 - tolerance fail the run.
+
+    PYTHONPATH=src python benchmarks/inference_benchmark.py
+    PYTHONPATH=src python benchmarks/inference_benchmark.py \\
+        --backends torch,torch_int8,onnx_int8 --threads 4 --docs 2000
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+import config
+from rag.inference import BACKENDS, load_embedder, load_reranker
+
+WORDS = (
+    "cells protein expression model network training dataset accuracy tumour "
+    "signal pathway regulation learning representation benchmark attention "
+    "mutation sequencing patients cohort baseline transformer inhibition "
+    "retrieval embedding layer corpus evaluation gradient fine-tuning"
+).split()
+TOP = 10
+
+
+def synthetic_texts(n, min_words, max_words, seed):
+    """Texts of random words with lengths spread over [min_words, max_words]."""
+    rng = np.random.default_rng(seed)
+    return [
+        " ".join(rng.choice(WORDS, size=int(rng.integers(min_words, max_words))))
+        for _ in range(n)
+    ]
+
+
+def top_overlap(reference, scores, k=TOP):
+    """Mean fraction of each row's top-k shared with the reference row."""
+    overlap = []
+    for ref, got in zip(reference, scores):
+        a = set(np.argsort(-ref)[:k])
+        b = set(np.argsort(-got)[:k])
+        overlap.append(len(a & b) / len(a))
+    return float(np.mean(overlap))
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def run_backend(backend, docs, queries, pairs, threads, dynamic_batching):
+    embedder = load_embedder(
+        config.SENTENCE_TRANSFORMER_MODEL,
+        backend=backend,
+        threads=threads,
+        dynamic_batching=dynamic_batching,
+    )
+    reranker = load_reranker(
+        config.CROSS_ENCODER_MODEL,
+        backend=backend,
+        threads=threads,
+        dynamic_batching=dynamic_batching,
+    )
+    # warm-up outside the timed region
+    embedder.encode(docs[:8])
+    reranker.predict(pairs[:8])
+
+    doc_embs, embed_seconds = timed(
+        embedder.encode,
+        docs,
+        batch_size=config.EMBED_BATCH_SIZE,
+        normalize_embeddings=True,
+    )
+    query_embs = embedder.encode(queries, normalize_embeddings=True)
+    rerank, rerank_seconds = timed(
+        reranker.predict, pairs, batch_size=config.RERANK_BATCH_SIZE
+    )
+    return {
+        "doc_embs": np.asarray(doc_embs, dtype="float32"),
+        "query_embs": np.asarray(query_embs, dtype="float32"),
+        "rerank": np.asarray(rerank, dtype="float32").reshape(len(queries), -1),
+        "texts_per_s": len(docs) / embed_seconds,
+        "pairs_per_s": len(pairs) / rerank_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--threads", type=int, help="intra-op threads")
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="largest accepted drop in top-10 overlap with the reference",
+    )
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    docs = synthetic_texts(args.docs, 20, 300, seed=0)
+    queries = synthetic_texts(args.queries, 4, 12, seed=1)
+    rng = np.random.default_rng(2)
+    candidates = [
+        rng.choice(len(docs), args.candidates, replace=False) for _ in queries
+    ]
+    pairs = [(q, docs[i]) for q, rows in zip(queries, candidates) for i in rows]
+
+    runs = [("torch", False)]  # the reference: plain torch, fixed-size batches
+    for backend in args.backends.split(","):
+        runs.append((backend, True))
+        if backend != "torch":
+            runs.append((backend, False))
+
+    reference, rows, failed = None, [], False
+    for backend, dynamic in runs:
+        result = run_backend(backend, docs, queries, pairs, args.threads, dynamic)
+        if reference is None:
+            reference = result
+        cosine = float(np.mean(np.sum(result["doc_embs"] * reference["doc_embs"], 1)))
+        retrieval = top_overlap(
+            reference["query_embs"] @ reference["doc_embs"].T,
+            result["query_embs"] @ result["doc_embs"].T,
+        )
+        rerank = top_overlap(reference["rerank"], result["rerank"])
+        ok = min(retrieval, rerank) >= 1 - args.tolerance
+        failed |= not ok
+        rows.append(
+            {
+                "backend": backend,
+                "dynamic_batching": dynamic,
+                "texts_per_s": result["texts_per_s"],
+                "pairs_per_s": result["pairs_per_s"],
+                "embed_speedup": result["texts_per_s"] / reference["texts_per_s"],
+                "rerank_speedup": result["pairs_per_s"] / reference["pairs_per_s"],
+                "cosine": cosine,
+                "retrieval_top10": retrieval,
+                "rerank_top10": rerank,
+                "ok": ok,
+            }
+        )
+
+    print(
+        f"{len(docs)} documents, {len(pairs)} pairs, "
+        f"threads={args.threads or 'default'}"
+    )
+    print(
+        f"{'backend':<11} {'dyn':>4} {'texts/s':>8} {'x':>5} {'pairs/s':>8} "
+        f"{'x':>5} {'cosine':>7} {'ret@10':>7} {'rr@10':>6}"
+    )
+    for r in rows:
+        print(
+            f"{r['backend']:<11} {'yes' if r['dynamic_batching'] else 'no':>4} "
+            f"{r['texts_per_s']:>8.1f} {r['embed_speedup']:>5.2f} "
+            f"{r['pairs_per_s']:>8.1f} {r['rerank_speedup']:>5.2f} "
+            f"{r['cosine']:>7.4f} {r['retrieval_top10']:>7.3f} "
+            f"{r['rerank_top10']:>6.3f}{'' if r['ok'] else '  FAIL'}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+    if failed:
+        raise SystemExit(f"Ranking overlap below 1 - {args.tolerance} for some backend")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+Offline fixtures for the benchmarks: a synthetic corpus, small generated
+PDFs, deterministic stand-ins for the embedding model and cross-encoder,
+and a sandbox that points every data path in ``config`` at a scratch
+directory. Nothing here touches the network or the real data/ directory.
+
+The stub models are cheap and deterministic but behave like the real ones
+where the pipeline cares: the embedder returns normalized vectors that are
+close for texts sharing words, its tokenizer reports character offsets like
+a fast HF tokenizer, and the cross-encoder scores query-term overlap.
+StandInLLM serves the subset of the OpenAI Responses API the summarizer uses.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import numpy as np
+
+import config
+from rag.io.http import ThreadedServer
+
+SYLLABLES = (
+    "ba ce di fo gu ka le mi no pu ra se ti vo zu tra pre clo gen mol "
+    "cyt neu syn bio phy net lex ter ion ase"
+).split()
+STUB_EMBEDDER = "stub/hashing-embedder"
+STUB_RERANKER = "stub/overlap-reranker"
+
+
+# --- synthetic corpus ---
+
+
+def vocabulary(n_words, seed=0):
+    """Deterministic pseudo-words built from syllables."""
+    rng = np.random.default_rng(seed)
+    words = set()
+    while len(words) < n_words:
+        words.add("".join(rng.choice(SYLLABLES, size=int(rng.integers(2, 5)))))
+    return sorted(words)
+
+
+class Corpus:
+    """
+    Papers grouped into topics. Each topic has its own characteristic words,
+    so queries built from a paper's topic words have a known set of relevant
+    papers.
+    """
+
+    def __init__(self, n_papers, words_per_paper=3000, n_topics=None, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.n_papers = n_papers
+        self.words_per_paper = words_per_paper
+        self.n_topics = n_topics or max(4, n_papers // 25)
+        words = vocabulary(2000 + 30 * self.n_topics, seed)
+        self.rng.shuffle(words)
+        self.common = words[:2000]
+        self.topic_words = [
+            words[2000 + 30 * t : 2000 + 30 * (t + 1)] for t in range(self.n_topics)
+        ]
+        self.topics = self.rng.integers(self.n_topics, size=n_papers)
+        self.seed = seed
+
+    def sentence(self, topic, length=None):
+        length = length or int(self.rng.integers(8, 30))
+        words = np.where(
+            self.rng.random(length) < 0.3,
+            self.rng.choice(self.topic_words[topic], length),
+            self.rng.choice(self.common, length),
+        )
+        return " ".join(words).capitalize() + "."
+
+    def text(self, topic, n_words):
+        sentences, remaining = [], n_words
+        while remaining > 0:
+            sentences.append(self.sentence(topic))
+            remaining -= len(sentences[-1].split())
+        return " ".join(sentences)
+
+    def papers(self):
+        """Paper dicts shaped like the ones fetch_abs stores."""
+        papers = []
+        for i, topic in enumerate(self.topics):
+            papers.append(
+                {
+                    "paperId": f"bench{self.seed}-{i:06d}",
+                    "title": self.sentence(topic, 8).rstrip("."),
+                    "abstract": self.text(topic, int(self.rng.integers(120, 250))),
+                    "year": int(2000 + self.rng.integers(25)),
+                    "arxiv_id": None,
+                    "pdf_url": None,
+                    "topic": int(topic),
+                }
+            )
+        return papers
+
+    def full_text(self, paper):
+        body = self.text(paper["topic"], self.words_per_paper)
+        return paper["abstract"] + "\n\n" + body
+
+    def queries(self, n, seed=1):
+        """(query, topic) pairs of topic words mixed with a common word."""
+        rng = np.random.default_rng(seed)
+        queries = []
+        for _ in range(n):
+            topic = int(rng.integers(self.n_topics))
+            words = list(rng.choice(self.topic_words[topic], 4, replace=False))
+            words.insert(int(rng.integers(5)), str(rng.choice(self.common)))
+            queries.append((" ".join(words), topic))
+        return queries
+
+
+def write_pdf(path, text, title=None, chars_per_line=95, lines_per_page=70):
+    """Write text into a plain multi-page PDF with PyMuPDF."""
+    import fitz
+
+    lines, line = [], ""
+    for word in text.split():
+        if len(line) + len(word) + 1 > chars_per_line:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    if title:
+        lines = [title, ""] + lines
+
+    with fitz.open() as doc:
+        for start in range(0, len(lines), lines_per_page):
+            page = doc.new_page()
+            page.insert_text(
+                (40, 50), "\n".join(lines[start : start + lines_per_page]), fontsize=9
+            )
+        doc.save(path)
+
+
+def write_pdfs(corpus, papers, pdf_dir):
+    """One PDF per paper, named like the downloader names them."""
+    os.makedirs(pdf_dir, exist_ok=True)
+    for paper in papers:
+        path = os.path.join(pdf_dir, f"{paper['paperId']}.pdf")
+        write_pdf(path, corpus.full_text(paper), title=paper["title"])
+
+
+# --- stub models ---
+
+
+def _bucket(token, dim):
+    digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % dim
+
+
+class StubTokenizer:
+    """Word pieces of at most 4 characters with offsets, like a fast tokenizer."""
+
+    _piece = re.compile(r"\w{1,4}|[^\w\s]")
+
+    def __call__(self, texts, return_offsets_mapping=False, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        spans = [[m.span() for m in self._piece.finditer(t)] for t in texts]
+        out = {
+            "input_ids": [
+                [_bucket(t[a:b], 30000) for a, b in s] for t, s in zip(texts, spans)
+            ]
+        }
+        if return_offsets_mapping:
+            out["offset_mapping"] = spans
+        return out
+
+
+class StubEmbedder:
+    """Hashed bag of words and bigrams, normalized (a SentenceTransformer stand-in)."""
+
+    max_seq_length = 256
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.tokenizer = StubTokenizer()
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _embed(self, text):
+        v = np.zeros(self.dim, dtype="float32")
+        words = text.lower().split()[: self.max_seq_length]
+        for w in words:
+            v[_bucket(w, self.dim)] += 1.0
+        for a, b in zip(words, words[1:]):
+            v[_bucket(a + " " + b, self.dim)] += 0.5
+        return v
+
+    def encode(self, sentences, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        x = np.zeros((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            x[i] = self._embed(text)
+        if normalize_embeddings:
+            norms = np.linalg.norm(x, axis=1, keepdims=True)
+            x /= np.where(norms > 0, norms, 1)
+        return x[0] if single else x
+
+
+class StubReranker:
+    """Query-term overlap with a small length penalty (a CrossEncoder stand-in)."""
+
+    max_length = 512
+
+    def predict(self, sentences, **kwargs):
+        scores = np.empty(len(sentences), dtype="float32")
+        for i, (query, text) in enumerate(sentences):
+            terms = set(query.lower().split())
+            words = text.lower().split()
+            hits = sum(w.strip(".,") in terms for w in words)
+            scores[i] = hits / (1 + 0.01 * len(words))
+        return scores
+
+
+def install_stub_models():
+    """Register the stub models under their own names (own cache keys)."""
+    from rag import models
+
+    config.SENTENCE_TRANSFORMER_MODEL = STUB_EMBEDDER
+    config.CROSS_ENCODER_MODEL = STUB_RERANKER
+    models.set_model("embedder", StubEmbedder(), STUB_EMBEDDER)
+    models.set_model("reranker", StubReranker(), STUB_RERANKER)
+
+
+# --- local stand-in for the OpenAI Responses API ---
+
+
+class StandInLLM:
+    """
+    HTTP server answering POST /v1/responses, plain or streamed (SSE), like
+    the OpenAI Responses API. The reply is deterministic: the last words of
+    the prompt, one word per output token, about one output token per eight
+    prompt words (20..400). Each request waits `latency` seconds before the
+    first token and `token_delay` seconds per token.
+
+        with StandInLLM(latency=0.5) as llm:
+            config.OPENAI_BASE_URL = llm.base_url
+    """
+
+    def __init__(self, latency=0.5, token_delay=0.01, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadedServer((host, port), self._handler())
+        self.base_url = f"http://{host}:{self.server.server_address[1]}/v1"
+        self._thread = None
+
+    def reply(self, prompt):
+        words = prompt.split()
+        n = min(400, max(20, len(words) // 8))
+        return words[-n:]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _response(self, model, text, status="completed"):
+        return {
+            "id": "resp_standin",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": model,
+            "status": status,
+            "output": [
+                {
+                    "type": "message",
+                    "id": "msg_standin",
+                    "status": status,
+                    "role": "assistant",
+                    "content": [
+                        {"type": "output_text", "text": text, "annotations": []}
+                    ],
+                }
+            ],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+        }
+
+    def _handler(self):
+        llm = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/v1/responses":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with llm._lock:
+                    llm.requests += 1
+                prompt = body["input"]
+                if not isinstance(prompt, str):
+                    prompt = json.dumps(prompt)
+                words = llm.reply(prompt)
+                model = body.get("model", "stand-in")
+                time.sleep(llm.latency)
+
+                if not body.get("stream"):
+                    time.sleep(llm.token_delay * len(words))
+                    payload = json.dumps(llm._response(model, " ".join(words)))
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload.encode())
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                seq = 0
+
+                def send(event):
+                    nonlocal seq
+                    event["sequence_number"] = seq
+                    seq += 1
+                    line = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                    self.wfile.write(line.encode())
+                    self.wfile.flush()
+
+                send(
+                    {
+                        "type": "response.created",
+                        "response": llm._response(model, "", "in_progress"),
+                    }
+                )
+                for i, word in enumerate(words):
+                    send(
+                        {
+                            "type": "response.output_text.delta",
+                            "item_id": "msg_standin",
+                            "output_index": 0,
+                            "content_index": 0,
+                            "delta": word if i == 0 else " " + word,
+                            "logprobs": [],
+                        }
+                    )
+                    time.sleep(llm.token_delay)
+                send(
+                    {
+                        "type": "response.completed",
+                        "response": llm._response(model, " ".join(words)),
+                    }
+                )
+
+        return Handler
+
+
+# --- sandbox ---
+
+
+def sandbox_config(root=None, caches=False):
+    """
+    Point every data path in config at a scratch directory (a new temporary
+    directory by default) and, unless `caches`, disable the query and rerank
+    caches so repeated queries are not served from memory. Call before the
+    first use of any store, index manager or cache. Returns the root.
+    """
+    root = root or tempfile.mkdtemp(prefix="rag-bench-")
+    config.PDF_DIR = os.path.join(root, "pdfs")
+    config.INDEX_DIR = os.path.join(root, "index")
+    config.PAPER_FILE = os.path.join(root, "papers.json")
+    config.EMBED_CACHE_DIR = os.path.join(root, "embed_cache")
+    config.TEXT_CACHE_DIR = os.path.join(root, "text_cache")
+    config.COLLECTIONS_DIR = os.path.join(root, "collections")
+    config.S2_CACHE_DIR = os.path.join(root, "s2_cache")
+    config.QUERY_CACHE_FILE = None
+    config.RERANK_CACHE_FILE = os.path.join(root, "rerank_cache.sqlite")
+    config.TRACE_FILE = os.path.join(root, "traces.jsonl")
+    config.SUMMARY_CACHE_FILE = os.path.join(root, "summary_cache.sqlite")
+    config.PROFILE_DIR = os.path.join(root, "profiles")
+    config.QUERY_CACHE = caches
+    config.RERANK_CACHE = caches
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    return root
@@ -0,0 +1,284 @@
+"""
+Offline end-to-end benchmark of the RAG pipeline at several corpus sizes.
+
+For every size a synthetic corpus (papers, abstracts and generated PDFs, see
+offline.py) is written to a scratch directory and the pipeline stages are
+timed one after the other:
+
+    chunk_text            full-text chunking, per document
+    extract_pdf           extract_text_from_pdf, per PDF (uncached)
+    build_abstract_index  build_abstract_index (abstract chunks), per paper
+    build_fulltext_index  build_chunk_index (extraction + chunking +
+                          embedding + indexing), per paper
+    search_abstracts      single-query latency, per query
+    search_fulltext       single-query latency, per query
+    rerank                cross-encoder scoring, per (query, chunk) pair
+
+The summarizer (an LLM call) is not part of the run. By default the models
+are deterministic stubs, so timings measure the pipeline around the models;
+``--models real`` loads the configured models from the local Hugging Face
+cache instead. Nothing goes over the network and data/ is never touched.
+
+Results are written as JSON. Every stage's per-item time is compared with
+the stored run in benchmarks/baseline.json (or ``--baseline``) and the script
+exits non-zero if any stage got slower by more than ``--threshold`` (or if
+search precision dropped). The stored baseline was recorded with the stub
+models on one machine; after an intended change, or on other hardware,
+record a new one with ``--save-baseline``:
+
+    PYTHONPATH=src python benchmarks/pipeline_benchmark.py --sizes 50,200
+    PYTHONPATH=src python benchmarks/pipeline_benchmark.py --sizes 50,200 \\
+        --no-baseline --save-baseline benchmarks/baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import time
+
+import numpy as np
+
+import config
+import offline
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# stages compared against the baseline, by per-item time
+STAGES = (
+    "chunk_text",
+    "extract_pdf",
+    "build_abstract_index",
+    "build_fulltext_index",
+    "search_abstracts",
+    "search_fulltext",
+    "rerank",
+)
+# stages shorter than this (in total) are too noisy to flag
+MIN_SECONDS = 0.05
+PRECISION_DROP = 0.05
+
+
+def stage(seconds, items, latencies=None, **extra):
+    result = {
+        "items": items,
+        "seconds": seconds,
+        "per_item_ms": 1000 * seconds / max(items, 1),
+        "per_second": items / seconds if seconds else None,
+    }
+    if latencies:
+        result["p50_ms"] = 1000 * float(np.percentile(latencies, 50))
+        result["p95_ms"] = 1000 * float(np.percentile(latencies, 95))
+    result.update(extra)
+    return result
+
+
+def timed(fn, *args, quiet=True, **kwargs):
+    """(result, seconds), with the pipeline's progress prints silenced."""
+    out = io.StringIO() if quiet else None
+    with contextlib.redirect_stdout(out) if quiet else contextlib.nullcontext():
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+    return result, seconds
+
+
+def search_stage(search, queries, topic_of, collection, quiet):
+    """Per-query latencies and the share of results from the query's topic."""
+    latencies, relevant, returned = [], 0, 0
+    for query, topic in queries:
+        results, seconds = timed(search, query, collection=collection, quiet=quiet)
+        latencies.append(seconds)
+        relevant += sum(topic_of[r["paperId"]] == topic for r in results)
+        returned += len(results)
+    return stage(
+        sum(latencies),
+        len(queries),
+        latencies,
+        precision=relevant / max(returned, 1),
+    )
+
+
+def run_size(n_papers, args):
+    from rag.collections import get_collection
+    from rag.index.build_index_abs import build_abstract_index
+    from rag.index.build_index_paper import build_chunk_index
+    from rag.index.retrieval import rerank
+    from rag.index.search_abs import search_abstracts
+    from rag.index.search_paper import search_fulltext
+    from rag.io.text_utils import chunk_texts, extract_text_from_pdf
+
+    quiet = not args.verbose
+    corpus = offline.Corpus(n_papers, args.words, seed=n_papers)
+    papers = corpus.papers()
+    topic_of = {p["paperId"]: p["topic"] for p in papers}
+    collection = get_collection(f"bench-{n_papers}")
+    collection.store.replace(papers)
+
+    start = time.perf_counter()
+    offline.write_pdfs(corpus, papers, config.PDF_DIR)
+    generate_seconds = time.perf_counter() - start
+
+    results = {"generate_seconds": generate_seconds}
+    texts = [corpus.full_text(p) for p in papers]
+    chunks, seconds = timed(lambda: [chunk_texts([t])[0] for t in texts], quiet=quiet)
+    results["chunk_text"] = stage(
+        seconds, len(texts), chunks_per_doc=sum(map(len, chunks)) / len(texts)
+    )
+
+    pdf_paths = [os.path.join(config.PDF_DIR, f"{p['paperId']}.pdf") for p in papers]
+    _, seconds = timed(
+        lambda: [extract_text_from_pdf(path) for path in pdf_paths], quiet=quiet
+    )
+    results["extract_pdf"] = stage(seconds, len(pdf_paths))
+
+    _, seconds = timed(
+        build_abstract_index, collection=collection, quiet=quiet
+    )
+    results["build_abstract_index"] = stage(seconds, len(papers))
+    _, seconds = timed(build_chunk_index, papers, collection=collection, quiet=quiet)
+    results["build_fulltext_index"] = stage(
+        seconds, len(papers), chunks=collection.manager.get("papers").ntotal
+    )
+
+    queries = corpus.queries(args.queries)
+    results["search_abstracts"] = search_stage(
+        search_abstracts, queries, topic_of, collection, quiet
+    )
+    results["search_fulltext"] = search_stage(
+        search_fulltext, queries, topic_of, collection, quiet
+    )
+
+    snapshot = collection.manager.get("papers")
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(snapshot.store), args.pairs)
+    pairs = [
+        [queries[i % len(queries)][0], snapshot.store.get(int(row))["text"]]
+        for i, row in enumerate(rows)
+    ]
+    _, seconds = timed(rerank, pairs, quiet=quiet)
+    results["rerank"] = stage(seconds, len(pairs))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Human-readable regressions of results against a baseline run."""
+    regressions = []
+    if baseline.get("meta", {}).get("models") != results["meta"]["models"]:
+        print("Baseline used other models, timings are not compared")
+        return regressions
+    for size, stages in results["results"].items():
+        base_stages = baseline.get("results", {}).get(size)
+        if base_stages is None:
+            continue
+        for name in STAGES:
+            new, old = stages.get(name), base_stages.get(name)
+            if new is None or old is None:
+                continue
+            ratio = new["per_item_ms"] / max(old["per_item_ms"], 1e-9)
+            if ratio > 1 + threshold and new["seconds"] >= MIN_SECONDS:
+                regressions.append(
+                    f"{size} papers, {name}: {old['per_item_ms']:.2f} -> "
+                    f"{new['per_item_ms']:.2f} ms/item ({ratio:.2f}x)"
+                )
+            drop = old.get("precision", 0) - new.get("precision", 0)
+            if drop > PRECISION_DROP:
+                regressions.append(
+                    f"{size} papers, {name}: precision "
+                    f"{old['precision']:.3f} -> {new['precision']:.3f}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", default="50,200", help="corpus sizes (papers)")
+    parser.add_argument("--words", type=int, default=3000, help="words per paper")
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--pairs", type=int, default=2000, help="pairs to rerank")
+    parser.add_argument("--models", choices=("stub", "real"), default="stub")
+    parser.add_argument("--root", help="scratch directory (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch data")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument(
+        "--baseline", default=BASELINE_FILE, help="compare with this results file"
+    )
+    parser.add_argument(
+        "--no-baseline", action="store_true", help="skip the baseline comparison"
+    )
+    parser.add_argument("--save-baseline", help="also write results here")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="accepted slowdown per stage"
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    root = offline.sandbox_config(args.root)
+    if args.models == "stub":
+        offline.install_stub_models()
+
+    sizes = [int(n) for n in args.sizes.split(",")]
+    results = {
+        "meta": {
+            "sizes": sizes,
+            "models": args.models,
+            "embedder": config.SENTENCE_TRANSFORMER_MODEL,
+            "reranker": config.CROSS_ENCODER_MODEL,
+            "index_type": config.INDEX_TYPE,
+            "words_per_paper": args.words,
+            "queries": args.queries,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    try:
+        for n in sizes:
+            results["results"][str(n)] = run_size(n, args)
+    finally:
+        if not args.keep and not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(f"{'papers':>6} {'stage':<21} {'items':>6} {'ms/item':>9} {'p95 ms':>8}")
+    for size, stages in results["results"].items():
+        for name in STAGES:
+            s = stages[name]
+            p95 = f"{s['p95_ms']:.2f}" if "p95_ms" in s else ""
+            extra = f"  precision {s['precision']:.3f}" if "precision" in s else ""
+            print(
+                f"{size:>6} {name:<21} {s['items']:>6} "
+                f"{s['per_item_ms']:>9.2f} {p95:>8}{extra}"
+            )
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if not args.no_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        old, new = baseline.get("meta", {}), results["meta"]
+        if (old.get("machine"), old.get("cpus")) != (new["machine"], new["cpus"]):
+            print(
+                f"\nBaseline was recorded on {old.get('machine')} with "
+                f"{old.get('cpus')} CPUs; timings may not be comparable"
+            )
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions against", args.baseline)
+            for line in regressions:
+                print("  " + line)
+            raise SystemExit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
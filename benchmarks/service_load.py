@@ -0,0 +1,206 @@
+"""
+Load test of the search service (src/service/main.py): QPS and latency
+percentiles of POST /search under increasing client concurrency.
+
+By default a service is started in this process on a synthetic corpus
+(see offline.py) with the stub models, once with micro-batching and once
+with batches of one (--batch-sizes), so the effect of batching is visible.
+With --url an already running service is tested instead; --collection
+and --index then name what to search.
+
+    PYTHONPATH=src python benchmarks/service_load.py --concurrency 1,8,32
+    PYTHONPATH=src python benchmarks/service_load.py --url http://localhost:8000 \\
+        --collection gnn --index abstracts --queries queries.txt
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import shutil
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+import config
+import offline
+
+
+def post(conn, path, payload):
+    body = json.dumps(payload)
+    conn.request("POST", path, body, {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    data = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"HTTP {response.status}: {data[:200]!r}")
+    return json.loads(data)
+
+
+def get(url, path):
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+    try:
+        conn.request("GET", path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def run_load(url, queries, concurrency, duration, search_args):
+    """Latencies (s) and error count of `concurrency` clients for `duration` s."""
+    parsed = urlparse(url)
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(worker):
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+        mine, i = [], worker
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                post(conn, "/search", {"query": queries[i % len(queries)], **search_args})
+            except Exception:
+                conn.close()
+                with lock:
+                    errors[0] += 1
+            else:
+                mine.append(time.perf_counter() - start)
+            i += concurrency
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=client, args=(w,), daemon=True)
+        for w in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0], time.perf_counter() - start
+
+
+def measure(url, queries, levels, duration, search_args, label):
+    rows = []
+    for concurrency in levels:
+        before = get(url, "/health")["batching"]
+        latencies, errors, seconds = run_load(
+            url, queries, concurrency, duration, search_args
+        )
+        after = get(url, "/health")["batching"]
+        batches = after["batches"] - before["batches"]
+        rows.append(
+            {
+                "mode": label,
+                "concurrency": concurrency,
+                "requests": len(latencies),
+                "errors": errors,
+                "qps": len(latencies) / seconds,
+                "p50_ms": 1000 * float(np.percentile(latencies, 50)) if latencies else None,
+                "p95_ms": 1000 * float(np.percentile(latencies, 95)) if latencies else None,
+                "p99_ms": 1000 * float(np.percentile(latencies, 99)) if latencies else None,
+                "mean_batch": (after["items"] - before["items"]) / max(batches, 1),
+            }
+        )
+    return rows
+
+
+def local_corpus(n_papers, quiet=True):
+    """Index a synthetic corpus in the sandbox; returns its queries."""
+    from rag.collections import get_collection
+    from rag.index.build_index_abs import build_abstract_index
+    from rag.index.build_index_paper import build_chunk_index
+
+    corpus = offline.Corpus(n_papers, seed=n_papers)
+    papers = corpus.papers()
+    collection = get_collection("bench-service")
+    collection.store.replace(papers)
+    offline.write_pdfs(corpus, papers, config.PDF_DIR)
+    out = io.StringIO() if quiet else None
+    with contextlib.redirect_stdout(out) if quiet else contextlib.nullcontext():
+        build_abstract_index(collection=collection)
+        build_chunk_index(papers, collection=collection)
+    return collection.name, [q for q, _ in corpus.queries(2000)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", help="test a running service instead")
+    parser.add_argument("--collection", help="collection to search (with --url)")
+    parser.add_argument("--index", choices=("fulltext", "abstracts"), default="fulltext")
+    parser.add_argument("--queries", help="file with one query per line (with --url)")
+    parser.add_argument("--papers", type=int, default=200, help="synthetic corpus size")
+    parser.add_argument("--concurrency", default="1,8,32", help="client threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="s per level")
+    parser.add_argument(
+        "--batch-sizes", default=f"{config.SERVICE_BATCH_SIZE},1",
+        help="micro-batch sizes of the local service",
+    )
+    parser.add_argument("--batch-wait-ms", type=float, default=config.SERVICE_BATCH_WAIT_MS)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    search_args = {"index": args.index}
+    rows = []
+
+    if args.url:
+        if args.collection:
+            search_args["collection"] = args.collection
+        if args.queries:
+            with open(args.queries) as f:
+                queries = [line.strip() for line in f if line.strip()]
+        else:
+            queries = [q for q, _ in offline.Corpus(100).queries(500)]
+        rows += measure(args.url, queries, levels, args.duration, search_args, "remote")
+    else:
+        from service.main import make_server
+
+        root = offline.sandbox_config()
+        offline.install_stub_models()
+        try:
+            collection, queries = local_corpus(args.papers)
+            search_args["collection"] = collection
+            for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+                server = make_server(
+                    "127.0.0.1", 0, batch_size, args.batch_wait_ms / 1000
+                )
+                thread = threading.Thread(target=server.serve_forever, daemon=True)
+                thread.start()
+                url = f"http://127.0.0.1:{server.server_address[1]}"
+                with contextlib.redirect_stdout(io.StringIO()):
+                    rows += measure(
+                        url, queries, levels, args.duration, search_args,
+                        f"batch {batch_size}",
+                    )
+                server.shutdown()
+                server.server_close()
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(
+        f"{'mode':<10} {'clients':>7} {'requests':>8} {'errors':>6} {'QPS':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'batch':>6}"
+    )
+    for r in rows:
+        p = [f"{r[k]:>8.1f}" if r[k] is not None else f"{'-':>8}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+        print(
+            f"{r['mode']:<10} {r['concurrency']:>7} {r['requests']:>8} {r['errors']:>6} "
+            f"{r['qps']:>8.1f} {' '.join(p)} {r['mean_batch']:>6.1f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
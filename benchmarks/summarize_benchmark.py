@@ -0,0 +1,136 @@
+"""
+Latency of LLM summarization against a local stand-in for the OpenAI API.
+
+Compares one streamed request over all papers' passages (the previous
+single-prompt summarizer) with the map-reduce summarizer, cold and from the
+response cache. Reported per mode: time to the first token of the final
+answer, total time and requests sent to the server. The stand-in's latency
+per request and per token are set on the command line; no real API key or
+network access is needed.
+
+    PYTHONPATH=src python benchmarks/summarize_benchmark.py --papers 10
+    PYTHONPATH=src python benchmarks/summarize_benchmark.py --latency 1.5 \\
+        --token-delay 0.02 --json summarize.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import config
+import offline
+from rag.pipelines import summarizer
+
+
+def synthetic_results(n_papers, chunks_per_paper, seed=0):
+    """Search results shaped like search_fulltext output, with titles."""
+    corpus = offline.Corpus(n_papers, seed=seed)
+    results = []
+    for i, paper in enumerate(corpus.papers()):
+        results.append(
+            {
+                "paperId": paper["paperId"],
+                "title": paper["title"],
+                "score": 1.0 - i / n_papers,
+                "chunk_texts": [
+                    corpus.text(paper["topic"], 180) for _ in range(chunks_per_paper)
+                ],
+            }
+        )
+    return results
+
+
+async def timed_run(coro_fn):
+    """(seconds to first token, total seconds) of coro_fn(on_token)."""
+    start = time.perf_counter()
+    first = None
+
+    def on_token(delta):
+        nonlocal first
+        if first is None:
+            first = time.perf_counter() - start
+
+    await coro_fn(on_token)
+    return first, time.perf_counter() - start
+
+
+def run_mode(llm, name, coro_fn):
+    before = llm.requests
+    first, total = asyncio.run(timed_run(coro_fn))
+    return {
+        "mode": name,
+        "first_token_s": first,
+        "total_s": total,
+        "requests": llm.requests - before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--papers", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=3, help="passages per paper")
+    parser.add_argument("--latency", type=float, default=0.8, help="s per request")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="s per token")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    offline.sandbox_config()
+    os.environ.setdefault("OPENAI_API_KEY", "stand-in")
+    results = synthetic_results(args.papers, args.chunks)
+    query = "What are the main findings?"
+
+    with offline.StandInLLM(args.latency, args.token_delay) as llm:
+        config.OPENAI_BASE_URL = llm.base_url
+
+        async def single_prompt(on_token):
+            # all papers in one request, as the summarizer used to do
+            blocks = "\n---\n\n".join(summarizer.paper_block(r) for r in results)
+            prompt = summarizer.REDUCE_PROMPT.format(query=query, summaries=blocks)
+            client = summarizer.make_client()
+            try:
+                await summarizer.complete(client, prompt, on_token)
+            finally:
+                await client.close()
+
+        def map_reduce(on_token):
+            return summarizer.summarize_papers_async(results, query, on_token)
+
+        async def warm_up(on_token):
+            # client import and first connection, outside the timed runs
+            client = summarizer.make_client()
+            try:
+                await summarizer.complete(client, "warm up", on_token)
+            finally:
+                await client.close()
+
+        rows = []
+        config.SUMMARY_CACHE = False
+        run_mode(llm, "warm-up", warm_up)
+        rows.append(run_mode(llm, "single prompt", single_prompt))
+        rows.append(run_mode(llm, "map-reduce", map_reduce))
+        config.SUMMARY_CACHE = True
+        run_mode(llm, "fill cache", map_reduce)
+        rows.append(run_mode(llm, "map-reduce, cached", map_reduce))
+
+    print(
+        f"{args.papers} papers x {args.chunks} passages, stand-in latency "
+        f"{args.latency}s + {args.token_delay}s/token"
+    )
+    print(f"{'mode':<20} {'first token s':>14} {'total s':>8} {'requests':>9}")
+    for r in rows:
+        print(
+            f"{r['mode']:<20} {r['first_token_s']:>14.2f} "
+            f"{r['total_s']:>8.2f} {r['requests']:>9}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
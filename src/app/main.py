@@ -1,10 +1,13 @@
 import streamlit as st
 from rag.index.search_abs import search_abstracts
-from rag.index.build_index_paper import build_chunk_index
-from rag.index.search_paper import search_fulltext
+from rag.index.build_index_abs import build_abstract_index
 from rag.io.fetch_abs import fetch_papers
-from rag.io.fetch_paper import lookup_paper_by_id, download_papers
-from rag.pipelines.summarizer import summarize_papers
+from rag.io.fetch_paper import lookup_paper_by_id, lookup_papers_by_id
+from rag.pipelines.jobs import FullTextJob
+from rag.pipelines.summarizer import stream_summary
+from rag.models import warmup
+from rag.collections import collection_name, get_collection, list_collections
+from rag.tracing import breakdown, trace
 import config
 
 st.set_page_config(page_title="Research Assistant", layout="wide")
@@ -12,6 +15,38 @@ st.set_page_config(page_title="Research Assistant", layout="wide")
 st.title("📄 AI Research Assistant")
 st.write("Search papers, retrieve full text, rank chunks, and summarize with an LLM")
 
+
+@st.cache_resource(show_spinner="Loading models...")
+def load_models():
+    # loaded once per process and shared by every session
+    return warmup()
+
+
+load_models()
+
+# stage timings: traced requests are logged to config.TRACE_FILE and the
+# latest one is shown in the sidebar; profiling applies to one run only
+if st.session_state.pop("profile_used", False):
+    st.session_state.profile_next = False
+st.sidebar.subheader("⏱ Stage timings")
+trace_enabled = st.sidebar.checkbox("Record stage timings", value=config.TRACE)
+profile_next = st.sidebar.checkbox("Profile the next run (cProfile)", key="profile_next")
+trace_box = st.sidebar.container()
+
+
+def request_trace(name, **attrs):
+    """Trace one button press (and profile it if requested)."""
+    profile = "cprofile" if profile_next else None
+    if profile:
+        st.session_state.profile_used = True
+    return trace(name, enabled=trace_enabled, profile=profile, **attrs)
+
+
+def keep_trace(t):
+    if t.record is not None:
+        st.session_state.last_trace = t.record
+
+
 # Initialize session state
 if "topic_submitted" not in st.session_state:
     st.session_state.topic_submitted = False
@@ -26,9 +61,17 @@ if not st.session_state.topic_submitted:
         if topic.strip() == "":
             st.warning("Please enter a topic first.")
         else:
-            # Call your fetch_papers pipeline
-            papers = fetch_papers(topic)
+            # each topic gets its own collection (paper store + indexes)
+            collection = collection_name(topic)
+            st.session_state.collection = collection
+            with request_trace("fetch_topic", topic=topic) as t:
+                # Call your fetch_papers pipeline
+                papers = fetch_papers(topic, collection=collection)
+                # papers are merged into the collection; only new abstracts get embedded
+                build_abstract_index(collection=collection)
+            keep_trace(t)
             st.session_state.search_results = papers
+            st.session_state.topic_paper_ids = [p["paperId"] for p in papers]
             st.session_state.topic_submitted = True
 
             st.success(f"Found {len(papers)} papers for topic: {topic}")
@@ -40,19 +83,43 @@ if not st.session_state.topic_submitted:
                 st.markdown(f"*Abstract:* {paper.get('abstract', '')[:300]}...")  # truncated
                 st.markdown("---")
 
+collection = st.session_state.get("collection")
+
 if st.session_state.topic_submitted:
     query = st.text_area("Enter your research question:", height=150)
 
+# optionally search earlier topics together with the current one
+other_topics = [c for c in list_collections() if c != collection]
+extra_collections = st.sidebar.multiselect(
+    "Also search topics:", other_topics
+) if other_topics else []
+
 if st.button("Search (Abstracts Only)"):
-    with st.spinner("Searching abstracts..."):
-        abs_results = search_abstracts(
-            query, top_k_raw=config.TOP_K_RAW, top_k_final=config.TOP_K_FINAL
-        )
+    with st.spinner("Searching abstracts..."), request_trace("search_abstracts") as t:
+        if extra_collections:
+            abs_results = search_abstracts(
+                query,
+                top_k_raw=config.TOP_K_RAW,
+                top_k_final=config.TOP_K_FINAL,
+                collection=[collection] + extra_collections,
+            )
+        else:
+            abs_results = search_abstracts(
+                query,
+                top_k_raw=config.TOP_K_RAW,
+                top_k_final=config.TOP_K_FINAL,
+                paper_ids=st.session_state.get("topic_paper_ids"),
+                collection=collection,
+            )
+    keep_trace(t)
 
     st.subheader("Top Papers (Abstract-level)")
-    for r in abs_results:
-        paper_id = r["paperId"]
-        paper = lookup_paper_by_id(paper_id)
+    papers = [
+        lookup_paper_by_id(r["paperId"], r.get("collection", collection))
+        for r in abs_results
+    ]
+    for r, paper in zip(abs_results, papers):
+        paper = paper or {}
         st.markdown(
             f"""**Title:** {paper.get("title", "Unknown Title")} —  Score: `{r["score"]:.4f}`
                     \n **Paper ID:** {r["paperId"]} 
@@ -63,51 +130,126 @@ if st.button("Search (Abstracts Only)"):
 
     st.session_state["abs_results"] = abs_results
 
-# Only show the second button if abstracts already retrieved
+# Full-text retrieval runs as a background job (see rag.pipelines.jobs), so
+# widget interactions do not restart it; jobs are kept in session state by
+# key and the page polls the running one for progress
+@st.fragment(run_every=1.0)
+def fulltext_progress(job):
+    if not job.running:
+        # finished: rerun the whole page to show the results
+        st.rerun()
+    rows = job.progress()
+    indexed = sum(row["status"] == "indexed" for row in rows)
+    st.progress(
+        indexed / max(len(rows), 1),
+        text=f"{job.stage or 'starting'}: {indexed}/{len(rows)} papers indexed "
+        f"({job.elapsed:.0f}s)",
+    )
+    st.dataframe(rows, hide_index=True)
+    if job.cancelled:
+        st.caption("Cancelling...")
+    elif st.button("Cancel", key="cancel_fulltext"):
+        job.cancel()
+
+
 if "abs_results" in st.session_state:
     if st.button("Run Full-Text Retrieval"):
-        with st.spinner("Downloading PDFs, chunking and ranking..."):
-            top_paper_ids = [
-                p["paperId"] for p in st.session_state["abs_results"]
-            ]  # Test with first 5 papers
-            top_papers = [lookup_paper_by_id(pid) for pid in top_paper_ids]
-
-            downloaded_papers = download_papers(top_papers, save_dir=config.PDF_DIR)
-        with st.spinner("Scanning and chunking texts..."):
-            build_chunk_index(downloaded_papers)
-        with st.spinner("ranking chunks..."):
-            search_results = search_fulltext(
-                query, top_k_raw=config.TOP_K_RAW, top_k_final=config.TOP_K_FINAL
-            )
-
-        st.session_state["search_results"] = search_results
-        st.subheader("Top Relevant Chunks (Full-Text)")
-        for r in search_results:
-            paper_id = r["paperId"]
-            paper = lookup_paper_by_id(paper_id)
-            st.markdown(
-                f"""**Title:** {paper.get("title", "Unknown Title")} —  Score: `{r["score"]:.4f}`
-                    \n **Paper ID:** {r["paperId"]} 
-                    """
+        top_papers = [
+            lookup_paper_by_id(r["paperId"], r.get("collection", collection))
+            for r in st.session_state["abs_results"]
+        ]
+        top_papers = [p for p in top_papers if p]
+        # papers found in other topics join this topic's collection
+        store = get_collection(collection).store
+        store.upsert([p for p in top_papers if p["paperId"] not in store])
+
+        key = (collection, query, tuple(p["paperId"] for p in top_papers))
+        jobs = st.session_state.setdefault("jobs", {})
+        if key not in jobs or not jobs[key].running:
+            profile = "cprofile" if profile_next else None
+            if profile:
+                st.session_state.profile_used = True
+            jobs[key] = FullTextJob(
+                top_papers,
+                query,
+                collection=collection,
+                top_k_raw=config.TOP_K_RAW,
+                top_k_final=config.TOP_K_FINAL,
+                trace_enabled=trace_enabled,
+                profile=profile,
+            ).start()
+        st.session_state.fulltext_job = key
+
+    job = st.session_state.get("jobs", {}).get(st.session_state.get("fulltext_job"))
+    if job is not None and job.running:
+        fulltext_progress(job)
+    elif job is not None:
+        if not getattr(job, "collected", False):
+            # first rerun after the job finished
+            job.collected = True
+            if job.trace is not None:
+                st.session_state.last_trace = job.trace
+            if job.state == "done":
+                st.session_state["search_results"] = job.result
+
+        if job.state == "failed":
+            st.error(f"Full-text retrieval failed: {job.error}")
+        elif job.state == "cancelled":
+            st.warning("Full-text retrieval was cancelled.")
+        else:
+            search_results = job.result
+            st.subheader("Top Relevant Chunks (Full-Text)")
+            papers = lookup_papers_by_id(
+                [r["paperId"] for r in search_results], collection
             )
-            st.markdown(f"> {' ... '.join(r['chunk_texts'])}...")
+            for r, paper in zip(search_results, papers):
+                paper = paper or {}
+                st.markdown(
+                    f"""**Title:** {paper.get("title", "Unknown Title")} —  Score: `{r["score"]:.4f}`
+                        \n **Paper ID:** {r["paperId"]} 
+                        """
+                )
+                st.markdown(f"> {' ... '.join(r['chunk_texts'])}...")
 
 # Summarize
 if "search_results" in st.session_state:
     search_results = st.session_state["search_results"]
-    for result in search_results:
-        paper_id = result["paperId"]
-        paper = lookup_paper_by_id(paper_id)
-        result["title"] = paper.get("title", "Unknown Title")
+    papers = lookup_papers_by_id([r["paperId"] for r in search_results], collection)
+    for result, paper in zip(search_results, papers):
+        result["title"] = (paper or {}).get("title", "Unknown Title")
     if st.button("Summarize with LLM"):
-        with st.spinner("Generating summary..."):
-            summary = summarize_papers(search_results, query)
-
         st.subheader("🧠 Final Summary")
-        st.write(summary)
+        # papers are summarized in parallel first; the synthesis streams in
+        with st.spinner("Summarizing papers..."), request_trace("summarize") as t:
+            summary = st.write_stream(stream_summary(search_results, query))
+        keep_trace(t)
         st.button(
             "Copy to Clipboard",
             on_click=lambda: st.session_state.update(
         {"_copy_js": f"navigator.clipboard.writeText(`{summary}`)"}
     ),
         )
+
+# breakdown of the latest traced request
+last_trace = st.session_state.get("last_trace")
+if last_trace:
+    with trace_box:
+        st.caption(
+            f"**{last_trace['name']}**: {last_trace['seconds']:.2f}s, "
+            f"peak RSS {last_trace['peak_rss_mb']:.0f} MB"
+        )
+        st.dataframe(
+            [
+                {
+                    "stage": row["stage"],
+                    "calls": row["calls"],
+                    "seconds": round(row["seconds"], 3),
+                    "items": row["items"],
+                    "MB": round(row["bytes"] / 2**20, 2),
+                }
+                for row in breakdown(last_trace)
+            ],
+            hide_index=True,
+        )
+        if last_trace["profile"]:
+            st.caption(f"Profile written to {last_trace['profile']}")
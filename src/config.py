@@ -1,14 +1,138 @@
 PDF_DIR = "data/pdfs"
 INDEX_DIR = "data/index"
 PAPER_FILE = "data/papers.json"
-CHUNKS_ABS_FILE = "data/chunks_abs.json"
-CHUNKS_FULL_FILE = "data/chunks_full.json"
+EMBED_CACHE_DIR = "data/embed_cache"
+TEXT_CACHE_DIR = "data/text_cache"
+# per-topic collections (paper store + indexes each), see rag.collections
+COLLECTIONS_DIR = "data/collections"
+# number of committed index versions kept on disk
+INDEX_KEEP_VERSIONS = 2
+# chunks per batch when streaming chunks into an index
+EMBED_BATCH_SIZE = 256
+# storage dtype of new embedding caches: "float32", "float16" or "int8"
+EMBED_CACHE_DTYPE = "float32"
+
+# FAISS index type: "flat" (exact), "ivf_flat", "ivf_pq", "hnsw", or the
+# scalar-quantized "sq_fp16" (2 bytes/dim), "sq8" and "ivf_sq8" (1 byte/dim).
+# Indexes with fewer than ANN_MIN_VECTORS vectors always stay flat. Removing
+# vectors from "hnsw" is deferred and batched, see HNSW_MAX_REMOVED.
+INDEX_TYPE = "flat"
+ANN_MIN_VECTORS = 50_000
+ANN_TRAIN_SIZE = 100_000  # vectors sampled to train IVF quantizers
+IVF_NLIST = 4096
+IVF_NPROBE = 16
+PQ_M = 48  # sub-quantizers for ivf_pq (must divide the embedding dim)
+PQ_NBITS = 8
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+# HNSW graphs cannot drop vectors. Removed (and re-indexed) chunks stay in the
+# graph, masked out of searches, until more than this fraction of it is dead;
+# the commit that crosses it rebuilds the whole graph from the live vectors,
+# which costs as much as building the index from scratch.
+HNSW_MAX_REMOVED = 0.2
+# lossy index types (ivf_pq, sq8, ivf_sq8) fetch RESCORE_FACTOR * k candidates
+# and re-score them with the full-precision vectors from the embedding cache
+RESCORE = True
+RESCORE_FACTOR = 4
+
+# PDF downloads
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_DEFAULT_HOST_LIMIT = 4
+# per-host concurrency caps (host or parent domain)
+DOWNLOAD_HOST_LIMITS = {"arxiv.org": 2}
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_TIMEOUT = 30
+
+# PDF text extraction processes (None = one per CPU)
+EXTRACT_WORKERS = None
+
+# chunking: MiniLM embeds at most 256 tokens including [CLS] and [SEP]
+CHUNK_MAX_TOKENS = 254
+CHUNK_OVERLAP = 50
+CHUNK_SENTENCES = False  # end chunks on sentence boundaries where possible
+CHUNK_BATCH_SIZE = 32  # documents per tokenizer call
+
+# Semantic Scholar API
+S2_API_BASE = "https://api.semanticscholar.org"
+S2_MAX_CONCURRENCY = 4
+S2_MIN_INTERVAL = 1.0  # seconds between requests (1 rps with an API key)
+S2_RETRIES = 5
+S2_TIMEOUT = 30
+S2_CACHE_DIR = "data/s2_cache"
+S2_CACHE_TTL = 7 * 24 * 3600  # seconds
+
+# citation-graph corpus expansion
+EXPAND_BATCH_SIZE = 500  # ids per /paper/batch request (API maximum)
+EXPAND_EDGE_LIMIT = 1000  # references/citations followed per paper and direction
+EXPAND_MAX_PAPERS = 2000  # new papers added per expansion
 
 SENTENCE_TRANSFORMER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 
 OPENAI_MODEL_NAME = "gpt-5-nano"
+OPENAI_BASE_URL = None  # None = api.openai.com (or OPENAI_BASE_URL in the env)
+# map-reduce summarization: per-paper requests in flight, response cache
+SUMMARY_CONCURRENCY = 8
+SUMMARY_CACHE = True
+SUMMARY_CACHE_FILE = "data/summary_cache.sqlite"
+# context packing before summarization (see rag.pipelines.context)
+CONTEXT_PACKING = True
+CONTEXT_TOKEN_BUDGET = 6000  # LLM tokens of passages across all papers
+CONTEXT_MIN_OVERLAP = 40  # shortest shared text (chars) merged / deduplicated
+
+# headless HTTP service (see service/main.py)
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8000
+SERVICE_BATCH_SIZE = 32  # queries encoded and reranked together
+SERVICE_BATCH_WAIT_MS = 2  # longest a query waits for others to join its batch
+SERVICE_BATCH_TIMEOUT = 120  # seconds a request waits for its batch result
+
+# CPU inference for the embedder and cross-encoder (see rag.inference):
+# "torch", "torch_int8", "onnx" or "onnx_int8"
+INFERENCE_BACKEND = "torch"
+INFERENCE_THREADS = None  # intra-op threads (None = runtime default)
+ONNX_INT8_FILE = "onnx/model_qint8_avx2.onnx"  # quantized file in the model repo
+# sort inputs by length and batch them by padded-token budget
+DYNAMIC_BATCHING = True
+BATCH_TOKENS = 16384
+BATCH_MAX_SIZE = 256
 
 # search parameters
 TOP_K_RAW = 20
 TOP_K_FINAL = 5
+# threads for searching several collections at once
+SEARCH_WORKERS = 8
+RERANK_BATCH_SIZE = 32
+
+# hybrid retrieval: fuse the top TOP_K_RAW BM25 and dense results with
+# reciprocal-rank fusion (score = sum of 1 / (RRF_K + rank)) and rerank the
+# best TOP_K_RAW fused candidates
+HYBRID_SEARCH = True
+RRF_K = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# query embedding cache shared by abstract and full-text search
+QUERY_CACHE = True
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_FILE = "data/query_cache.npz"  # None to keep it in memory only
+QUERY_CACHE_SAVE_EVERY = 32  # new entries between background saves
+
+# cross-encoder score cache (LRU in memory + SQLite on disk)
+RERANK_CACHE = True
+RERANK_CACHE_FILE = "data/rerank_cache.sqlite"
+RERANK_CACHE_SIZE = 100_000
+# adaptive reranking: drop candidates whose bi-encoder score is more than
+# RERANK_MARGIN below the best, and rerank in steps of RERANK_STEP until the
+# top_k_final set stops changing (RERANK_STOP_EARLY)
+RERANK_ADAPTIVE = False
+RERANK_MARGIN = 0.15
+RERANK_MIN_CANDIDATES = 10
+RERANK_STEP = 5
+RERANK_STOP_EARLY = True
+
+# per-request stage timings (see rag.tracing); the app can also switch it on
+TRACE = False
+TRACE_FILE = "data/traces.jsonl"  # one JSON record per traced request
+PROFILE_DIR = "data/profiles"  # cProfile / pyinstrument output of profiled runs
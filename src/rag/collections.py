@@ -0,0 +1,89 @@
+"""
+Named collections of papers, one per topic.
+
+Each collection has its own paper store and its own versioned indexes:
+
+    data/collections/<name>/papers.json
+    data/collections/<name>/index/abs_chunk/...
+    data/collections/<name>/index/papers/...
+
+so fetching or re-indexing one topic never touches another. PDFs, extracted
+texts and the embedding / rerank / query caches are keyed by content and
+stay shared, so a paper that appears in several topics is downloaded,
+extracted and embedded once. The default collection (name None) is the
+global ``config.PAPER_FILE`` / ``config.INDEX_DIR`` pair used before
+collections existed.
+"""
+
+import os
+import re
+import shutil
+import threading
+
+import config
+from rag.index.index_manager import IndexManager, get_manager
+from rag.io.paper_store import get_store
+
+_lock = threading.Lock()
+_collections = {}
+
+
+def collection_name(topic):
+    """Directory-safe collection name for a free-text topic."""
+    name = re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-")
+    if not name:
+        raise ValueError(f"Cannot derive a collection name from {topic!r}")
+    return name[:64]
+
+
+class Collection:
+    def __init__(self, name=None, root=None):
+        self.name = name
+        if name is None:
+            self.path = None
+            self.paper_file = config.PAPER_FILE
+            self.store = get_store()
+            self.manager = get_manager()
+        else:
+            if name != collection_name(name):
+                raise ValueError(f"Invalid collection name {name!r}")
+            self.path = os.path.join(root or config.COLLECTIONS_DIR, name)
+            self.paper_file = os.path.join(self.path, "papers.json")
+            self.store = get_store(self.paper_file)
+            self.manager = IndexManager(os.path.join(self.path, "index"))
+
+    def __repr__(self):
+        return f"Collection({self.name!r})"
+
+
+def get_collection(name=None):
+    """
+    Shared Collection for a name (or the default collection for None).
+    A Collection instance is passed through unchanged.
+    """
+    if isinstance(name, Collection):
+        return name
+    with _lock:
+        if name not in _collections:
+            _collections[name] = Collection(name)
+        return _collections[name]
+
+
+def list_collections(root=None):
+    """Names of the collections on disk."""
+    root = root or config.COLLECTIONS_DIR
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name))
+    )
+
+
+def delete_collection(name):
+    """Remove a named collection's paper store and indexes."""
+    collection = get_collection(name)
+    if collection.path is None:
+        raise ValueError("The default collection cannot be deleted")
+    with _lock:
+        _collections.pop(name, None)
+    shutil.rmtree(collection.path, ignore_errors=True)
@@ -0,0 +1,176 @@
+"""
+Approximate nearest-neighbour index types selected by ``config.INDEX_TYPE``.
+
+Writers always add to an exact IndexFlatIP; at commit the flat index is
+converted to the configured type once the corpus has at least
+``config.ANN_MIN_VECTORS`` vectors, so small corpora stay exact. All indexes
+use inner product on normalized embeddings (= cosine similarity).
+
+The scalar-quantized types store each dimension as float16 ("sq_fp16") or
+8 bits ("sq8", and "ivf_sq8" with an inverted file on top), cutting index
+memory to 1/2 or 1/4 of flat float32.
+"""
+
+import math
+
+import faiss
+import numpy as np
+
+import config
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq_fp16", "sq8", "ivf_sq8")
+IVF_TYPES = ("ivf_flat", "ivf_pq", "ivf_sq8")
+# types whose scores are approximate enough to be worth re-scoring
+LOSSY_TYPES = ("ivf_pq", "sq8", "ivf_sq8")
+SQ_TYPES = {
+    "sq_fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+    "ivf_sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def index_kind(index):
+    """Type name of an (optionally ID-mapped) index, one of INDEX_TYPES."""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    else:
+        index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFScalarQuantizer):
+        return "ivf_sq8"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16:
+            return "sq_fp16"
+        return "sq8"
+    return "flat"
+
+
+def _nlist(n):
+    # ~4 * sqrt(n) lists, with at least 39 training points per list
+    return max(1, min(config.IVF_NLIST, int(4 * math.sqrt(n)), n // 39))
+
+
+def _pq_m(dim):
+    # the number of sub-quantizers must divide the dimension
+    m = min(config.PQ_M, dim)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def make_index(dim, train_vectors, index_type=None):
+    """
+    Empty, trained index of the given type. Falls back to flat when there
+    are fewer than ANN_MIN_VECTORS training vectors.
+    """
+    index_type = index_type or config.INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+    n = len(train_vectors)
+    if index_type == "flat" or n < config.ANN_MIN_VECTORS:
+        return faiss.IndexFlatIP(dim)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+        return index
+
+    quantizer = faiss.IndexFlatIP(dim)
+    if index_type in ("sq_fp16", "sq8"):
+        index = faiss.IndexScalarQuantizer(
+            dim, SQ_TYPES[index_type], faiss.METRIC_INNER_PRODUCT
+        )
+    elif index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, _nlist(n), faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "ivf_sq8":
+        index = faiss.IndexIVFScalarQuantizer(
+            quantizer, dim, _nlist(n), SQ_TYPES[index_type], faiss.METRIC_INNER_PRODUCT
+        )
+    else:
+        index = faiss.IndexIVFPQ(
+            quantizer,
+            dim,
+            _nlist(n),
+            _pq_m(dim),
+            config.PQ_NBITS,
+            faiss.METRIC_INNER_PRODUCT,
+        )
+    sample = train_vectors
+    if n > config.ANN_TRAIN_SIZE:
+        rows = np.random.default_rng(0).choice(n, config.ANN_TRAIN_SIZE, replace=False)
+        sample = train_vectors[np.sort(rows)]
+    index.train(np.ascontiguousarray(sample, dtype="float32"))
+    return index
+
+
+def _id_mapped_vectors(index):
+    """(vectors, ids) of an ID-mapped index whose inner index can reconstruct."""
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexIVF):
+        inner.make_direct_map()
+    vectors = inner.reconstruct_n(0, inner.ntotal)
+    ids = faiss.vector_to_array(index.id_map).astype("int64")
+    return vectors, ids
+
+
+def convert(index, index_type=None, batch_size=65536, keep=None):
+    """
+    Re-index an ID-mapped index as index_type (default: config.INDEX_TYPE),
+    training on its own vectors. Used to upgrade flat indexes at commit and
+    to rebuild HNSW, which cannot remove vectors, without the removed ones.
+    keep: optional boolean mask over the index's rows of the vectors to keep.
+    """
+    vectors, ids = _id_mapped_vectors(index)
+    if keep is not None:
+        vectors, ids = vectors[keep], ids[keep]
+    new = make_index(index.d, vectors, index_type)
+    # IVF indexes store ids themselves; IndexIDMap2 assumes the inner index
+    # renumbers rows on removal, which IVF does not
+    if not isinstance(new, faiss.IndexIVF):
+        new = faiss.IndexIDMap2(new)
+    for start in range(0, len(ids), batch_size):
+        new.add_with_ids(
+            vectors[start : start + batch_size], ids[start : start + batch_size]
+        )
+    return new
+
+
+def maybe_upgrade(index):
+    """Convert a flat index to the configured type once it is large enough."""
+    if (
+        config.INDEX_TYPE != "flat"
+        and index_kind(index) == "flat"
+        and index.ntotal >= config.ANN_MIN_VECTORS
+    ):
+        print(f"Converting {index.ntotal} vectors to a {config.INDEX_TYPE} index")
+        return convert(index)
+    return index
+
+
+def configure_search(index, nprobe=None, ef_search=None):
+    """Apply query-time settings (nprobe / efSearch) to a loaded index."""
+    kind = index_kind(index)
+    if kind in IVF_TYPES:
+        faiss.extract_index_ivf(index).nprobe = nprobe or config.IVF_NPROBE
+    elif kind == "hnsw":
+        inner = index.index if hasattr(index, "id_map") else index
+        faiss.downcast_index(inner).hnsw.efSearch = ef_search or config.HNSW_EF_SEARCH
+    return index
+
+
+def search_params(index, sel=None):
+    """SearchParameters of the right subclass for the index type."""
+    kind = index_kind(index)
+    if kind in IVF_TYPES:
+        return faiss.SearchParametersIVF(
+            sel=sel, nprobe=faiss.extract_index_ivf(index).nprobe
+        )
+    if kind == "hnsw":
+        inner = faiss.downcast_index(index.index if hasattr(index, "id_map") else index)
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=inner.hnsw.efSearch)
+    return faiss.SearchParameters(sel=sel)
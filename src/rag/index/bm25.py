@@ -0,0 +1,156 @@
+"""
+Compact BM25 inverted index over a chunk store.
+
+Documents are chunk store rows. The postings are stored in CSR form next to
+the chunk store of each index version:
+
+    bm25/vocab.json     list of terms; position = term id
+    bm25/indptr.npy     int64   n_terms + 1 offsets into docs / tfs
+    bm25/docs.npy       int32   chunk store rows, ascending within a term
+    bm25/tfs.npy        uint16  term frequency in that row
+    bm25/doc_len.npy    int32   number of terms per row
+
+A new version is written incrementally from the previous one: surviving rows
+keep their postings (renumbered), and only newly added chunks are tokenized.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+import config
+from rag.index.chunk_store import _load_array
+
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was we were which with".split()
+)
+
+
+def tokenize(text):
+    """Lower-cased word tokens without stopwords."""
+    if not isinstance(text, str):
+        text = bytes(text).decode("utf-8")
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, path, k1=None, b=None):
+        self.path = path
+        self.k1 = config.BM25_K1 if k1 is None else k1
+        self.b = config.BM25_B if b is None else b
+        with open(os.path.join(path, "vocab.json")) as f:
+            self.vocab = json.load(f)
+        self.term_ids = {term: i for i, term in enumerate(self.vocab)}
+        self.indptr = _load_array(os.path.join(path, "indptr.npy"))
+        self.docs = _load_array(os.path.join(path, "docs.npy"))
+        self.tfs = _load_array(os.path.join(path, "tfs.npy"))
+        self.doc_len = _load_array(os.path.join(path, "doc_len.npy"))
+        self.avgdl = float(self.doc_len.mean()) if len(self.doc_len) else 1.0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def scores(self, query):
+        """BM25 score of every row for a query (0 where no term matches)."""
+        n = len(self)
+        scores = np.zeros(n, dtype="float32")
+        for term in set(tokenize(query)):
+            tid = self.term_ids.get(term)
+            if tid is None:
+                continue
+            lo, hi = self.indptr[tid], self.indptr[tid + 1]
+            docs = self.docs[lo:hi]
+            tf = self.tfs[lo:hi].astype("float32")
+            df = hi - lo
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / self.avgdl)
+            # rows are unique within a posting list, so plain indexing is safe
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query, k, mask=None):
+        """Top-k (scores, rows) for a query, optionally within a row mask."""
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~mask] = 0
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = hits[np.argsort(-scores[hits], kind="stable")]
+        return scores[top], top
+
+
+def _postings(term_ids, docs, tfs, n_terms):
+    """CSR (indptr, docs, tfs) from unsorted (term, doc, tf) triples."""
+    order = np.lexsort((docs, term_ids))
+    counts = np.bincount(term_ids, minlength=n_terms)
+    indptr = np.zeros(n_terms + 1, dtype="int64")
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, docs[order], tfs[order]
+
+
+def write_index(path, new_texts, base=None, keep=None):
+    """
+    Write the BM25 index for a chunk store whose rows are the `keep`-masked
+    rows of `base` followed by `new_texts`. Without a base, the index is
+    built from new_texts alone.
+    """
+    vocab = list(base.vocab) if base is not None else []
+    term_ids_of = {term: i for i, term in enumerate(vocab)}
+
+    # postings of surviving base rows, renumbered to their new row
+    if base is not None:
+        new_row = np.cumsum(keep, dtype="int64") - 1
+        base_terms = np.repeat(
+            np.arange(len(base.vocab), dtype="int32"), np.diff(base.indptr)
+        )
+        alive = keep[base.docs]
+        term_ids = [base_terms[alive]]
+        docs = [new_row[base.docs[alive]].astype("int32")]
+        tfs = [np.asarray(base.tfs[alive])]
+        doc_len = [np.asarray(base.doc_len[keep])]
+        first_new = int(keep.sum())
+    else:
+        term_ids, docs, tfs, doc_len = [], [], [], []
+        first_new = 0
+
+    new_terms, new_docs, new_tfs, new_len = [], [], [], []
+    for i, text in enumerate(new_texts):
+        counts = Counter(tokenize(text))
+        new_len.append(sum(counts.values()))
+        for term, tf in counts.items():
+            tid = term_ids_of.get(term)
+            if tid is None:
+                tid = term_ids_of[term] = len(vocab)
+                vocab.append(term)
+            new_terms.append(tid)
+            new_docs.append(first_new + i)
+            new_tfs.append(min(tf, 65535))
+    term_ids.append(np.array(new_terms, dtype="int32"))
+    docs.append(np.array(new_docs, dtype="int32"))
+    tfs.append(np.array(new_tfs, dtype="uint16"))
+    doc_len.append(np.array(new_len, dtype="int32"))
+
+    term_ids = np.concatenate(term_ids)
+    # drop terms whose documents were all removed
+    used = np.bincount(term_ids, minlength=len(vocab)) > 0
+    remap = np.cumsum(used) - 1
+    vocab = [term for term, u in zip(vocab, used) if u]
+    indptr, docs, tfs = _postings(
+        remap[term_ids], np.concatenate(docs), np.concatenate(tfs), len(vocab)
+    )
+
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    np.save(os.path.join(path, "indptr.npy"), indptr)
+    np.save(os.path.join(path, "docs.npy"), docs.astype("int32"))
+    np.save(os.path.join(path, "tfs.npy"), tfs.astype("uint16"))
+    np.save(os.path.join(path, "doc_len.npy"), np.concatenate(doc_len))
+    return BM25Index(path)
@@ -1,90 +1,48 @@
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import json
-from rag.io.text_utils import chunk_text
-import faiss
-import os
+from rag.collections import get_collection
+from rag.io.text_utils import chunk_texts
 import config as config
+from rag.index.streaming import batched, stream_into_index
 
 
-def chunk_abstracts(papers, **kwargs):
-    """Chunk abstracts from papers into overlapping segments."""
-    abs_chunks = []
-    for paper in papers:
-        paper_id = paper["paperId"]
-
-        chunks = chunk_text(paper["abstract"], **kwargs)
+def iter_abstract_chunks(papers, **kwargs):
+    """Yield chunk dicts for the abstracts of papers."""
+    for batch in batched(papers, config.CHUNK_BATCH_SIZE):
+        all_chunks = chunk_texts([paper["abstract"] for paper in batch], **kwargs)
 
-        for i, chunk in enumerate(chunks):
-            abs_chunks.append(
-                {
-                    "paperId": paper_id,
+        for paper, chunks in zip(batch, all_chunks):
+            for i, chunk in enumerate(chunks):
+                yield {
+                    "paperId": paper["paperId"],
                     "chunk_id": i,
                     "text": chunk,
                 }
-            )
-
-    return abs_chunks
-
 
-def build_abstract_index(chunked=False, **kwargs):
-    """Build FAISS index for abstracts or chunked abstracts."""
-    # Load embedding model
-    model = SentenceTransformer(config.SENTENCE_TRANSFORMER_MODEL)
-
-    # Load papers
-    with open(config.PAPER_FILE) as f:
-        papers = json.load(f)
-
-    # embed abstracts as a whole
-    if not chunked:
-        abstracts = [p["abstract"] for p in papers]
-
-        embeddings_abs = model.encode(
-            abstracts, convert_to_numpy=True, normalize_embeddings=True
-        )
-        embeddings_abs = np.vstack(embeddings_abs)
-        print("Abstract embeddings shape:", embeddings_abs.shape)
-        # np.save("embeddings_abs.npy", embeddings_abs)
 
-        # Create FAISS index (Inner Product sim = cosine sim after normalization)
-        index_abs = faiss.IndexFlatIP(embeddings_abs.shape[1])
-
-        # Add vectors to index
-        index_abs.add(embeddings_abs)
-        print("FAISS abstract index size:", index_abs.ntotal)
-        # Save index to disk
-        index_path = os.path.join(config.INDEX_DIR, "abs.index")
-        faiss.write_index(index_abs, index_path)
-
-    # embed chunked abstracts
-    else:
-        abs_chunks = chunk_abstracts(papers, **kwargs)
-        with open(config.CHUNKS_ABS_FILE, "w") as f:
-            json.dump(abs_chunks, f, indent=2)
-        print(f"Saved Total of {len(abs_chunks)} chunks.")
-
-        abs_chunk_texts = [c["text"] for c in abs_chunks]
-
-        embeddings_abs_chunk = model.encode(
-            abs_chunk_texts, convert_to_numpy=True, normalize_embeddings=True
+def chunk_abstracts(papers, **kwargs):
+    """Chunk abstracts from papers into overlapping segments."""
+    return list(iter_abstract_chunks(papers, **kwargs))
+
+
+def build_abstract_index(collection=None, **kwargs):
+    """Chunk the abstracts of a collection into its versioned abs_chunk index."""
+    collection = get_collection(collection)
+    papers = collection.store.all()
+    paper_ids = {p["paperId"] for p in papers}
+    with collection.manager.update("abs_chunk") as writer:
+        # drop papers no longer in the corpus, add only unseen ones
+        stale = writer.paper_ids() - paper_ids
+        removed = writer.remove_papers(stale)
+        indexed = writer.paper_ids()
+        new_papers = [p for p in papers if p["paperId"] not in indexed]
+
+        added = stream_into_index(writer, iter_abstract_chunks(new_papers, **kwargs))
+        print(
+            f"Added {added} chunks from {len(new_papers)} papers, "
+            f"removed {removed} stale chunks."
         )
-        embeddings_abs_chunk = np.vstack(embeddings_abs_chunk)
-        print("Abstract chunks embeddings shape:", embeddings_abs_chunk.shape)
-        # np.save("embeddings_abs_chunk.npy", embeddings_abs_chunk)
-
-        # Create FAISS index (Inner Product sim = cosine sim after normalization)
-        index_abs_chunk = faiss.IndexFlatIP(embeddings_abs_chunk.shape[1])
-
-        # Add vectors to index
-        index_abs_chunk.add(embeddings_abs_chunk)
-        print("FAISS abstract chunk index size:", index_abs_chunk.ntotal)
-        # Save index to disk
-        index_path = os.path.join(config.INDEX_DIR, "abs_chunk.index")
-        faiss.write_index(index_abs_chunk, index_path)
 
-    print("Saved FAISS index to abs.index and abs_chunk.index")
+    print("Saved FAISS index to abs_chunk.index")
 
 
 if __name__ == "__main__":
-    build_abstract_index(chunked=True)
+    build_abstract_index()
@@ -1,69 +1,98 @@
-from sentence_transformers import SentenceTransformer
-from rag.io.text_utils import chunk_text, extract_text_from_pdf
-import numpy as np
-import json
+from rag.io.pdf_extract import iter_extracted_texts
+from rag.io.text_utils import chunk_texts
 import os
-import faiss
 import config
+from rag.collections import get_collection
+from rag.index.streaming import batched, stream_into_index
+from rag.tracing import span, traced_iter
 
-def chunk_papers(papers: list, pdf_dir=config.PDF_DIR, **kwargs):
-    """Chunk full texts from papers into overlapping segments."""
-    paper_chunks = []
-    for paper in papers:
-        paper_id = paper["paperId"]
-
-        pdf_name = f"{paper_id}.pdf"
-        pdf_path = os.path.join(pdf_dir, pdf_name)
-        print(f"\nProcessing PDF: {pdf_path}")
-
-        # Extract full text
-        text = extract_text_from_pdf(pdf_path)
-        if not text or len(text) < 500:
-            print("Warning: PDF text too short, skipping.")
+# shorter extracted texts are treated as failed extractions
+MIN_TEXT_CHARS = 500
+
+
+def iter_paper_chunks(papers: list, pdf_dir=config.PDF_DIR, **kwargs):
+    """
+    Yield chunk dicts paper by paper. PDFs are extracted in background
+    processes (cached by PDF content) while earlier papers are chunked;
+    texts are tokenized in batches of config.CHUNK_BATCH_SIZE papers.
+    """
+    pdf_paths = {
+        p["paperId"]: os.path.join(pdf_dir, f"{p['paperId']}.pdf") for p in papers
+    }
+    paper_ids = {path: pid for pid, path in pdf_paths.items()}
+
+    extracted = iter_extracted_texts(list(pdf_paths.values()))
+    # each step waits for the next batch of PDFs to be extracted
+    batches = traced_iter(
+        batched(extracted, config.CHUNK_BATCH_SIZE),
+        "extract_text_from_pdf",
+        count=len,
+        size=lambda batch: sum(_file_size(path) for path, _ in batch),
+    )
+    for batch in batches:
+        texts = {}
+        for pdf_path, text in batch:
+            print(f"\nProcessing PDF: {pdf_path}")
+            texts[paper_ids[pdf_path]] = text
+
+        for paper_id, chunks in chunk_paper_texts(texts, **kwargs).items():
+            yield from chunks
+            print(f"Added {len(chunks)} chunks for {paper_id}.")
+
+
+def chunk_paper_texts(texts: dict, **kwargs):
+    """
+    Chunk dicts per paper for {paperId: full text}, tokenized in one call.
+    Texts too short to be a paper (failed extraction) are skipped.
+    """
+    usable = {}
+    for paper_id, text in texts.items():
+        if not text or len(text) < MIN_TEXT_CHARS:
+            print(f"Warning: PDF text too short for {paper_id}, skipping.")
             continue
+        usable[paper_id] = text
 
-        # Chunk text
-        chunks = chunk_text(text, **kwargs)
-
-        # Store metadata
-        for i, chunk in enumerate(chunks):
-            paper_chunks.append(
-                {
-                    "paperId": paper_id,
-                    "chunk_id": i,
-                    "text": chunk,
-                }
-            )
+    # Chunk text
+    all_chunks = chunk_texts(list(usable.values()), **kwargs)
 
-        print(f"Added {len(chunks)} chunks.\n")
-    return paper_chunks
+    # Store metadata
+    return {
+        paper_id: [
+            {"paperId": paper_id, "chunk_id": i, "text": chunk}
+            for i, chunk in enumerate(chunks)
+        ]
+        for paper_id, chunks in zip(usable, all_chunks)
+    }
 
 
-def build_chunk_index(papers: list, **kwargs):
-    paper_chunks = chunk_papers(papers, config.PDF_DIR, **kwargs)
-    with open("chunks_full.json", "w") as f:
-        json.dump(paper_chunks, f, indent=2)
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
 
-    # embed all chunks
-    chunk_texts = [c["text"] for c in paper_chunks]
-    model = SentenceTransformer(config.SENTENCE_TRANSFORMER_MODEL)
 
-    all_embeddings = model.encode(
-        chunk_texts, convert_to_numpy=True, normalize_embeddings=True
-    )
-    all_embeddings = np.vstack(all_embeddings)
-    print("Paper chunks embeddings shape:", all_embeddings.shape)
+def chunk_papers(papers: list, pdf_dir=config.PDF_DIR, **kwargs):
+    """Chunk full texts from papers into overlapping segments."""
+    return list(iter_paper_chunks(papers, pdf_dir, **kwargs))
 
-    # Build FAISS index
-    index = faiss.IndexFlatIP(all_embeddings.shape[1])
-    index.add(all_embeddings)
 
-    print("FAISS paper index size:", index.ntotal)
+def build_chunk_index(papers: list, collection=None, **kwargs):
+    """
+    Re-chunk the given papers and replace them in the full-text index of a
+    collection. Chunks are streamed through embedding into the index in
+    fixed-size batches, so memory stays flat regardless of the number of papers.
+    """
+    manager = get_collection(collection).manager
+    with span("build_chunk_index", items=len(papers)):
+        with manager.update("papers") as writer:
+            removed = writer.remove_papers(p["paperId"] for p in papers)
+            added = stream_into_index(
+                writer, iter_paper_chunks(papers, config.PDF_DIR, **kwargs)
+            )
+            print(f"Replaced {removed} chunks with {added} new chunks.")
 
-    # Save index
-    index_path = os.path.join(config.INDEX_DIR, "papers.index")
-    faiss.write_index(index, index_path)
-    print(f"Saved FAISS index to {index_path}")
+    print("FAISS paper index size:", manager.get("papers").ntotal)
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,190 @@
+"""
+Compact, columnar chunk store.
+
+A store is a directory of flat arrays plus one UTF-8 text blob:
+
+    uids.npy        int64   stable chunk id (FAISS id), one per row
+    order.npy       int64   argsort of uids, for id -> row lookups
+    paper_idx.npy   int32   row -> position in papers.json
+    chunk_ids.npy   int32   chunk number within the paper
+    offsets.npy     int64   n + 1 byte offsets into text.bin
+    text.bin                concatenated UTF-8 chunk texts
+    papers.json             list of paperIds
+
+Arrays and the blob are memory-mapped, so opening a store costs almost
+nothing and looking up a FAISS result only touches the rows it needs.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from array import array
+
+import numpy as np
+
+
+def chunk_uid(paper_id, chunk_id):
+    """Stable FAISS id for a chunk (non-negative int64)."""
+    digest = hashlib.blake2b(f"{paper_id}:{chunk_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFFFFFFFFFFFFFF
+
+
+def _load_array(path):
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # empty arrays cannot be memory-mapped
+        return np.load(path)
+
+
+class ChunkStore:
+    def __init__(self, path):
+        self.path = path
+        self.uids = _load_array(os.path.join(path, "uids.npy"))
+        self.order = _load_array(os.path.join(path, "order.npy"))
+        self.paper_idx = _load_array(os.path.join(path, "paper_idx.npy"))
+        self.chunk_ids = _load_array(os.path.join(path, "chunk_ids.npy"))
+        self.offsets = _load_array(os.path.join(path, "offsets.npy"))
+        with open(os.path.join(path, "papers.json")) as f:
+            self.papers = json.load(f)
+        text_path = os.path.join(path, "text.bin")
+        if os.path.getsize(text_path) > 0:
+            self.text = np.memmap(text_path, dtype=np.uint8, mode="r")
+        else:
+            self.text = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.uids)
+
+    def rows_for(self, uids):
+        """Row numbers for uids; -1 where a uid is not in the store."""
+        uids = np.asarray(uids, dtype="int64")
+        if len(self.uids) == 0:
+            return np.full(len(uids), -1, dtype="int64")
+        pos = np.searchsorted(self.uids, uids, sorter=self.order)
+        pos = np.minimum(pos, len(self.order) - 1)
+        rows = np.asarray(self.order[pos])
+        return np.where(self.uids[rows] == uids, rows, -1)
+
+    def __contains__(self, uid):
+        return self.rows_for([uid])[0] >= 0
+
+    def text_bytes(self, row):
+        """Zero-copy view of a chunk's UTF-8 bytes."""
+        return memoryview(self.text[self.offsets[row] : self.offsets[row + 1]])
+
+    def get(self, row):
+        return {
+            "paperId": self.papers[self.paper_idx[row]],
+            "chunk_id": int(self.chunk_ids[row]),
+            "text": bytes(self.text_bytes(row)).decode("utf-8"),
+        }
+
+    def lookup(self, uids):
+        """Chunk dicts for FAISS result ids, skipping empty (-1) and unknown ids."""
+        uids = [u for u in uids if u >= 0]
+        return [self.get(r) for r in self.rows_for(uids) if r >= 0]
+
+    def paper_ids(self):
+        return {self.papers[i] for i in np.unique(self.paper_idx)}
+
+    def paper_mask(self, paper_ids):
+        """Boolean row mask for chunks belonging to paper_ids."""
+        paper_ids = set(paper_ids)
+        wanted = [i for i, pid in enumerate(self.papers) if pid in paper_ids]
+        return np.isin(self.paper_idx, wanted)
+
+    def uids_for_papers(self, paper_ids):
+        return np.asarray(self.uids[self.paper_mask(paper_ids)])
+
+    def iter_rows(self, mask=None):
+        """Yield (uid, paperId, chunk_id, text bytes) for every (masked) row."""
+        rows = range(len(self)) if mask is None else np.flatnonzero(mask)
+        for row in rows:
+            yield (
+                int(self.uids[row]),
+                self.papers[self.paper_idx[row]],
+                int(self.chunk_ids[row]),
+                self.text_bytes(row),
+            )
+
+
+class ChunkStoreWriter:
+    """Streams rows into a new store; call close() to finish it."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._text = open(os.path.join(path, "text.bin"), "wb")
+        self._uids = array("q")
+        self._paper_idx = array("i")
+        self._chunk_ids = array("i")
+        self._offsets = array("q", [0])
+        self._papers = {}
+
+    def __len__(self):
+        return len(self._uids)
+
+    def add(self, uid, paper_id, chunk_id, text):
+        """Append one chunk; text may be str or UTF-8 bytes."""
+        data = text.encode("utf-8") if isinstance(text, str) else bytes(text)
+        self._text.write(data)
+        self._uids.append(uid)
+        self._paper_idx.append(self._papers.setdefault(paper_id, len(self._papers)))
+        self._chunk_ids.append(chunk_id)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def add_chunk(self, chunk):
+        self.add(
+            chunk_uid(chunk["paperId"], chunk["chunk_id"]),
+            chunk["paperId"],
+            chunk["chunk_id"],
+            chunk["text"],
+        )
+
+    def close(self):
+        self._text.close()
+        uids = np.array(self._uids, dtype="int64")
+        np.save(os.path.join(self.path, "uids.npy"), uids)
+        np.save(os.path.join(self.path, "order.npy"), np.argsort(uids, kind="stable"))
+        np.save(
+            os.path.join(self.path, "paper_idx.npy"),
+            np.array(self._paper_idx, dtype="int32"),
+        )
+        np.save(
+            os.path.join(self.path, "chunk_ids.npy"),
+            np.array(self._chunk_ids, dtype="int32"),
+        )
+        np.save(
+            os.path.join(self.path, "offsets.npy"),
+            np.array(self._offsets, dtype="int64"),
+        )
+        with open(os.path.join(self.path, "papers.json"), "w") as f:
+            json.dump(list(self._papers), f)
+        return ChunkStore(self.path)
+
+
+def convert_json(json_path, out_dir):
+    """
+    Convert a chunks JSON file (list of {paperId, chunk_id, text}, e.g.
+    chunks_full.json) or JSON-lines file into a chunk store. Row order is
+    preserved, so row i still matches row i of an index built from the file.
+    """
+    writer = ChunkStoreWriter(out_dir)
+    with open(json_path) as f:
+        if json_path.endswith(".jsonl"):
+            chunks = (json.loads(line) for line in f)
+        else:
+            chunks = json.load(f)
+        for c in chunks:
+            uid = c.get("uid", chunk_uid(c["paperId"], c["chunk_id"]))
+            writer.add(uid, c["paperId"], c["chunk_id"], c["text"])
+    store = writer.close()
+    print(f"Converted {len(store)} chunks from {json_path} to {out_dir}")
+    return store
+
+
+if __name__ == "__main__":
+    # python -m rag.index.chunk_store data/chunks_full.json data/chunk_store_full
+    convert_json(sys.argv[1], sys.argv[2])
@@ -0,0 +1,258 @@
+"""
+Content-addressed, on-disk cache of chunk embeddings.
+
+Embeddings are keyed by (model name, inference backend, sha1 of the chunk
+text). Each model and backend gets its own directory holding an append-only
+matrix (read back as a memory map) and a key file mapping text hashes to
+matrix rows:
+
+    data/embed_cache/<model>@<backend>/vectors.f32
+    data/embed_cache/<model>@<backend>/keys.txt    # "<sha1> <row>" per line
+    data/embed_cache/<model>@<backend>/meta.json   # dim, dtype, model, backend
+
+The storage dtype (``config.EMBED_CACHE_DTYPE``) is fixed when a cache is
+created: float32, float16 (vectors.f16, half the size) or int8 (vectors.i8
+plus a float32 scale per row in scales.f32, a quarter of the size).
+Vectors are always returned as float32.
+
+Appends hold a lock file in the model directory (see rag.locks), so the app
+and the HTTP service can share a cache: under the lock each writer picks up
+rows and keys appended by others before numbering its own rows.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+import config
+from rag.locks import file_lock
+from rag.models import get_embedder, model_id
+from rag.tracing import span
+
+DTYPES = {"float32": "f32", "float16": "f16", "int8": "i8"}
+
+
+def text_hash(text):
+    """Stable content hash of a chunk text (str or UTF-8 bytes)."""
+    data = text.encode("utf-8") if isinstance(text, str) else bytes(text)
+    return hashlib.sha1(data).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name=None, cache_dir=None, dtype=None, backend=None):
+        self.model_name = model_name or config.SENTENCE_TRANSFORMER_MODEL
+        self.backend = backend or config.INFERENCE_BACKEND
+        cache_dir = cache_dir or config.EMBED_CACHE_DIR
+        dirname = model_id(self.model_name, self.backend)
+        self.path = os.path.join(cache_dir, re.sub(r"[^\w.@-]", "_", dirname))
+        self.keys_path = os.path.join(self.path, "keys.txt")
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.scales_path = os.path.join(self.path, "scales.f32")
+
+        self.dim = None
+        self.dtype = dtype or config.EMBED_CACHE_DTYPE
+        self.rows = {}
+        self._keys_offset = 0  # bytes of keys.txt read so far
+        self._vectors = None
+        self._scales = None
+        self._lock = threading.Lock()
+        self._load()
+        if self.dtype not in DTYPES:
+            raise ValueError(
+                f"Unknown cache dtype {self.dtype!r}, expected one of {list(DTYPES)}"
+            )
+
+    @property
+    def vectors_path(self):
+        return os.path.join(self.path, f"vectors.{DTYPES[self.dtype]}")
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        # an existing cache keeps the dtype it was created with
+        self.dim = meta["dim"]
+        self.dtype = meta.get("dtype", "float32")
+        self._read_keys()
+
+    def _read_keys(self):
+        """Add the keys.txt lines written since the last read."""
+        if not os.path.exists(self.keys_path):
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        # a line still being written by another process is read next time
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8").splitlines():
+            parts = line.split()
+            if len(parts) == 2:
+                self.rows[parts[0]] = int(parts[1])
+        self._keys_offset += end
+
+    def _n_rows(self):
+        if self.dim is None or not os.path.exists(self.vectors_path):
+            return 0
+        itemsize = np.dtype(self.dtype).itemsize
+        return os.path.getsize(self.vectors_path) // (self.dim * itemsize)
+
+    def _matrix(self):
+        """Memory-mapped view of all cached vectors, in the storage dtype."""
+        n = self._n_rows()
+        if n == 0:
+            return None
+        if self._vectors is None or self._vectors.shape[0] != n:
+            self._vectors = np.memmap(
+                self.vectors_path, dtype=self.dtype, mode="r", shape=(n, self.dim)
+            )
+            if self.dtype == "int8":
+                self._scales = np.memmap(
+                    self.scales_path, dtype="float32", mode="r", shape=(n,)
+                )
+        return self._vectors
+
+    def _decode(self, rows):
+        """float32 vectors for matrix rows."""
+        vectors = np.asarray(self._matrix()[rows], dtype="float32")
+        if self.dtype == "int8":
+            vectors *= np.asarray(self._scales[rows])[:, None]
+        return vectors
+
+    def _encode(self, vectors):
+        """(storage bytes, scales or None) for float32 vectors."""
+        if self.dtype == "int8":
+            # symmetric per-row quantization: the largest component maps to 127
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            codes = np.rint(vectors / scales[:, None]).astype("int8")
+            return codes.tobytes(), scales.astype("float32")
+        return np.ascontiguousarray(vectors, dtype=self.dtype).tobytes(), None
+
+    def vectors(self):
+        """All cached vectors as float32 (None if the cache is empty)."""
+        n = self._n_rows()
+        if n == 0:
+            return None
+        if self.dtype == "float32":
+            return self._matrix()
+        return self._decode(np.arange(n))
+
+    @property
+    def bytes_per_vector(self):
+        extra = 4 if self.dtype == "int8" else 0
+        return (self.dim or 0) * np.dtype(self.dtype).itemsize + extra
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def get_many(self, keys):
+        """Return an array of vectors for keys that are all present in the cache."""
+        return self._decode([self.rows[k] for k in keys])
+
+    def get_available(self, keys):
+        """(mask of keys present in the cache, their float32 vectors)."""
+        found = np.array([k in self.rows for k in keys], dtype=bool)
+        rows = [self.rows[k] for k, f in zip(keys, found) if f]
+        if not rows:
+            return found, np.zeros((0, self.dim or 0), dtype="float32")
+        return found, self._decode(rows)
+
+    def add(self, keys, vectors):
+        """Append vectors for new keys. Keys already present are ignored."""
+        vectors = np.asarray(vectors, dtype="float32")
+        with self._lock, file_lock(os.path.join(self.path, ".lock")):
+            # another process may have created the cache or appended to it
+            if self.dim is None:
+                self._load()
+            else:
+                self._read_keys()
+            if self.dim is None:
+                os.makedirs(self.path, exist_ok=True)
+                self.dim = vectors.shape[1]
+                # written whole, other processes may be reading it
+                with open(self.meta_path + ".tmp", "w") as f:
+                    json.dump(
+                        {
+                            "dim": self.dim,
+                            "dtype": self.dtype,
+                            "model": self.model_name,
+                            "backend": self.backend,
+                        },
+                        f,
+                    )
+                os.replace(self.meta_path + ".tmp", self.meta_path)
+
+            keep = [i for i, k in enumerate(keys) if k not in self.rows]
+            if not keep:
+                return
+            # rows are numbered by position in the vector file, so trailing
+            # vectors left behind by an interrupted write are simply unused
+            first_row = self._n_rows()
+            data, scales = self._encode(vectors[keep])
+            if scales is not None:
+                # scales are written first, so every vector row has its scale
+                with open(self.scales_path, "r+b" if first_row else "wb") as f:
+                    f.seek(first_row * 4)
+                    f.write(scales.tobytes())
+            with open(self.vectors_path, "ab") as f:
+                f.write(data)
+            with open(self.keys_path, "a") as f:
+                for offset, i in enumerate(keep):
+                    self.rows[keys[i]] = first_row + offset
+                    f.write(f"{keys[i]} {first_row + offset}\n")
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(model_name=None):
+    """Shared cache instance for a model and the current inference backend."""
+    model_name = model_name or config.SENTENCE_TRANSFORMER_MODEL
+    key = (model_name, config.INFERENCE_BACKEND)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(model_name, backend=config.INFERENCE_BACKEND)
+        return _caches[key]
+
+
+def encode_cached(
+    texts, model_name=None, batch_size=64, show_progress_bar=False, log=True
+):
+    """
+    Embed texts, computing only cache misses and reading the rest from disk.
+    Returns a float32 array of normalized embeddings in input order.
+    """
+    cache = get_cache(model_name)
+    keys = [text_hash(t) for t in texts]
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cache and key not in missing:
+            missing[key] = text
+
+    if missing:
+        model = get_embedder(model_name)
+        with span("encode", items=len(missing)):
+            embeddings = model.encode(
+                list(missing.values()),
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=show_progress_bar,
+            )
+        cache.add(list(missing.keys()), embeddings)
+
+    if log:
+        print(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+    if not keys:
+        return np.zeros((0, cache.dim or 0), dtype="float32")
+    return cache.get_many(keys)
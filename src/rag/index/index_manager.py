@@ -0,0 +1,456 @@
+"""
+Versioned, incrementally updatable FAISS indexes.
+
+Each named index ("abs_chunk", "papers") lives in its own directory with one
+sub-directory per version and a CURRENT pointer file:
+
+    data/index/papers/CURRENT          # e.g. "v000004"
+    data/index/papers/v000004/index.faiss
+    data/index/papers/v000004/chunks/  # columnar chunk store
+    data/index/papers/v000004/bm25/    # BM25 inverted index over the chunks
+    data/index/papers/v000004/deleted.npy  # HNSW only: rows masked as removed
+
+Vectors are stored in an ID-mapped index under a stable 63-bit chunk id
+derived from (paperId, chunk_id), so papers can be appended or removed
+without renumbering the rest. A writer builds the next version next to the
+current one and swaps CURRENT atomically; readers pick up the new version on
+their next ``get`` without a restart.
+
+HNSW indexes cannot remove vectors, so removed rows are masked out of
+searches instead and the graph is rebuilt only once more than
+``config.HNSW_MAX_REMOVED`` of it is masked.
+"""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+
+import config
+from rag.index import ann, bm25
+from rag.index.chunk_store import ChunkStore, ChunkStoreWriter, chunk_uid, convert_json
+from rag.index.embed_cache import get_cache, text_hash
+from rag.locks import file_lock
+from rag.tracing import span
+
+
+class IndexSnapshot:
+    """One immutable, loaded version of an index and its chunk store."""
+
+    def __init__(self, name, version, index, store, keyword_index=None, deleted=None):
+        self.name = name
+        self.version = version
+        self.index = index
+        self.store = store
+        self.keyword_index = keyword_index
+        # rows of an HNSW index masked as removed (None: nothing masked)
+        self.deleted = deleted
+        self._id_map = None
+        self._live = None
+        if deleted is not None:
+            self._id_map = faiss.vector_to_array(index.id_map).astype("int64")
+            self._live = np.ones(index.ntotal, dtype=bool)
+            self._live[deleted] = False
+
+    @property
+    def ntotal(self):
+        if self.index is None:
+            return 0
+        return self.index.ntotal - (len(self.deleted) if self.deleted is not None else 0)
+
+    def lookup(self, ids):
+        """Chunk dicts for FAISS result ids, skipping empty (-1) slots."""
+        return self.store.lookup(ids)
+
+    def paper_ids(self):
+        return self.store.paper_ids()
+
+    def uids_for_papers(self, paper_ids):
+        return self.store.uids_for_papers(paper_ids)
+
+    def search(self, query_embs, k, paper_ids=None):
+        """
+        Search the index; optionally restrict results to the given papers.
+        Returns (scores, ids) like ``faiss.Index.search``. Lossy index types
+        over-fetch and re-score against full-precision vectors.
+        """
+        params = None
+        if paper_ids is not None and self.deleted is None:
+            uids = np.ascontiguousarray(self.uids_for_papers(paper_ids), dtype="int64")
+            params = ann.search_params(self.index, faiss.IDSelectorBatch(uids))
+        rescore = config.RESCORE and ann.index_kind(self.index) in ann.LOSSY_TYPES
+        fetch_k = k * config.RESCORE_FACTOR if rescore else k
+        with span("index_search", items=len(query_embs)):
+            if self.deleted is not None:
+                scores, ids = self._search_live(query_embs, fetch_k, paper_ids)
+            else:
+                scores, ids = self.index.search(query_embs, fetch_k, params=params)
+        if rescore:
+            with span("rescore", items=len(query_embs)):
+                scores, ids = self._rescore(query_embs, scores, ids, k)
+        return scores, ids
+
+    def _search_live(self, query_embs, k, paper_ids=None):
+        """
+        Search an HNSW index with masked rows. A removed chunk that was
+        re-added has the same id as its masked row, so the graph is searched
+        by row with a bitmap of live rows and rows are mapped to ids after.
+        """
+        live = self._live
+        if paper_ids is not None:
+            live = live & np.isin(self._id_map, self.uids_for_papers(paper_ids))
+        bitmap = np.packbits(live, bitorder="little")
+        sel = faiss.IDSelectorBitmap(len(live), faiss.swig_ptr(bitmap))
+        inner = faiss.downcast_index(self.index.index)
+        params = faiss.SearchParametersHNSW(sel=sel, efSearch=inner.hnsw.efSearch)
+        scores, rows = inner.search(query_embs, k, params=params)
+        return scores, np.where(rows >= 0, self._id_map[np.maximum(rows, 0)], -1)
+
+    def _rescore(self, query_embs, scores, ids, k):
+        """
+        Top k of each row by exact inner product, using the embedding cache's
+        vectors. Candidates missing from the cache keep their index score.
+        """
+        cache = get_cache()
+        out_scores = np.full((len(ids), k), -np.inf, dtype="float32")
+        out_ids = np.full((len(ids), k), -1, dtype="int64")
+        for i, (query, row_scores, row_ids) in enumerate(zip(query_embs, scores, ids)):
+            valid = row_ids >= 0
+            row_ids, exact = row_ids[valid], row_scores[valid].copy()
+            rows = self.store.rows_for(row_ids)
+            found, vectors = cache.get_available(
+                [text_hash(self.store.text_bytes(r)) for r in rows]
+            )
+            if len(vectors):
+                exact[found] = vectors @ query
+            order = np.argsort(-exact, kind="stable")[:k]
+            out_scores[i, : len(order)] = exact[order]
+            out_ids[i, : len(order)] = row_ids[order]
+        return out_scores, out_ids
+
+    def keyword_search(self, queries, k, paper_ids=None):
+        """
+        BM25 search, optionally restricted to the given papers.
+        Returns one (scores, ids) pair per query, or None if this version
+        has no keyword index.
+        """
+        if self.keyword_index is None:
+            return None
+        mask = self.store.paper_mask(paper_ids) if paper_ids is not None else None
+        results = []
+        with span("bm25_search", items=len(queries)):
+            for query in queries:
+                scores, rows = self.keyword_index.search(query, k, mask)
+                results.append((scores, np.asarray(self.store.uids[rows])))
+        return results
+
+
+class IndexWriter:
+    """
+    Accumulates removals and additions against a base version. New chunks
+    are streamed to a staging chunk store as they are added; commit merges
+    the surviving base rows and staged rows into the new version.
+    """
+
+    def __init__(self, manager, name, base):
+        self.manager = manager
+        self.name = name
+        self.base = base
+        self.index = None
+        self._deleted = None  # HNSW rows masked as removed
+        if base is not None:
+            self.index = faiss.read_index(manager._index_path(name, base.version))
+            if ann.index_kind(self.index) == "hnsw":
+                self._deleted = np.zeros(self.index.ntotal, dtype=bool)
+                if base.deleted is not None:
+                    self._deleted[base.deleted] = True
+
+        self.changed = False
+        self._removed = set()  # base uids no longer present
+        self._removed_papers = set()
+        self.staging_dir = os.path.join(manager._dir(name), f".staging-{uuid.uuid4().hex}")
+        self._staged = ChunkStoreWriter(self.staging_dir)
+        self._staged_rows = {}  # uid -> latest staged row
+        self._staged_papers = {}  # paperId -> staged uids
+
+    @property
+    def ntotal(self):
+        """Vectors in the index, not counting masked HNSW rows."""
+        masked = int(self._deleted.sum()) if self._deleted is not None else 0
+        return self.index.ntotal - masked if self.index is not None else 0
+
+    def paper_ids(self):
+        ids = set()
+        if self.base is not None:
+            ids = self.base.paper_ids() - self._removed_papers
+        return ids | set(self._staged_papers)
+
+    def has_paper(self, paper_id):
+        return paper_id in self.paper_ids()
+
+    def remove_papers(self, paper_ids):
+        paper_ids = set(paper_ids)
+        uids = []
+        if self.base is not None:
+            for uid in self.base.uids_for_papers(paper_ids):
+                if int(uid) not in self._removed:
+                    uids.append(int(uid))
+            self._removed.update(uids)
+            self._removed_papers |= paper_ids
+        for paper_id in paper_ids & set(self._staged_papers):
+            for uid in self._staged_papers.pop(paper_id):
+                del self._staged_rows[uid]
+                uids.append(uid)
+        self._remove_from_index(uids)
+        return len(uids)
+
+    def _remove_from_index(self, uids):
+        if not uids:
+            return
+        self.changed = True
+        kind = ann.index_kind(self.index)
+        if kind == "hnsw":
+            # HNSW graphs cannot drop vectors; mask their rows, see write()
+            id_map = faiss.vector_to_array(self.index.id_map)
+            self._deleted = _grow(self._deleted, len(id_map))
+            self._deleted |= np.isin(id_map, np.array(uids, dtype="int64"))
+            return
+        if kind in ann.IVF_TYPES and isinstance(self.index, faiss.IndexIDMap2):
+            # ID-mapped IVF indexes mis-number ids on removal; rebuild unwrapped
+            self.index = ann.convert(self.index, kind)
+        self.index.remove_ids(np.array(uids, dtype="int64"))
+
+    def add(self, chunks, embeddings):
+        """Add chunk dicts with their (normalized) embeddings."""
+        if len(chunks) == 0:
+            return
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(embeddings.shape[1]))
+
+        uids = [chunk_uid(c["paperId"], c["chunk_id"]) for c in chunks]
+
+        # re-adding a chunk replaces the previous vector
+        replaced = [uid for uid in uids if uid in self._staged_rows]
+        if self.base is not None:
+            rows = self.base.store.rows_for(uids)
+            for uid, row in zip(uids, rows):
+                if row >= 0 and uid not in self._removed:
+                    self._removed.add(uid)
+                    replaced.append(uid)
+        self._remove_from_index(replaced)
+
+        self.index.add_with_ids(embeddings, np.array(uids, dtype="int64"))
+        self.changed = True
+        for uid, c in zip(uids, chunks):
+            self._staged_rows[uid] = len(self._staged)
+            self._staged_papers.setdefault(c["paperId"], set()).add(uid)
+            self._staged.add(uid, c["paperId"], c["chunk_id"], c["text"])
+
+    def write(self, out_dir):
+        """Write the merged index, chunk store and BM25 index to out_dir."""
+        staged = self._staged.close()
+        out = ChunkStoreWriter(os.path.join(out_dir, "chunks"))
+
+        # the BM25 index is carried over from the base version and only the
+        # new chunks are tokenized; versions without one are rebuilt in full
+        keyword_base = None
+        if self.base is not None and self.base.keyword_index is not None:
+            if len(self.base.keyword_index) == len(self.base.store):
+                keyword_base = self.base.keyword_index
+        new_texts = []
+
+        keep = None
+        if self.base is not None:
+            removed = np.fromiter(self._removed, dtype="int64", count=len(self._removed))
+            keep = ~np.isin(self.base.store.uids, removed)
+            for row in self.base.store.iter_rows(keep):
+                out.add(*row)
+                if keyword_base is None:
+                    new_texts.append(row[3])
+        live = np.zeros(len(staged), dtype=bool)
+        live[list(self._staged_rows.values())] = True
+        for row in staged.iter_rows(live):
+            out.add(*row)
+            new_texts.append(row[3])
+        out.close()
+        bm25.write_index(os.path.join(out_dir, "bm25"), new_texts, keyword_base, keep)
+
+        deleted = None
+        if self._deleted is not None and self._deleted.any():
+            dead = _grow(self._deleted, self.index.ntotal)
+            if dead.sum() > config.HNSW_MAX_REMOVED * len(dead):
+                # rebuild the graph from the live rows only
+                print(f"Rebuilding {self.name} index without {dead.sum()} removed vectors")
+                self.index = ann.convert(self.index, keep=~dead)
+                self._deleted = None
+            else:
+                deleted = np.flatnonzero(dead)
+        self.index = ann.maybe_upgrade(self.index)
+        faiss.write_index(self.index, os.path.join(out_dir, "index.faiss"))
+        if deleted is not None:
+            np.save(os.path.join(out_dir, "deleted.npy"), deleted)
+
+    def discard(self):
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+def _grow(mask, n):
+    """Boolean row mask padded with False to n rows (rows added since)."""
+    return np.concatenate([mask, np.zeros(n - len(mask), dtype=bool)])
+
+
+class IndexManager:
+    def __init__(self, index_dir=None, keep_versions=None):
+        self.index_dir = index_dir or config.INDEX_DIR
+        self.keep_versions = keep_versions or config.INDEX_KEEP_VERSIONS
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _index_path(self, name, version):
+        return os.path.join(self._dir(name), version, "index.faiss")
+
+    def _chunks_path(self, name, version):
+        return os.path.join(self._dir(name), version, "chunks")
+
+    def _bm25_path(self, name, version):
+        return os.path.join(self._dir(name), version, "bm25")
+
+    def current_version(self, name):
+        try:
+            with open(os.path.join(self._dir(name), "CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _versions(self, name):
+        if not os.path.isdir(self._dir(name)):
+            return []
+        return sorted(
+            v
+            for v in os.listdir(self._dir(name))
+            if v.startswith("v") and ".tmp" not in v
+        )
+
+    def _load(self, name, version):
+        index = ann.configure_search(faiss.read_index(self._index_path(name, version)))
+        chunks_path = self._chunks_path(name, version)
+        legacy_path = os.path.join(self._dir(name), version, "chunks.jsonl")
+        if not os.path.exists(chunks_path) and os.path.exists(legacy_path):
+            # versions written before the chunk store existed
+            convert_json(legacy_path, chunks_path)
+        keyword_index = None
+        if os.path.exists(self._bm25_path(name, version)):
+            keyword_index = bm25.BM25Index(self._bm25_path(name, version))
+        deleted = None
+        deleted_path = os.path.join(self._dir(name), version, "deleted.npy")
+        if os.path.exists(deleted_path):
+            deleted = np.load(deleted_path)
+        return IndexSnapshot(
+            name, version, index, ChunkStore(chunks_path), keyword_index, deleted
+        )
+
+    def get(self, name):
+        """
+        Current snapshot of an index, reloaded only when a new version has
+        been committed. Returns None if the index was never built.
+        """
+        version = self.current_version(name)
+        snapshot = self._snapshots.get(name)
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        if version is None:
+            return None
+
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._load(name, version)
+                self._snapshots[name] = snapshot
+                print(f"Loaded {name} index {version} ({snapshot.ntotal} vectors)")
+        return snapshot
+
+    @contextmanager
+    def update(self, name):
+        """
+        Open a writer on the current version; a new version is committed
+        when the block exits without an error. Writers of the same index are
+        serialized (threads and processes) from here to the commit, so no
+        update is built on a base another writer is about to replace.
+        """
+        with file_lock(os.path.join(self._dir(name), ".lock")):
+            writer = IndexWriter(self, name, self.get(name))
+            try:
+                yield writer
+                self.commit(writer)
+            finally:
+                writer.discard()
+
+    def commit(self, writer):
+        name = writer.name
+        if writer.index is None or not writer.changed:
+            print(f"Nothing to commit for {name} index")
+            return self.current_version(name)
+
+        versions = self._versions(name)
+        last = int(versions[-1][1:]) if versions else 0
+        version = f"v{last + 1:06d}"
+
+        tmp_dir = os.path.join(self._dir(name), f"{version}.tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir, exist_ok=True)
+        writer.write(tmp_dir)
+        os.rename(tmp_dir, os.path.join(self._dir(name), version))
+
+        # atomic pointer swap; readers see either the old or the new version
+        pointer = os.path.join(self._dir(name), "CURRENT")
+        with open(pointer + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(pointer + ".tmp", pointer)
+        print(f"Committed {name} index {version} ({writer.ntotal} vectors)")
+
+        self._prune(name)
+        return version
+
+    def _prune(self, name):
+        for old in self._versions(name)[: -self.keep_versions]:
+            shutil.rmtree(os.path.join(self._dir(name), old), ignore_errors=True)
+
+    def import_legacy(self, name, index_path, chunks_path, batch_size=None):
+        """
+        Convert a pre-versioning index (row-ordered IndexFlatIP such as
+        papers.index) and its chunks JSON (e.g. chunks_full.json) into a new
+        version of `name`, without re-embedding.
+        """
+        batch_size = batch_size or config.EMBED_BATCH_SIZE
+        legacy = faiss.read_index(index_path)
+        with open(chunks_path) as f:
+            chunks = json.load(f)
+        if len(chunks) != legacy.ntotal:
+            raise ValueError(
+                f"{chunks_path} has {len(chunks)} chunks but {index_path} "
+                f"has {legacy.ntotal} vectors"
+            )
+        with self.update(name) as writer:
+            for start in range(0, legacy.ntotal, batch_size):
+                n = min(batch_size, legacy.ntotal - start)
+                writer.add(chunks[start : start + n], legacy.reconstruct_n(start, n))
+        return self.get(name)
+
+
+_default = None
+
+
+def get_manager():
+    """Process-wide manager for ``config.INDEX_DIR``."""
+    global _default
+    if _default is None:
+        _default = IndexManager()
+    return _default
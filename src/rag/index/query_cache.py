@@ -0,0 +1,148 @@
+"""
+Bounded LRU cache of query embeddings shared by abstract and full-text search.
+
+Queries are keyed by backend-qualified model name (see rag.models.model_id)
+and normalized text (lower-cased, whitespace collapsed; the MiniLM tokenizer is uncased and ignores spacing), so Streamlit
+reruns and the abstract -> full-text hand-off reuse one forward pass. The
+cache can be persisted to an .npz file and reloaded in the next session;
+new entries are saved in the background every QUERY_CACHE_SAVE_EVERY misses
+and at exit, never on the query path.
+"""
+
+import atexit
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import config
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_items=None, path=None):
+        self.max_items = max_items or config.QUERY_CACHE_SIZE
+        self.path = path
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = 0  # entries added since the last save
+        self._saving = False
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            self.load(path)
+        if path:
+            atexit.register(self._save_at_exit)
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, model_name, query):
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            emb = self._items.get(key)
+            if emb is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return emb
+
+    def put(self, model_name, query, embedding):
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            self._items[key] = np.asarray(embedding, dtype="float32")
+            self._items.move_to_end(key)
+            self._dirty += 1
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def save(self, path=None):
+        """
+        Write the cache to an .npz file. Saves are serialized and each writes
+        a temporary file of its own, so concurrent callers never clash.
+        """
+        path = path or self.path
+        if not path:
+            return
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with self._save_lock:
+            with self._lock:
+                if not self._items:
+                    return
+                keys = list(self._items)
+                embs = np.stack([self._items[k] for k in keys])
+                self._dirty = 0
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp.npz")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(
+                        f,
+                        models=np.array([k[0] for k in keys]),
+                        queries=np.array([k[1] for k in keys]),
+                        embeddings=embs,
+                    )
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def save_soon(self):
+        """
+        Save in a background thread once config.QUERY_CACHE_SAVE_EVERY
+        entries were added since the last save (the rest is saved at exit).
+        """
+        with self._lock:
+            if (
+                not self.path
+                or self._saving
+                or self._dirty < config.QUERY_CACHE_SAVE_EVERY
+            ):
+                return
+            self._saving = True
+        threading.Thread(target=self._save_in_background, daemon=True).start()
+
+    def _save_in_background(self):
+        try:
+            self.save()
+        except OSError as e:
+            print(f"Could not save query cache {self.path}: {e}")
+        finally:
+            self._saving = False
+
+    def _save_at_exit(self):
+        if self._dirty:
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Could not save query cache {self.path}: {e}")
+
+    def load(self, path):
+        try:
+            data = np.load(path)
+        except (OSError, ValueError) as e:
+            print(f"Could not load query cache {path}: {e}")
+            return
+        for model_name, query, emb in zip(
+            data["models"], data["queries"], data["embeddings"]
+        ):
+            self.put(str(model_name), str(query), emb)
+        self._dirty = 0
+
+
+_default = None
+
+
+def get_query_cache():
+    """Shared cache, persisted to ``config.QUERY_CACHE_FILE`` if set."""
+    global _default
+    if _default is None:
+        _default = QueryEmbeddingCache(path=config.QUERY_CACHE_FILE)
+    return _default
@@ -0,0 +1,110 @@
+"""
+Cache of cross-encoder scores keyed by (model, query, chunk text hash), where
+the model is qualified by the inference backend (see rag.models.model_id).
+
+Scores live in an in-process LRU backed by a SQLite file, so the same
+(query, chunk) pairs are not re-scored on Streamlit reruns, when abstract
+and full-text searches overlap, or across sessions.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import config
+
+
+def pair_key(model_name, query, text):
+    h = hashlib.sha1()
+    for part in (model_name, query, text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class RerankCache:
+    def __init__(self, path=None, max_items=None):
+        self.path = config.RERANK_CACHE_FILE if path is None else path
+        self.max_items = max_items or config.RERANK_CACHE_SIZE
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS scores "
+                "(key TEXT PRIMARY KEY, score REAL, model TEXT)"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(scores)")]
+            if "model" not in columns:
+                # files written before scores were tagged with their model
+                self._db.execute("ALTER TABLE scores ADD COLUMN model TEXT")
+
+    def _remember(self, key, score):
+        self._lru[key] = score
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys):
+        """{key: score} for the keys found in memory or on disk."""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+                else:
+                    missing.append(key)
+            self.stats["memory_hits"] += len(found)
+
+            if self._db is not None and missing:
+                # stay below SQLite's bound-parameter limit
+                for start in range(0, len(missing), 500):
+                    part = missing[start : start + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, score FROM scores WHERE key IN ({','.join('?' * len(part))})",
+                        part,
+                    ).fetchall()
+                    for key, score in rows:
+                        found[key] = score
+                        self._remember(key, score)
+                        self.stats["disk_hits"] += 1
+            self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, items, model_name=None):
+        """Store (key, score) pairs scored by model_name."""
+        items = [(k, float(s), model_name) for k, s in items]
+        with self._lock:
+            for key, score, _ in items:
+                self._remember(key, score)
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO scores (key, score, model) VALUES (?, ?, ?)",
+                    items,
+                )
+                self._db.commit()
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+
+_default = None
+
+
+def get_rerank_cache():
+    """Shared cache for ``config.RERANK_CACHE_FILE``."""
+    global _default
+    if _default is None:
+        _default = RerankCache()
+    return _default
@@ -0,0 +1,414 @@
+"""
+Shared retrieve-and-rerank core used by search_abs and search_paper.
+
+Everything works on a batch of queries: one encode call for all queries,
+one FAISS search over the query matrix and one cross-encoder pass over all
+(query, chunk) pairs, sorted by length so each batch pads to similar sizes.
+Single-query search is the same code with a batch of one.
+
+With ``config.HYBRID_SEARCH`` the dense results are fused with BM25 results
+(reciprocal-rank fusion), so keyword-heavy queries (gene names, dataset
+acronyms) are found without a large TOP_K_RAW.
+
+Searches can fan out over several collections: retrieval runs per collection
+in parallel, the candidates are merged (by fused rank with hybrid search,
+else by bi-encoder score) and reranked in one shared pass, so final scores
+are comparable across collections.
+
+Cross-encoder scores are cached (see rerank_cache). With
+``config.RERANK_ADAPTIVE`` the candidate set is also pruned using the
+bi-encoder scores, and reranking stops once the top_k_final set is settled.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import config
+from rag.collections import get_collection
+from rag.index.query_cache import get_query_cache
+from rag.index.rerank_cache import get_rerank_cache, pair_key
+from rag.models import get_embedder, get_reranker, model_id
+from rag.tracing import bind, span, trace
+
+# counters since process start, see rerank_stats(); searches run in threads
+_stats = {"pairs": 0, "scored": 0, "cached": 0, "skipped": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(**counts):
+    with _stats_lock:
+        for key, n in counts.items():
+            _stats[key] += n
+
+
+def encode_queries(queries, show_progress_bar=False):
+    """
+    Normalized float32 query embeddings, one row per query. Repeated queries
+    are served from the query embedding cache without a forward pass; the
+    cache key is normalized, the text sent to the model is not.
+    """
+    model_name = model_id(config.SENTENCE_TRANSFORMER_MODEL)
+    cache = get_query_cache() if config.QUERY_CACHE else None
+    embs = [cache.get(model_name, q) if cache is not None else None for q in queries]
+
+    missing = [i for i, emb in enumerate(embs) if emb is None]
+    if missing:
+        texts = [queries[i] for i in missing]
+        with span("encode_queries", items=len(texts)):
+            new_embs = get_embedder().encode(
+                texts,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=show_progress_bar,
+            )
+        for i, emb in zip(missing, new_embs):
+            embs[i] = emb
+            if cache is not None:
+                cache.put(model_name, queries[i], emb)
+        if cache is not None:
+            cache.save_soon()
+
+    return np.ascontiguousarray(np.stack(embs), dtype="float32")
+
+
+def rerank(pairs, batch_size=None):
+    """
+    Cross-encoder scores for [query, text] pairs, in input order. Pairs are
+    scored in length-sorted batches to minimise padding.
+    """
+    scores = np.empty(len(pairs), dtype="float32")
+    if not pairs:
+        return scores
+    batch_size = batch_size or config.RERANK_BATCH_SIZE
+
+    # look up cached scores first
+    cache = get_rerank_cache() if config.RERANK_CACHE else None
+    todo = list(range(len(pairs)))
+    if cache is not None:
+        model_name = model_id(config.CROSS_ENCODER_MODEL)
+        keys = [pair_key(model_name, q, t) for q, t in pairs]
+        cached = cache.get_many(keys)
+        todo = [i for i in todo if keys[i] not in cached]
+        for i, key in enumerate(keys):
+            if key in cached:
+                scores[i] = cached[key]
+
+    if todo:
+        order = sorted(todo, key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        with span("rerank", items=len(order)):
+            sorted_scores = get_reranker().predict(
+                [pairs[i] for i in order],
+                batch_size=batch_size,
+                show_progress_bar=False,
+            )
+        scores[order] = sorted_scores
+        if cache is not None:
+            cache.put_many(((keys[i], scores[i]) for i in order), model_name)
+
+    _count(pairs=len(pairs), scored=len(todo), cached=len(pairs) - len(todo))
+    return scores
+
+
+def prune_candidates(bi_scores, top_k_final):
+    """
+    Number of candidates, best bi-encoder score first, worth reranking:
+    candidates scoring more than RERANK_MARGIN below the best one are
+    dropped, keeping at least max(top_k_final, RERANK_MIN_CANDIDATES).
+    bi_scores need not be sorted (fused lists are in RRF order).
+    """
+    keep = max(top_k_final, config.RERANK_MIN_CANDIDATES)
+    if len(bi_scores) <= keep:
+        return len(bi_scores)
+    close = int(np.sum(bi_scores >= np.max(bi_scores) - config.RERANK_MARGIN))
+    return max(keep, close)
+
+
+def rerank_candidates(queries, candidates, bi_scores, top_k_final, adaptive=None):
+    """
+    Cross-encoder scores for each query's candidates, in input order.
+    Adaptive reranking visits candidates by descending bi-encoder score;
+    candidates it skips score -inf.
+    """
+    adaptive = config.RERANK_ADAPTIVE if adaptive is None else adaptive
+    if not adaptive:
+        pairs = [[q, c["text"]] for q, cands in zip(queries, candidates) for c in cands]
+        scores = rerank(pairs)
+        out, start = [], 0
+        for cands in candidates:
+            out.append(scores[start : start + len(cands)])
+            start += len(cands)
+        return out
+
+    out = [np.full(len(cands), -np.inf, dtype="float32") for cands in candidates]
+    orders = [np.argsort(-np.asarray(b), kind="stable") for b in bi_scores]
+    limits = [prune_candidates(b, top_k_final) for b in bi_scores]
+    done = [0] * len(queries)
+    step = max(config.RERANK_STEP, 1)
+
+    # rerank in rounds of `step` candidates per query, in bi-encoder order;
+    # a query stops once a whole round leaves its top_k_final set unchanged
+    active = [i for i in range(len(queries)) if limits[i] > 0]
+    while active:
+        spans = []
+        pairs = []
+        for i in active:
+            # first round covers the would-be top_k_final set in one go
+            end = min(limits[i], done[i] + max(step, top_k_final - done[i]))
+            spans.append((i, done[i], end))
+            pairs.extend(
+                [queries[i], candidates[i][j]["text"]] for j in orders[i][done[i] : end]
+            )
+        scores = rerank(pairs)
+
+        next_active = []
+        pos = 0
+        for i, start, end in spans:
+            before = set(np.argsort(out[i])[-top_k_final:]) if start else None
+            out[i][orders[i][start:end]] = scores[pos : pos + end - start]
+            pos += end - start
+            done[i] = end
+            settled = before is not None and set(
+                np.argsort(out[i])[-top_k_final:]
+            ) == before
+            if end < limits[i] and not (config.RERANK_STOP_EARLY and settled):
+                next_active.append(i)
+        active = next_active
+
+    _count(skipped=sum(len(c) - d for c, d in zip(candidates, done)))
+    return out
+
+
+def rerank_stats():
+    """Pairs seen, scored by the model, served from cache and skipped."""
+    with _stats_lock:
+        stats = dict(_stats)
+    cache = get_rerank_cache() if config.RERANK_CACHE else None
+    stats["cache_hit_rate"] = cache.hit_rate() if cache is not None else 0.0
+    return stats
+
+
+def reciprocal_rank_fusion(rankings, k=None, rrf_k=None):
+    """
+    Fuse ranked id lists by summing 1 / (rrf_k + rank) over the lists.
+    Returns up to k (ids, fused scores), best first.
+    """
+    rrf_k = config.RRF_K if rrf_k is None else rrf_k
+    fused = {}
+    for ranking in rankings:
+        for rank, uid in enumerate(ranking, start=1):
+            fused[int(uid)] = fused.get(int(uid), 0.0) + 1.0 / (rrf_k + rank)
+    ids = sorted(fused, key=fused.get, reverse=True)[:k]
+    return ids, [fused[uid] for uid in ids]
+
+
+def fuse_hybrid(dense_ids, dense_scores, keyword_ids, k):
+    """
+    Top-k fused candidate ids with bi-encoder scores for adaptive pruning.
+    Candidates found only by BM25 get the lowest dense score of the list.
+    """
+    ids, _ = reciprocal_rank_fusion([dense_ids, keyword_ids], k)
+    dense = dict(zip(dense_ids.tolist(), dense_scores.tolist()))
+    floor = min(dense_scores) if len(dense_scores) else 0.0
+    scores = np.array([dense.get(uid, floor) for uid in ids], dtype="float32")
+    return np.array(ids, dtype="int64"), scores
+
+
+def aggregate(candidates, reranker_scores, top_k_final):
+    """Group the top reranked chunks by paper, best score first."""
+    top_indices = reranker_scores.argsort()[-top_k_final:][::-1]
+
+    top_papers = {}
+    for idx in top_indices:
+        entry = candidates[idx]
+        paper_id = entry["paperId"]
+
+        if paper_id not in top_papers:
+            top_papers[paper_id] = {
+                "paperId": paper_id,
+                "score": reranker_scores[idx],
+                "chunk_ids": [],
+                "chunk_texts": [],
+                "chunk_scores": [],
+            }
+            if "collection" in entry:
+                top_papers[paper_id]["collection"] = entry["collection"]
+        top_papers[paper_id]["score"] = max(
+            float(reranker_scores[idx]), top_papers[paper_id]["score"]
+        )
+        top_papers[paper_id]["chunk_ids"].append(entry["chunk_id"])
+        top_papers[paper_id]["chunk_texts"].append(entry["text"])
+        top_papers[paper_id]["chunk_scores"].append(float(reranker_scores[idx]))
+    return list(top_papers.values())
+
+
+def retrieve(snapshot, queries, query_embs, top_k_raw, paper_ids=None):
+    """
+    Candidate chunk dicts and bi-encoder scores per query from one index
+    snapshot: one FAISS search over the query matrix, fused with BM25 if
+    enabled.
+    """
+    hybrid = config.HYBRID_SEARCH and snapshot.keyword_index is not None
+    distances, indices = snapshot.search(query_embs, k=top_k_raw, paper_ids=paper_ids)
+    keyword = snapshot.keyword_search(queries, top_k_raw, paper_ids) if hybrid else None
+    candidates, bi_scores = [], []
+    for i, (dist_row, id_row) in enumerate(zip(distances, indices)):
+        found = id_row >= 0
+        ids, scores = id_row[found], dist_row[found]
+        if keyword is not None:
+            ids, scores = fuse_hybrid(ids, scores, keyword[i][1], top_k_raw)
+        candidates.append(snapshot.lookup(ids))
+        bi_scores.append(scores)
+    return candidates, bi_scores
+
+
+def merge_candidates(shards, top_k_raw, by_rank=None):
+    """
+    Merge per-collection (name, candidates, bi_scores) results into the
+    top_k_raw candidates per query. Chunks are tagged with their collection;
+    a chunk found in several collections is kept once.
+
+    With hybrid search each shard list is in fused (RRF) order and BM25-only
+    hits carry the shard's lowest dense score, so the shard lists are merged
+    by running RRF over them; otherwise (by_rank=False) by bi-encoder score,
+    which is comparable across collections.
+    """
+    by_rank = config.HYBRID_SEARCH if by_rank is None else by_rank
+    n_queries = len(shards[0][1])
+    candidates, bi_scores = [], []
+    for i in range(n_queries):
+        pooled = [
+            (float(score), name, cand)
+            for name, shard_candidates, shard_scores in shards
+            for cand, score in zip(shard_candidates[i], shard_scores[i])
+        ]
+        keys = [(cand["paperId"], cand["chunk_id"]) for _, _, cand in pooled]
+        if by_rank:
+            # one ranking per shard, a chunk in several shards fuses into one
+            first = {}
+            for pos, key in enumerate(keys):
+                first.setdefault(key, pos)
+            rankings, start = [], 0
+            for _, shard_candidates, _ in shards:
+                stop = start + len(shard_candidates[i])
+                rankings.append([first[key] for key in keys[start:stop]])
+                start = stop
+            order, _ = reciprocal_rank_fusion(rankings, top_k_raw)
+        else:
+            order = sorted(range(len(pooled)), key=lambda pos: -pooled[pos][0])
+
+        seen = set()
+        merged, scores = [], []
+        for pos in order:
+            if keys[pos] in seen:
+                continue
+            seen.add(keys[pos])
+            score, name, cand = pooled[pos]
+            merged.append({**cand, "collection": name})
+            scores.append(score)
+            if len(merged) == top_k_raw:
+                break
+        candidates.append(merged)
+        bi_scores.append(np.array(scores, dtype="float32"))
+    return candidates, bi_scores
+
+
+def search_batch(
+    index_name,
+    queries,
+    top_k_raw,
+    top_k_final,
+    paper_ids=None,
+    show_progress_bar=False,
+    collection=None,
+):
+    """
+    Retrieve and rerank for many queries at once against a named index.
+    Returns one result list (papers with scores and chunks) per query.
+
+    `collection` is a collection name (None for the default collection) or a
+    list of names to search together; results from a list of collections
+    carry the name of the collection they came from.
+
+    Each call is traced as one request (see rag.tracing) when tracing is on.
+    """
+    with trace(f"search_{index_name}", queries=len(queries)):
+        return _search_batch(
+            index_name,
+            queries,
+            top_k_raw,
+            top_k_final,
+            paper_ids,
+            show_progress_bar,
+            collection,
+        )
+
+
+def _search_batch(
+    index_name,
+    queries,
+    top_k_raw,
+    top_k_final,
+    paper_ids,
+    show_progress_bar,
+    collection,
+):
+    fan_out = isinstance(collection, (list, tuple))
+    collections = [get_collection(c) for c in (collection if fan_out else [collection])]
+
+    # current index versions; pick up rebuilds without a restart
+    shards = [(c.name, c.manager.get(index_name)) for c in collections]
+    missing = [name for name, snapshot in shards if snapshot is None]
+    shards = [(name, snapshot) for name, snapshot in shards if snapshot is not None]
+    if not shards:
+        raise FileNotFoundError(f"Index {index_name!r} not built yet.")
+    if missing:
+        print(f"Index {index_name!r} not built yet in collections {missing}")
+    if not queries:
+        return []
+
+    # 1. embed all queries in one batch
+    query_embs = encode_queries(queries, show_progress_bar)
+
+    # 2. retrieve candidates, in parallel across collections
+    if not fan_out:
+        candidates, bi_scores = retrieve(
+            shards[0][1], queries, query_embs, top_k_raw, paper_ids
+        )
+    else:
+        workers = min(len(shards), config.SEARCH_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(
+                bind(
+                    lambda shard: retrieve(
+                        shard[1], queries, query_embs, top_k_raw, paper_ids
+                    )
+                ),
+                shards,
+            )
+            per_shard = [
+                (name, cands, scores)
+                for (name, _), (cands, scores) in zip(shards, results)
+            ]
+        candidates, bi_scores = merge_candidates(per_shard, top_k_raw)
+
+    # 3. rerank (query, chunk) pairs, cached and optionally pruned
+    # the counts go to the trace; with concurrent searches they also include
+    # pairs other threads reranked meanwhile
+    with span("rerank_candidates") as s:
+        with _stats_lock:
+            before = dict(_stats)
+        scores = rerank_candidates(queries, candidates, bi_scores, top_k_final)
+        with _stats_lock:
+            delta = {k: _stats[k] - before[k] for k in _stats}
+        s.add(items=delta["pairs"])
+        s.annotate(
+            scored=delta["scored"], cached=delta["cached"], skipped=delta["skipped"]
+        )
+
+    # 4. aggregate into papers per query
+    return [
+        aggregate(cands, query_scores, top_k_final)
+        for cands, query_scores in zip(candidates, scores)
+    ]
@@ -0,0 +1,79 @@
+"""
+Helpers for streaming chunks through embedding and into an index writer in
+fixed-size batches, so peak memory does not grow with the corpus.
+"""
+
+import queue
+import threading
+from itertools import islice
+
+import config
+from rag.index.embed_cache import encode_cached
+from rag.tracing import bind, span
+
+_DONE = object()
+
+
+def batched(iterable, n):
+    """Yield lists of up to n items."""
+    it = iter(iterable)
+    while batch := list(islice(it, n)):
+        yield batch
+
+
+def prefetch(iterable, maxsize=2):
+    """
+    Run `iterable` in a background thread, at most `maxsize` items ahead of
+    the consumer. Lets the producer (extraction, chunking) overlap with the
+    consumer (embedding). Exceptions are re-raised in the consumer.
+    """
+    q = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                q.put(item)
+            q.put(_DONE)
+        except BaseException as e:
+            q.put(e)
+
+    thread = threading.Thread(target=bind(produce), daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # unblock the producer if the consumer stops early
+        stop.set()
+        while thread.is_alive():
+            try:
+                q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def stream_into_index(writer, chunks, batch_size=None, on_added=None):
+    """
+    Embed chunk dicts batch by batch and add them to an IndexWriter while the
+    next batch is being produced. on_added(batch) is called after each batch
+    is added. Returns the number of chunks added.
+    """
+    batch_size = batch_size or config.EMBED_BATCH_SIZE
+    added = 0
+    for batch in prefetch(batched(chunks, batch_size)):
+        embeddings = encode_cached([c["text"] for c in batch], log=False)
+        with span("index_add", items=len(batch)):
+            writer.add(batch, embeddings)
+        added += len(batch)
+        if on_added is not None:
+            on_added(batch)
+    print(f"Streamed {added} chunks into {writer.name} index")
+    return added
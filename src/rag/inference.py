@@ -0,0 +1,181 @@
+"""
+CPU inference backends for the embedding model and the cross-encoder.
+
+``config.INFERENCE_BACKEND`` selects how models are loaded:
+
+    "torch"       plain PyTorch (the reference)
+    "torch_int8"  PyTorch with Linear layers dynamically quantized to int8
+    "onnx"        ONNX Runtime, via the sentence-transformers onnx backend
+    "onnx_int8"   ONNX Runtime with the int8-quantized model file
+                  ``config.ONNX_INT8_FILE`` from the model repository
+
+``config.INFERENCE_THREADS`` caps the intra-op threads of either runtime.
+With ``config.DYNAMIC_BATCHING`` models are wrapped so inputs are sorted by
+length and cut into batches with a fixed budget of padded tokens: many
+short texts per batch, few long ones, and little padding in either case.
+"""
+
+import numpy as np
+
+import config
+
+BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+# rough characters per token, used to estimate padded batch sizes
+CHARS_PER_TOKEN = 4
+
+
+def _check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown inference backend {backend!r}, expected one of {BACKENDS}"
+        )
+
+
+def set_threads(threads=None):
+    """Limit PyTorch intra-op threads (None leaves the default)."""
+    threads = threads or config.INFERENCE_THREADS
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)
+
+
+def _onnx_kwargs(backend, threads):
+    model_kwargs = {}
+    if backend == "onnx_int8":
+        model_kwargs["file_name"] = config.ONNX_INT8_FILE
+    if threads:
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        model_kwargs["session_options"] = options
+    return model_kwargs
+
+
+def _quantize(module):
+    """Dynamically quantize the Linear layers of a torch module to int8."""
+    import torch
+
+    return torch.quantization.quantize_dynamic(
+        module, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def load_embedder(name, backend=None, threads=None, dynamic_batching=None):
+    """SentenceTransformer on the given backend."""
+    from sentence_transformers import SentenceTransformer
+
+    backend = backend or config.INFERENCE_BACKEND
+    threads = threads or config.INFERENCE_THREADS
+    _check_backend(backend)
+    set_threads(threads)
+
+    if backend.startswith("onnx"):
+        model = SentenceTransformer(
+            name, backend="onnx", model_kwargs=_onnx_kwargs(backend, threads)
+        )
+    else:
+        model = SentenceTransformer(name, device="cpu")
+        if backend == "torch_int8":
+            model = _quantize(model)
+    return _maybe_batched(model, dynamic_batching)
+
+
+def load_reranker(name, backend=None, threads=None, dynamic_batching=None):
+    """CrossEncoder on the given backend."""
+    from sentence_transformers import CrossEncoder
+
+    backend = backend or config.INFERENCE_BACKEND
+    threads = threads or config.INFERENCE_THREADS
+    _check_backend(backend)
+    set_threads(threads)
+
+    if backend.startswith("onnx"):
+        model = CrossEncoder(
+            name, backend="onnx", model_kwargs=_onnx_kwargs(backend, threads)
+        )
+    else:
+        model = CrossEncoder(name, device="cpu")
+        if backend == "torch_int8":
+            model.model = _quantize(model.model)
+    return _maybe_batched(model, dynamic_batching)
+
+
+def _maybe_batched(model, dynamic_batching):
+    if config.DYNAMIC_BATCHING if dynamic_batching is None else dynamic_batching:
+        return LengthBatched(model)
+    return model
+
+
+def length_batches(lengths, max_tokens, max_size):
+    """
+    Split input positions, sorted by descending length, into batches whose
+    padded size (batch size * longest input) stays within max_tokens.
+    """
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    batches, batch, longest = [], [], 0
+    for i in order:
+        n = lengths[i]
+        if batch and (
+            len(batch) >= max_size or (len(batch) + 1) * max(longest, n) > max_tokens
+        ):
+            batches.append(batch)
+            batch, longest = [], 0
+        batch.append(int(i))
+        longest = max(longest, n)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class LengthBatched:
+    """
+    Wraps a SentenceTransformer or CrossEncoder so encode() / predict() run
+    in length-sorted batches with a padded-token budget. The caller's
+    batch_size is ignored in favour of config.BATCH_TOKENS; results come
+    back in input order. Other attributes are passed through to the model.
+    """
+
+    def __init__(self, model, max_tokens=None, max_size=None):
+        self.model = model
+        self.max_tokens = max_tokens or config.BATCH_TOKENS
+        self.max_size = max_size or config.BATCH_MAX_SIZE
+        self.max_length = (
+            getattr(model, "max_seq_length", None)
+            or getattr(model, "max_length", None)
+            or 512
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _length(self, item):
+        chars = len(item) if isinstance(item, str) else sum(len(s) for s in item)
+        return min(self.max_length, chars // CHARS_PER_TOKEN + 2)
+
+    def _run(self, fn, inputs, **kwargs):
+        lengths = [self._length(item) for item in inputs]
+        out = [None] * len(inputs)
+        for batch in length_batches(lengths, self.max_tokens, self.max_size):
+            results = fn(
+                [inputs[i] for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+                **kwargs,
+            )
+            for i, result in zip(batch, results):
+                out[i] = result
+        return out
+
+    def encode(self, sentences, batch_size=None, show_progress_bar=False, **kwargs):
+        if isinstance(sentences, str) or len(sentences) == 0:
+            return self.model.encode(sentences, show_progress_bar=False, **kwargs)
+        out = self._run(self.model.encode, list(sentences), **kwargs)
+        return np.stack(out)
+
+    def predict(self, sentences, batch_size=None, show_progress_bar=False, **kwargs):
+        if len(sentences) == 0:
+            return np.zeros(0, dtype="float32")
+        out = self._run(self.model.predict, list(sentences), **kwargs)
+        return np.asarray(out)
@@ -0,0 +1,205 @@
+"""
+Concurrent PDF downloader.
+
+A thread pool shares one pooled HTTP session; each host gets its own
+concurrency cap (arXiv asks for fewer parallel connections than most
+publishers). Transient failures are retried with backoff, partial files are
+resumed with a Range request, and finished files are moved into place
+atomically so a half-written PDF is never mistaken for a complete one.
+Downloads of the same file (from other threads or processes) take turns
+under a lock next to it, so only one of them writes the partial file.
+Setting the optional `cancel` event stops downloads between chunks (keeping
+the partial file for a later resume) and skips those not started yet.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+
+import config
+from rag.io.http import RETRY_STATUS, backoff_delay, make_session
+from rag.locks import file_lock
+
+
+class RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class PDFDownloader:
+    def __init__(
+        self,
+        session=None,
+        max_workers=None,
+        host_limits=None,
+        default_host_limit=None,
+        retries=None,
+        timeout=None,
+        chunk_size=1 << 16,
+    ):
+        self.max_workers = max_workers or config.DOWNLOAD_WORKERS
+        self.session = session or make_session(self.max_workers)
+        self.host_limits = (
+            config.DOWNLOAD_HOST_LIMITS if host_limits is None else host_limits
+        )
+        self.default_host_limit = default_host_limit or config.DOWNLOAD_DEFAULT_HOST_LIMIT
+        self.retries = config.DOWNLOAD_RETRIES if retries is None else retries
+        self.timeout = timeout or config.DOWNLOAD_TIMEOUT
+        self.chunk_size = chunk_size
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+
+    def _host_slot(self, url):
+        """Semaphore capping concurrent downloads from the url's host."""
+        host = urlparse(url).netloc.lower()
+        with self._slots_lock:
+            if host not in self._slots:
+                limit = self.default_host_limit
+                for suffix, host_limit in self.host_limits.items():
+                    if host == suffix or host.endswith("." + suffix):
+                        limit = host_limit
+                self._slots[host] = threading.BoundedSemaphore(limit)
+            return self._slots[host]
+
+    def _fetch(self, url, part_path, cancel=None):
+        """One attempt; appends to part_path if the server honours Range."""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with self.session.get(
+            url, headers=headers, stream=True, timeout=self.timeout
+        ) as response:
+            if response.status_code == 416 and offset:
+                # nothing left to fetch, the partial file is complete
+                return 0, True
+            if response.status_code in RETRY_STATUS:
+                raise RetryableError(
+                    f"HTTP {response.status_code}",
+                    response.headers.get("Retry-After"),
+                )
+            response.raise_for_status()
+
+            resumed = offset > 0 and response.status_code == 206
+            written = 0
+            with open(part_path, "ab" if resumed else "wb") as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if cancel is not None and cancel.is_set():
+                        raise DownloadCancelled("cancelled")
+                    f.write(chunk)
+                    written += len(chunk)
+            return written, resumed
+
+    def download(self, url, save_path, cancel=None):
+        """
+        Download url to save_path. Returns a dict with ok, bytes, seconds,
+        resumed and error. Stops early once the `cancel` event is set.
+        """
+        result = {"url": url, "ok": False, "bytes": 0, "resumed": False, "error": None}
+        start = time.perf_counter()
+        existed = os.path.exists(save_path)
+        with file_lock(save_path + ".lock"):
+            if not existed and os.path.exists(save_path):
+                # finished by another download while we waited for the lock
+                result.update(ok=True, seconds=time.perf_counter() - start)
+                return result
+            return self._download_locked(url, save_path, result, start, cancel)
+
+    def _download_locked(self, url, save_path, result, start, cancel):
+        part_path = save_path + ".part"
+        # the host slot is held through backoff so a throttled host
+        # is not hit by other workers in the meantime
+        with self._host_slot(url):
+            for attempt in range(self.retries + 1):
+                retry_after = None
+                if cancel is not None and cancel.is_set():
+                    result["error"] = "cancelled"
+                    break
+                try:
+                    written, resumed = self._fetch(url, part_path, cancel)
+                    result["bytes"] += written
+                    result["resumed"] = result["resumed"] or resumed
+                    result["error"] = None
+                    break
+                except RetryableError as e:
+                    result["error"] = str(e)
+                    retry_after = e.retry_after
+                except (
+                    requests.ConnectionError,
+                    requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError,
+                ) as e:
+                    # keep the partial file, the next attempt resumes it
+                    result["error"] = str(e)
+                except Exception as e:
+                    result["error"] = str(e)
+                    break
+                if attempt < self.retries:
+                    delay = backoff_delay(attempt, retry_after)
+                    if cancel is not None:
+                        cancel.wait(delay)
+                    else:
+                        time.sleep(delay)
+
+        result["seconds"] = time.perf_counter() - start
+        if result["error"] is not None:
+            return result
+
+        with open(part_path, "rb") as f:
+            is_pdf = f.read(5) == b"%PDF-"
+        if not is_pdf:
+            # landing pages and paywalls often answer 200 with HTML
+            os.remove(part_path)
+            result["error"] = "response is not a PDF"
+            return result
+
+        os.replace(part_path, save_path)
+        result["ok"] = True
+        return result
+
+    def download_many(self, jobs, on_done=None, cancel=None):
+        """
+        Download (key, url, save_path) jobs concurrently.
+        on_done(key, result) is called as each download finishes.
+        Returns {key: result}.
+        """
+        results = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(self.download, url, path, cancel): key
+                for key, url, path in jobs
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                results[key] = future.result()
+                if on_done is not None:
+                    on_done(key, results[key])
+
+        elapsed = time.perf_counter() - start
+        total_bytes = sum(r["bytes"] for r in results.values())
+        n_ok = sum(r["ok"] for r in results.values())
+        print(
+            f"Downloaded {n_ok}/{len(jobs)} PDFs, {total_bytes / 2**20:.1f} MB "
+            f"in {elapsed:.1f}s ({total_bytes / 2**20 / max(elapsed, 1e-9):.2f} MB/s)"
+        )
+        return results
+
+
+_default = None
+
+
+def get_downloader():
+    """Shared downloader (one connection pool per process)."""
+    global _default
+    if _default is None:
+        _default = PDFDownloader()
+    return _default
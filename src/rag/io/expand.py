@@ -0,0 +1,141 @@
+"""
+Grow a topic corpus from seed papers along the citation graph.
+
+Neighbour ids come from the references/citations endpoints (ids only, so
+edges are cheap); metadata for all new ids is then fetched with the
+``/paper/batch`` endpoint, hundreds of ids per request. Papers already in the
+paper store are never re-fetched. Expansion is breadth-first and stops at a
+depth or paper budget.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from rag.collections import get_collection
+from rag.io.fetch_abs import FIELDS, parse_paper
+from rag.io.s2_client import get_client
+
+BATCH_PATH = "/graph/v1/paper/batch"
+EDGE_PATHS = {
+    "references": ("/graph/v1/paper/{}/references", "citedPaper"),
+    "citations": ("/graph/v1/paper/{}/citations", "citingPaper"),
+}
+
+
+def neighbour_ids(client, paper_id, direction, limit):
+    """Ids of papers cited by (references) or citing (citations) a paper."""
+    path, key = EDGE_PATHS[direction]
+    ids = []
+    offset = 0
+    while offset < limit:
+        page_size = min(1000, limit - offset)
+        data = client.get(
+            path.format(paper_id),
+            {"fields": "paperId", "offset": offset, "limit": page_size},
+        )
+        for edge in data.get("data") or []:
+            pid = (edge.get(key) or {}).get("paperId")
+            if pid:
+                ids.append(pid)
+        if data.get("next") is None:
+            break
+        offset = data["next"]
+    return ids
+
+
+def fetch_metadata(client, paper_ids, batch_size=None):
+    """Raw paper items for ids, batch_size ids per /paper/batch request."""
+    batch_size = batch_size or config.EXPAND_BATCH_SIZE
+    batches = [
+        paper_ids[i : i + batch_size] for i in range(0, len(paper_ids), batch_size)
+    ]
+
+    def fetch(ids):
+        # unknown ids come back as null entries
+        items = client.post(BATCH_PATH, {"fields": FIELDS}, {"ids": ids})
+        return [item for item in items if item]
+
+    with ThreadPoolExecutor(max_workers=client.max_concurrency) as pool:
+        return [item for items in pool.map(fetch, batches) for item in items]
+
+
+def expand_corpus(
+    seed_ids,
+    depth=1,
+    max_papers=None,
+    directions=("references", "citations"),
+    edge_limit=None,
+    client=None,
+    collection=None,
+):
+    """
+    Breadth-first expansion from seed_ids up to `depth` hops, adding at most
+    `max_papers` new papers to the paper store of `collection`.
+    Returns (new papers, stats).
+    """
+    client = client or get_client()
+    store = get_collection(collection).store
+    max_papers = max_papers or config.EXPAND_MAX_PAPERS
+    edge_limit = edge_limit or config.EXPAND_EDGE_LIMIT
+    before = dict(client.stats)
+    start = time.perf_counter()
+
+    stats = {
+        "levels": [],
+        "edges_seen": 0,
+        "already_in_store": 0,
+        "fetched": 0,
+        "no_abstract": 0,
+        "added": 0,
+    }
+    seen = set(seed_ids)
+    added = []
+
+    # seeds themselves, if they are not in the corpus yet
+    missing_seeds = [pid for pid in seed_ids if pid not in store]
+    frontier = list(seed_ids)
+    pending = missing_seeds
+
+    for level in range(depth + 1):
+        if pending:
+            items = fetch_metadata(client, pending)
+            stats["fetched"] += len(items)
+            papers = [p for p in map(parse_paper, items) if p is not None]
+            stats["no_abstract"] += len(items) - len(papers)
+            store.upsert(papers)
+            added.extend(papers)
+            stats["added"] += len(papers)
+
+        if level == depth or not frontier or len(added) >= max_papers:
+            break
+
+        with ThreadPoolExecutor(max_workers=client.max_concurrency) as pool:
+            jobs = [(pid, d) for pid in frontier for d in directions]
+            neighbours = pool.map(
+                lambda job: neighbour_ids(client, job[0], job[1], edge_limit), jobs
+            )
+            candidates = []
+            for ids in neighbours:
+                stats["edges_seen"] += len(ids)
+                for pid in ids:
+                    if pid not in seen:
+                        seen.add(pid)
+                        candidates.append(pid)
+
+        known = [pid for pid in candidates if pid in store]
+        new_ids = [pid for pid in candidates if pid not in store]
+        stats["already_in_store"] += len(known)
+        # papers without abstracts are dropped, so the budget is approximate
+        pending = new_ids[: max_papers - len(added)]
+        # known papers are not re-fetched but their edges are still followed
+        frontier = known + pending
+        stats["levels"].append(
+            {"level": level + 1, "candidates": len(candidates), "new": len(pending)}
+        )
+
+    stats["requests"] = client.stats["requests"] - before["requests"]
+    stats["cache_hits"] = client.stats["cache_hits"] - before["cache_hits"]
+    stats["seconds"] = time.perf_counter() - start
+    print(f"Corpus expansion: {stats}")
+    return added, stats
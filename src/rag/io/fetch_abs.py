@@ -1,47 +1,110 @@
-import requests
-import json
-import config
+from concurrent.futures import ThreadPoolExecutor
+from rag.collections import get_collection
+from rag.io.s2_client import get_client
+from rag.tracing import span
 
-API_URL = "https://api.semanticscholar.org/graph/v1/paper/search"
+SEARCH_PATH = "/graph/v1/paper/search"
+BULK_SEARCH_PATH = "/graph/v1/paper/search/bulk"
+FIELDS = "title,abstract,url,authors,year,citationCount,externalIds,openAccessPdf,isOpenAccess"
 
+# relevance search only serves the first 1000 results (offset + limit)
+RELEVANCE_MAX = 1000
+PAGE_SIZE = 100
 
-def fetch_papers(query, limit=20):
-    params = {
-        "query": query,
-        "limit": limit,
-        "fields": "title,abstract,url,authors,year,citationCount,externalIds,openAccessPdf,isOpenAccess",
+
+def parse_paper(item):
+    """Paper dict in our schema, or None if the paper has no abstract."""
+    # skip papers without abstracts
+    if not item.get("abstract"):
+        return None
+
+    return {
+        "paperId": item["paperId"],
+        "source": "s2",
+        "title": item["title"],
+        "abstract": item["abstract"],
+        "url": item.get("url") or "",
+        "authors": [a["name"] for a in item.get("authors") or []],
+        "year": item.get("year", None),
+        "citationCount": item.get("citationCount") or 0,
+        "arxiv_id": (item.get("externalIds") or {}).get("ArXiv", None),
+        "isOpenAccess": item.get("isOpenAccess", False),
+        "pdf_url": (item.get("openAccessPdf") or {}).get("url", None),
     }
 
-    response = requests.get(API_URL, params=params)
-    response.raise_for_status()
-    data = response.json()
+
+def _search_relevance(client, query, limit):
+    """Ranked results, fetching pages after the first concurrently."""
+    page_size = min(PAGE_SIZE, limit)
+    params = {"query": query, "limit": page_size, "offset": 0, "fields": FIELDS}
+    first = client.get(SEARCH_PATH, params)
+    items = list(first.get("data", []))
+
+    total = min(first.get("total", len(items)), limit, RELEVANCE_MAX)
+    offsets = range(page_size, total, page_size)
+
+    def fetch_page(offset):
+        page = {**params, "offset": offset, "limit": min(page_size, total - offset)}
+        return client.get(SEARCH_PATH, page).get("data", [])
+
+    with ThreadPoolExecutor(max_workers=client.max_concurrency) as pool:
+        # map keeps pages in rank order
+        for page_items in pool.map(fetch_page, offsets):
+            items.extend(page_items)
+    return items[:limit]
+
+
+def _search_bulk(client, query, limit):
+    """Up to millions of results via the token-paginated bulk endpoint."""
+    items = []
+    params = {"query": query, "fields": FIELDS}
+    while len(items) < limit:
+        data = client.get(BULK_SEARCH_PATH, params)
+        items.extend(data.get("data", []))
+        token = data.get("token")
+        if not token:
+            break
+        params = {**params, "token": token}
+    return items[:limit]
+
+
+def fetch_papers(query, limit=20, merge=True, client=None, collection=None):
+    """
+    Fetch up to `limit` papers for a query from Semantic Scholar.
+
+    Up to 1000 results are paged through the relevance search with bounded
+    concurrency; larger requests use bulk search. Responses are cached on
+    disk. With merge=True the papers are upserted into the paper store by
+    paperId (keeping earlier fetches) instead of replacing it. Papers go to
+    the paper store of `collection` (the default collection if None).
+    Returns this query's papers in rank order.
+    """
+    client = client or get_client()
+    with span("fetch_papers") as s:
+        if limit <= RELEVANCE_MAX:
+            items = _search_relevance(client, query, limit)
+        else:
+            items = _search_bulk(client, query, limit)
+        s.add(items=len(items))
 
     papers = []
-    for item in data.get("data", []):
-        # skip papers without abstracts
-        if not item.get("abstract"):
+    seen = set()
+    for item in items:
+        paper = parse_paper(item)
+        if paper is None or paper["paperId"] in seen:
             continue
+        seen.add(paper["paperId"])
+        papers.append(paper)
 
-        papers.append(
-            {
-                "paperId": item["paperId"],
-                "source": "s2",
-                "title": item["title"],
-                "abstract": item["abstract"],
-                "url": item.get("url", ""),
-                "authors": [a["name"] for a in item.get("authors", [])],
-                "year": item.get("year", None),
-                "citationCount": item.get("citationCount", 0),
-                "arxiv_id": item.get("externalIds", {}).get("ArXiv", None),
-                "isOpenAccess": item.get("isOpenAccess", False),
-                "pdf_url": item.get("openAccessPdf", {}).get("url", None),
-            }
-        )
-    # Save results to JSON
-    with open(config.PAPER_FILE, "w") as f:
-        json.dump(papers, f, indent=2)
-
-    print(f"Saved to {config.PAPER_FILE}")
+    # Save results to the paper store
+    store = get_collection(collection).store
+    if merge:
+        added, updated = store.upsert(papers)
+        print(f"Merged into {store.path}: {added} new, {updated} updated")
+    else:
+        store.replace(papers)
+        print(f"Saved to {store.path}")
+    print(f"S2 client stats: {client.stats}")
 
     return papers
 
@@ -50,4 +113,4 @@ def fetch_papers(query, limit=20):
 #     query = input("Enter a research topic to fetch papers: ")
 #     papers = fetch_papers(query, limit=100)
 
-#     print(f"Fetched {len(papers)} papers.")
\ No newline at end of file
+#     print(f"Fetched {len(papers)} papers.")
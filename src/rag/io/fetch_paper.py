@@ -1,17 +1,21 @@
 import os
-import json
-import config
+from rag.io.downloader import get_downloader
+from rag.collections import get_collection
+from rag.tracing import span
 
 
-def lookup_paper_by_id(paper_id: str) -> dict:
+def lookup_paper_by_id(paper_id: str, collection=None) -> dict:
     """
-    Lookup a paper by its paperId in a list of papers.
+    Lookup a paper by its paperId in the paper store of a collection.
     """
-    papers = json.load(open(config.PAPER_FILE))
-    for paper in papers:
-        if paper["paperId"] == paper_id:
-            return paper
-    return None
+    return get_collection(collection).store.get(paper_id)
+
+
+def lookup_papers_by_id(paper_ids: list, collection=None) -> list:
+    """
+    Batch lookup of papers by paperId, in the given order (None if unknown).
+    """
+    return get_collection(collection).store.get_many(paper_ids)
 
 
 def download_pdf(url: str, save_path: str) -> bool:
@@ -19,59 +23,70 @@ def download_pdf(url: str, save_path: str) -> bool:
     Download a PDF from a given URL and save it to the specified path.
     Returns True if successful, False otherwise.
     """
-    import requests
+    result = get_downloader().download(url, save_path)
+    if not result["ok"]:
+        print(f"Error downloading PDF from {url}: {result['error']}")
+    return result["ok"]
 
-    try:
-        response = requests.get(url, stream=True, timeout=10)
-        response.raise_for_status()
 
-        with open(save_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=1024):
-                f.write(chunk)
-        return True
-    except Exception as e:
-        print(f"Error downloading PDF from {url}: {e}")
-        return False
+def pdf_url_for(paper: dict):
+    """
+    Open-access PDF URL of a paper, falling back to arXiv. None if unavailable.
+    """
+    pdf_url = paper.get("pdf_url")
+    if pdf_url:
+        return pdf_url
+    if paper.get("arxiv_id"):
+        return f"https://arxiv.org/pdf/{paper['arxiv_id']}.pdf"
+    return None
 
 
-def download_papers(papers: list, save_dir) -> None:
+def download_papers(papers: list, save_dir, on_done=None, cancel=None) -> list:
     """
-    Given a list of papers, download their PDFs if available.
+    Given a list of papers, download their PDFs concurrently if available.
+    on_done(paper, ok) is called as each paper finishes. Setting the `cancel`
+    event (a threading.Event) stops the remaining downloads.
+    Returns the papers whose PDFs are on disk, in input order.
     """
     os.makedirs(save_dir, exist_ok=True)
-    downloaded_papers = []
+    available = set()
+    jobs = []
+    by_id = {}
     for paper in papers:
-        pdf_url = paper.get("pdf_url")
-        if not pdf_url or len(pdf_url) == 0:
-            print(f"No PDF URL for paper {paper['paperId']} , trying arXiv...")
-            # TODO: fall-back to arXiv fetch if arXiv ID is available
-            if paper.get("arxiv_id"):
-                print(f"Paper has arXiv ID {paper['arxiv_id']}, fetching from arXiv.")
-                # TODO: implement arXiv fetch
-                arxiv_id = paper["arxiv_id"]
-                pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
-            else:
-                print(
-                    f"No arXiv ID available for paper {paper['paperId']}, skipping.\n"
-                )
-                continue
-
-        save_path = os.path.join(save_dir, f"{paper['paperId']}.pdf")
+        paper_id = paper["paperId"]
+        by_id[paper_id] = paper
+        pdf_url = pdf_url_for(paper)
+        if not pdf_url:
+            print(f"No PDF URL or arXiv ID available for paper {paper_id}, skipping.\n")
+            continue
+
+        save_path = os.path.join(save_dir, f"{paper_id}.pdf")
         if os.path.exists(save_path):
-            print(
-                f"PDF for paper {paper['paperId']} already exists, skipping download.\n"
-            )
-            downloaded_papers.append(paper)
+            print(f"PDF for paper {paper_id} already exists, skipping download.\n")
+            available.add(paper_id)
+            if on_done is not None:
+                on_done(paper, True)
             continue
+        jobs.append((paper_id, pdf_url, save_path))
 
-        print(f"Downloading PDF for paper {paper['paperId']}...")
-        success = download_pdf(pdf_url, save_path)
-        if success:
-            print(f"Saved PDF to {save_path}\n")
-            downloaded_papers.append(paper)
+    def _done(paper_id, result):
+        if result["ok"]:
+            print(f"Saved PDF for paper {paper_id} ({result['bytes'] / 1024:.0f} KB)")
+            available.add(paper_id)
         else:
-            print(f"Failed to download PDF for paper {paper['paperId']}\n")
-    return downloaded_papers
+            print(f"Failed to download PDF for paper {paper_id}: {result['error']}")
+        if on_done is not None:
+            on_done(by_id[paper_id], result["ok"])
+
+    if jobs:
+        print(f"Downloading {len(jobs)} PDFs...")
+        with span("download_papers", items=len(jobs)) as s:
+            results = get_downloader().download_many(
+                jobs, on_done=_done, cancel=cancel
+            )
+            s.add(nbytes=sum(r["bytes"] for r in results.values()))
+
+    return [p for p in papers if p["paperId"] in available]
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,43 @@
+"""
+Shared HTTP helpers: pooled sessions, retry backoff and a threaded server.
+"""
+
+import random
+from http.server import ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# status codes worth retrying
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def make_session(pool_size=16):
+    """requests.Session whose connection pool is large enough for pool_size threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "research-assistant/0.1"
+    return session
+
+
+class ThreadedServer(ThreadingHTTPServer):
+    """Thread-per-request HTTP server for many concurrent clients."""
+
+    daemon_threads = True
+    # the default backlog of 5 makes concurrent clients wait for SYN retries
+    request_queue_size = 128
+
+
+def backoff_delay(attempt, retry_after=None, base=1.0, cap=30.0):
+    """
+    Seconds to wait before retry number `attempt` (starting at 0): exponential
+    with full jitter, or the server's Retry-After if it sent one.
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), cap)
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2**attempt))
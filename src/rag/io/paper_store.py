@@ -0,0 +1,111 @@
+"""
+Indexed paper metadata store backed by ``config.PAPER_FILE``.
+
+Papers are held in a dict keyed by paperId and reloaded only when the file's
+mtime changes, so lookups are O(1) instead of a full json.load + scan.
+Writes hold a lock file next to the store (see rag.locks) from reading the
+current papers to replacing the file, so concurrent upserts from threads or
+processes never drop each other's papers.
+"""
+
+import json
+import os
+import threading
+
+import config
+from rag.locks import file_lock
+
+
+class PaperStore:
+    def __init__(self, path=None):
+        self.path = path or config.PAPER_FILE
+        self._papers = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._papers, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.path) as f:
+                papers = json.load(f)
+            self._papers = {p["paperId"]: p for p in papers}
+            self._mtime = mtime
+
+    def get(self, paper_id):
+        """Paper dict for paper_id, or None if unknown."""
+        self._refresh()
+        return self._papers.get(paper_id)
+
+    def get_many(self, paper_ids):
+        """Paper dicts in the order of paper_ids (None for unknown ids)."""
+        self._refresh()
+        return [self._papers.get(pid) for pid in paper_ids]
+
+    def all(self):
+        self._refresh()
+        return list(self._papers.values())
+
+    def __contains__(self, paper_id):
+        self._refresh()
+        return paper_id in self._papers
+
+    def __len__(self):
+        self._refresh()
+        return len(self._papers)
+
+    def upsert(self, papers):
+        """
+        Merge papers into the store by paperId, keeping existing ones.
+        New fields overwrite old ones for papers already present.
+        Returns (n_added, n_updated).
+        """
+        with file_lock(self.path + ".lock"):
+            self._refresh()
+            merged = dict(self._papers)
+            added = updated = 0
+            for paper in papers:
+                pid = paper["paperId"]
+                if pid in merged:
+                    merged[pid] = {**merged[pid], **paper}
+                    updated += 1
+                else:
+                    merged[pid] = paper
+                    added += 1
+            self._write(merged)
+        return added, updated
+
+    def replace(self, papers):
+        """Overwrite the store with exactly these papers."""
+        with file_lock(self.path + ".lock"):
+            self._write({p["paperId"]: p for p in papers})
+
+    def _write(self, papers):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(list(papers.values()), f, indent=2)
+            os.replace(tmp_path, self.path)
+            self._papers = papers
+            self._mtime = os.stat(self.path).st_mtime_ns
+
+
+_stores = {}
+
+
+def get_store(path=None):
+    """Shared store for a paper file (``config.PAPER_FILE`` by default)."""
+    path = path or config.PAPER_FILE
+    if path not in _stores:
+        _stores[path] = PaperStore(path)
+    return _stores[path]
@@ -0,0 +1,206 @@
+"""
+Parallel PDF text extraction with an on-disk cache of cleaned text.
+
+Cleaned text is cached under the sha256 of the PDF bytes plus
+EXTRACTOR_VERSION, so re-indexing a paper skips PyMuPDF entirely and any
+change to extraction or cleanup only needs a version bump.
+"""
+
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+from rag.io.text_utils import extract_text_from_pdf
+from rag.tracing import bind
+
+# bump when extract_text_from_pdf or clean_text change their output
+EXTRACTOR_VERSION = "1"
+
+_FED = object()
+
+
+def pdf_hash(pdf_path):
+    h = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_path(digest):
+    return os.path.join(
+        config.TEXT_CACHE_DIR, f"{digest[:2]}/{digest}-v{EXTRACTOR_VERSION}.txt"
+    )
+
+
+def _read_cache(digest):
+    try:
+        with open(_cache_path(digest), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_cache(digest, text):
+    path = _cache_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # a temp file of its own, threads may cache the same PDF at once
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _cached_text(path):
+    """(digest, cached text or None); digest is None if the file is unreadable."""
+    try:
+        digest = pdf_hash(path)
+    except OSError as e:
+        print(f"PDF file not readable: {path} ({e})")
+        return None, ""
+    return digest, _read_cache(digest)
+
+
+def _store(digest, text):
+    # empty text means the PDF could not be read; retry next time
+    if digest is not None and text:
+        _write_cache(digest, text)
+    return text
+
+
+def iter_extracted_texts(pdf_paths, workers=None):
+    """
+    Yield (pdf_path, cleaned text) in input order while later PDFs are still
+    being extracted. At most two PDFs per worker are in flight, so memory stays
+    bounded however many PDFs are passed. Unreadable PDFs yield "".
+    """
+    workers = workers or config.EXTRACT_WORKERS or os.cpu_count() or 1
+    hits = misses = 0
+
+    if workers == 1:
+        for path in pdf_paths:
+            digest, text = _cached_text(path)
+            if text is None:
+                misses += 1
+                text = _store(digest, extract_text_from_pdf(path))
+            elif digest is not None:
+                hits += 1
+            yield path, text
+        print(f"Text cache: {hits} hits, {misses} extracted")
+        return
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path in pdf_paths:
+            digest, text = _cached_text(path)
+            if text is None:
+                misses += 1
+                try:
+                    text = pool.submit(extract_text_from_pdf, path)
+                except BrokenProcessPool:
+                    text = _store(digest, extract_text_from_pdf(path))
+                pending.append((path, digest, text))
+            else:
+                hits += digest is not None
+                pending.append((path, digest, text))
+
+            # hand back finished results in order, keeping the window bounded
+            while len(pending) > 2 * workers or (
+                pending and not isinstance(pending[0][2], Future)
+            ):
+                yield _resolve(*pending.popleft())
+
+        while pending:
+            yield _resolve(*pending.popleft())
+    print(f"Text cache: {hits} hits, {misses} extracted")
+
+
+def iter_extracted_as_completed(pdf_paths, workers=None):
+    """
+    Yield (pdf_path, cleaned text) as each PDF is extracted, in completion
+    order. pdf_paths may be slow to produce (e.g. PDFs as their downloads
+    finish): it is read in a background thread, so texts come back while
+    later paths are still arriving. Unreadable PDFs yield "".
+    """
+    workers = workers or config.EXTRACT_WORKERS or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers)
+    results = queue.Queue()
+    stop = threading.Event()
+    fed = [0, False]  # paths read so far, all paths read
+    errors = []  # raised while reading pdf_paths
+
+    def feed():
+        try:
+            for path in pdf_paths:
+                if stop.is_set():
+                    break
+                digest, text = _cached_text(path)
+                fed[0] += 1
+                if text is not None:
+                    results.put((path, digest, text))
+                    continue
+                try:
+                    future = pool.submit(extract_text_from_pdf, path)
+                except (BrokenProcessPool, RuntimeError):
+                    # broken (or, after an early stop, shut down) pool
+                    text = _store(digest, extract_text_from_pdf(path))
+                    results.put((path, digest, text))
+                    continue
+                future.add_done_callback(
+                    lambda f, path=path, digest=digest: results.put((path, digest, f))
+                )
+        except BaseException as e:
+            errors.append(e)
+            results.put(e)
+        finally:
+            fed[1] = True
+            results.put(_FED)
+
+    threading.Thread(target=bind(feed), daemon=True).start()
+    received = 0
+    try:
+        while not (fed[1] and received == fed[0]):
+            item = results.get()
+            if item is _FED:
+                continue
+            if isinstance(item, BaseException):
+                raise item
+            received += 1
+            yield _resolve(*item)
+        if errors:
+            # the loop can end before it sees the error in the queue
+            raise errors[0]
+    finally:
+        # an early stop leaves running extractions to finish on their own
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _resolve(path, digest, text_or_future):
+    if not isinstance(text_or_future, Future):
+        return path, text_or_future
+    try:
+        text = text_or_future.result()
+    except BrokenProcessPool:
+        # the parser crashed the worker process; skip this PDF
+        print(f"Extraction worker crashed on {path}, skipping.")
+        return path, ""
+    return path, _store(digest, text)
+
+
+def extract_texts(pdf_paths, workers=None):
+    """
+    Extract cleaned text from many PDFs, spreading cache misses across
+    processes. Returns {pdf_path: text}; missing or unreadable PDFs map to "".
+    """
+    return dict(iter_extracted_texts(pdf_paths, workers))
@@ -0,0 +1,152 @@
+"""
+Semantic Scholar Graph API client.
+
+One pooled session shared by all callers, a global rate limit (minimum
+interval between requests), bounded concurrency, retries with backoff on 429
+and 5xx, and an on-disk response cache with a TTL. The base URL comes from
+``config.S2_API_BASE`` so tests can point it at a local stand-in server.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+import config
+from rag.io.http import RETRY_STATUS, backoff_delay, make_session
+
+
+class S2Client:
+    def __init__(
+        self,
+        base_url=None,
+        api_key=None,
+        session=None,
+        max_concurrency=None,
+        min_interval=None,
+        retries=None,
+        timeout=None,
+        cache_dir=None,
+        cache_ttl=None,
+    ):
+        self.base_url = (base_url or config.S2_API_BASE).rstrip("/")
+        self.api_key = api_key or os.environ.get("S2_API_KEY")
+        self.max_concurrency = max_concurrency or config.S2_MAX_CONCURRENCY
+        self.session = session or make_session(self.max_concurrency)
+        self.min_interval = (
+            config.S2_MIN_INTERVAL if min_interval is None else min_interval
+        )
+        self.retries = config.S2_RETRIES if retries is None else retries
+        self.timeout = timeout or config.S2_TIMEOUT
+        self.cache_dir = config.S2_CACHE_DIR if cache_dir is None else cache_dir
+        self.cache_ttl = config.S2_CACHE_TTL if cache_ttl is None else cache_ttl
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._rate_lock = threading.Lock()
+        self._next_request = 0.0
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "cache_hits": 0, "retries": 0, "errors": 0}
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    # --- response cache ---
+
+    def _cache_path(self, method, path, params, body):
+        key = json.dumps([method, path, params, body], sort_keys=True)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".json")
+
+    def _read_cache(self, cache_path):
+        try:
+            if time.time() - os.path.getmtime(cache_path) > self.cache_ttl:
+                return None
+            with open(cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, cache_path, data):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, cache_path)
+
+    # --- requests ---
+
+    def _wait_for_slot(self):
+        """Space request starts at least min_interval apart across threads."""
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request - now
+            self._next_request = max(now, self._next_request) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def request(self, method, path, params=None, body=None, use_cache=True):
+        """JSON response of an API call, served from the cache when fresh."""
+        cache_path = None
+        if self.cache_dir and use_cache:
+            cache_path = self._cache_path(method, path, params, body)
+            cached = self._read_cache(cache_path)
+            if cached is not None:
+                self._count("cache_hits")
+                return cached
+
+        headers = {"x-api-key": self.api_key} if self.api_key else {}
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        with self._slots:
+            for attempt in range(self.retries + 1):
+                self._wait_for_slot()
+                self._count("requests")
+                retry_after = None
+                try:
+                    response = self.session.request(
+                        method,
+                        url,
+                        params=params,
+                        json=body,
+                        headers=headers,
+                        timeout=self.timeout,
+                    )
+                    if response.status_code not in RETRY_STATUS:
+                        response.raise_for_status()
+                        data = response.json()
+                        break
+                    retry_after = response.headers.get("Retry-After")
+                    error = requests.HTTPError(
+                        f"HTTP {response.status_code} for {url}", response=response
+                    )
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                if attempt == self.retries:
+                    self._count("errors")
+                    raise error
+                self._count("retries")
+                time.sleep(backoff_delay(attempt, retry_after))
+
+        if cache_path is not None:
+            self._write_cache(cache_path, data)
+        return data
+
+    def get(self, path, params=None, **kwargs):
+        return self.request("GET", path, params=params, **kwargs)
+
+    def post(self, path, params=None, body=None, **kwargs):
+        return self.request("POST", path, params=params, body=body, **kwargs)
+
+
+_default = None
+
+
+def get_client():
+    """Shared client for ``config.S2_API_BASE``."""
+    global _default
+    if _default is None:
+        _default = S2Client()
+    return _default
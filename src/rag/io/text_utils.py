@@ -1,23 +1,32 @@
-from sentence_transformers import SentenceTransformer
 import fitz  # PyMuPDF
 import re
-import config as config
+from bisect import bisect_left, bisect_right
+import config
+from rag.tracing import span
+from rag.models import get_tokenizer
+
+_WHITESPACE = re.compile(r"\s+")
+_HYPHEN_BREAK = re.compile(r"-\s+")
+_WORD = re.compile(r"\S+")
+# end of a sentence: terminal punctuation, closing quotes/brackets, whitespace
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
 
 
 def extract_text_from_pdf(pdf_path):
     """
     Extract clean text from a research PDF using PyMuPDF.
+    Returns an empty string if the file is missing or cannot be parsed.
     """
     try:
-        doc = fitz.open(pdf_path)
+        with fitz.open(pdf_path) as doc:
+            pages = [page.get_text() for page in doc]
     except FileNotFoundError:
         print(f"PDF file not found: {pdf_path}")
-
-    pages = []
-
-    for page in doc:
-        text = page.get_text()
-        pages.append(text)
+        return ""
+    except Exception as e:
+        # corrupt or truncated PDFs
+        print(f"Could not read PDF {pdf_path}: {e}")
+        return ""
 
     raw_text = "\n".join(pages)
     cleaned = clean_text(raw_text)
@@ -31,54 +40,128 @@ def clean_text(text):
     """
 
     # Remove repeated whitespace
-    text = re.sub(r"\s+", " ", text)
+    text = _WHITESPACE.sub(" ", text)
 
     # Remove hyphenated line-breaks ("transformer-\nbased" → "transformer based")
-    text = re.sub(r"-\s+", "", text)
+    text = _HYPHEN_BREAK.sub("", text)
 
     # Fix weird unicode dashes
     text = text.replace("–", "-").replace("—", "-")
 
     # Remove multiple spaces again after fixes
-    text = re.sub(r"\s+", " ", text)
+    text = _WHITESPACE.sub(" ", text)
 
     return text.strip()
 
 
-def chunk_text(text, max_tokens=300, overlap=50, tokenize=False):
+def token_offsets(texts, tokenize=True):
     """
-    Chunk text into overlapping segments for embedding & retrieval.
-
-    max_tokens: size of each chunk (~ a few sentences)
-    overlap: how many tokens overlap between chunks
+    (start, end) character offsets of the tokens of each text. Uses one
+    batched call to the fast tokenizer of the embedding model, or whitespace
+    splitting with tokenize=False.
+    """
+    if not tokenize:
+        return [[m.span() for m in _WORD.finditer(text)] for text in texts]
+    encoding = get_tokenizer()(
+        texts,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+        truncation=False,
+        verbose=False,
+    )
+    return encoding["offset_mapping"]
+
+
+def _sentence_starts(text, offsets):
+    """Indices of tokens that start a sentence."""
+    starts = [start for start, _ in offsets]
+    return sorted({bisect_left(starts, m.end()) for m in _SENTENCE_END.finditer(text)})
+
+
+def _slice(text, offsets, first, last):
+    """Text of tokens first..last-1, starting at a word boundary."""
+    # overlapping windows can start on a word piece; skip to the next word
+    while 0 < first < last - 1 and offsets[first][0] == offsets[first - 1][1]:
+        first += 1
+    return text[offsets[first][0] : offsets[last - 1][1]]
+
+
+def token_windows(n_tokens, max_tokens, overlap, sentence_starts=None):
+    """
+    Yield (first, last + 1) token ranges of overlapping windows. With
+    sentence_starts, a window ends at the last sentence start in its second
+    half, if there is one.
     """
-    if tokenize:
-        # Load embedding model
-        model = SentenceTransformer(config.SENTENCE_TRANSFORMER_MODEL)
-        tokenizer = model.tokenizer
-        tokens = tokenizer.encode(text)
-    else:
-        # Basic tokenization by splitting on whitespace
-        tokens = text.split()
-
-    chunks = []
     start = 0
-    while start < len(tokens):
-        end = start + max_tokens
-        chunk_tokens = tokens[start:end]
+    while start < n_tokens:
+        end = min(start + max_tokens, n_tokens)
+        if sentence_starts and end < n_tokens:
+            i = bisect_right(sentence_starts, end) - 1
+            if i >= 0 and sentence_starts[i] > start + max_tokens // 2:
+                end = sentence_starts[i]
+        yield start, end
+        if end == n_tokens:
+            break
+        # move window forward w/ overlap
+        start = max(end - overlap, start + 1)
 
-        if tokenize:
-            chunk_text = tokenizer.decode(chunk_tokens)
-        else:
-            chunk_text = " ".join(chunk_tokens)
-        chunks.append(chunk_text)
 
-        # move window forward w/ overlap
-        start = end - overlap
-        if start < 0:
-            break
+def chunk_texts(
+    texts,
+    max_tokens=None,
+    overlap=None,
+    sentences=None,
+    tokenize=True,
+    batch_size=None,
+):
+    """
+    Chunk many texts into overlapping segments for embedding & retrieval.
+    Returns one list of chunk strings per text.
+
+    Texts are tokenized in batches with character offsets and every chunk is
+    a slice of the original string, so no decoding is needed and each chunk
+    is at most max_tokens model tokens (the model limit minus [CLS]/[SEP] by
+    default).
 
-    return chunks
+    max_tokens: size of each chunk in tokens
+    overlap: how many tokens overlap between chunks
+    sentences: end chunks on sentence boundaries where possible
+    tokenize: count model tokens (True) or whitespace-separated words (False)
+    """
+    max_tokens = max_tokens or config.CHUNK_MAX_TOKENS
+    overlap = config.CHUNK_OVERLAP if overlap is None else overlap
+    sentences = config.CHUNK_SENTENCES if sentences is None else sentences
+    batch_size = batch_size or config.CHUNK_BATCH_SIZE
+
+    all_chunks = []
+    with span("chunk_text", items=len(texts)) as s:
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i : i + batch_size]
+            s.add(nbytes=sum(len(text) for text in batch))
+            for text, offsets in zip(batch, token_offsets(batch, tokenize)):
+                starts = _sentence_starts(text, offsets) if sentences else None
+                all_chunks.append(
+                    [
+                        _slice(text, offsets, first, last)
+                        for first, last in token_windows(
+                            len(offsets), max_tokens, overlap, starts
+                        )
+                    ]
+                )
+    return all_chunks
+
+
+def chunk_text(text, max_tokens=300, overlap=50, tokenize=False, sentences=False):
+    """
+    Chunk a single text into overlapping segments, by whitespace-separated
+    words unless tokenize=True. Keeps its original signature and defaults;
+    the indexing pipeline uses chunk_texts, which counts model tokens.
+    """
+    return chunk_texts(
+        [text], max_tokens, overlap, sentences=sentences, tokenize=tokenize
+    )[0]
 
 
 # if __name__ == "__main__":
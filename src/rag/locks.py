@@ -0,0 +1,43 @@
+"""
+Exclusive locks on files shared by threads and processes.
+
+file_lock(path) serializes every holder of the same lock file: threads of
+this process through an in-process lock, other processes (the Streamlit app
+next to the HTTP service, say) through ``fcntl.flock`` where available.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+_registry_lock = threading.Lock()
+_thread_locks = {}
+
+
+def _thread_lock(path):
+    with _registry_lock:
+        return _thread_locks.setdefault(path, threading.Lock())
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `path` (created if missing) for the block."""
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _thread_lock(path):
+        if fcntl is None:
+            yield
+            return
+        with open(path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
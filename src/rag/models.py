@@ -0,0 +1,125 @@
+"""
+Process-wide registry for the embedding model and the cross-encoder.
+
+Models are loaded on first use and the same instance is handed to every
+caller, so search, indexing and chunking share one copy in memory.
+"""
+
+import threading
+import time
+
+import config
+from rag.tracing import rss_bytes
+
+_lock = threading.Lock()
+_models = {}
+_stats = {}
+
+
+def _load_embedder(name):
+    from rag.inference import load_embedder
+
+    return load_embedder(name)
+
+
+def _load_reranker(name):
+    from rag.inference import load_reranker
+
+    return load_reranker(name)
+
+
+_LOADERS = {
+    "embedder": _load_embedder,
+    "reranker": _load_reranker,
+}
+
+
+def _default_name(kind):
+    if kind == "embedder":
+        return config.SENTENCE_TRANSFORMER_MODEL
+    return config.CROSS_ENCODER_MODEL
+
+
+def get_model(kind, name=None):
+    """Return the shared model of the given kind, loading it on first use."""
+    name = name or _default_name(kind)
+    key = (kind, name)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            rss_before = rss_bytes()
+            start = time.perf_counter()
+            model = _LOADERS[kind](name)
+            _stats[key] = {
+                "kind": kind,
+                "name": name,
+                "backend": config.INFERENCE_BACKEND,
+                "load_seconds": time.perf_counter() - start,
+                "rss_delta_mb": (rss_bytes() - rss_before) / 2**20,
+            }
+            print(
+                f"Loaded {kind} {name} in {_stats[key]['load_seconds']:.2f}s "
+                f"(+{_stats[key]['rss_delta_mb']:.0f} MB RSS)"
+            )
+            _models[key] = model
+    return model
+
+
+def model_id(name, backend=None):
+    """
+    Model name qualified by the inference backend ("name@backend"), for
+    cache keys: vectors and scores from different backends differ slightly
+    and must not be mixed.
+    """
+    return f"{name}@{backend or config.INFERENCE_BACKEND}"
+
+
+def get_embedder(name=None):
+    """Shared SentenceTransformer instance."""
+    return get_model("embedder", name)
+
+
+def get_reranker(name=None):
+    """Shared CrossEncoder instance."""
+    return get_model("reranker", name)
+
+
+def get_tokenizer(name=None):
+    """Tokenizer of the shared embedding model."""
+    return get_embedder(name).tokenizer
+
+
+def warmup(kinds=("embedder", "reranker")):
+    """Load the given models eagerly, e.g. at app or service startup."""
+    for kind in kinds:
+        get_model(kind)
+    return model_stats()
+
+
+def model_stats():
+    """Load time and memory delta for every model loaded so far."""
+    return list(_stats.values())
+
+
+def set_model(kind, model, name=None):
+    """Register a pre-built model instance (useful for stubs and benchmarks)."""
+    name = name or _default_name(kind)
+    with _lock:
+        _models[(kind, name)] = model
+        _stats[(kind, name)] = {
+            "kind": kind,
+            "name": name,
+            "load_seconds": 0.0,
+            "rss_delta_mb": 0.0,
+        }
+
+
+def clear():
+    """Drop all loaded models."""
+    with _lock:
+        _models.clear()
+        _stats.clear()
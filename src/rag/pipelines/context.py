@@ -0,0 +1,205 @@
+"""
+Token-budgeted context packing for the summarizer.
+
+Full-text search returns several chunks per paper, often neighbours that
+share CHUNK_OVERLAP tokens. Before they go into a prompt, per paper:
+
+1. chunks are sorted by chunk_id and neighbours are merged into passages,
+   joining overlapping chunks at their shared text (each chunk is a slice
+   of the paper's text, so the overlap is an exact suffix / prefix);
+2. sentences already present in a higher-scoring passage are dropped;
+3. passages are taken in score order until ``config.CONTEXT_TOKEN_BUDGET``
+   tokens are used; a passage that does not fit is cut to the tokens left
+   at a sentence boundary (or skipped if not even a sentence fits).
+
+Tokens are counted with the LLM's tokenizer (tiktoken, a requirement). The
+embedding model's tokenizer stands in only where tiktoken is not installed,
+as in the offline tests. pack_context reports the tokens saved against the
+verbatim chunks.
+"""
+
+import re
+
+import config
+from rag.io.text_utils import token_offsets
+
+# sentence boundaries used to find duplicated spans
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_SPACE = re.compile(r"\s+")
+
+
+def count_tokens(texts):
+    """
+    Token counts of texts with the LLM's tokenizer. Without tiktoken (offline
+    tests) the counts come from the embedding model's WordPiece tokenizer and
+    are only approximate: it lower-cases text and has a different vocabulary.
+    """
+    if not texts:
+        return []
+    encoding = _llm_encoding()
+    if encoding is not None:
+        return [len(ids) for ids in encoding.encode_batch(texts, disallowed_special=())]
+    return [len(offsets) for offsets in token_offsets(texts)]
+
+
+_encoding = None
+
+
+def _llm_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+        except ImportError:
+            _encoding = False
+        else:
+            try:
+                _encoding = tiktoken.encoding_for_model(config.OPENAI_MODEL_NAME)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+    return _encoding or None
+
+
+def _overlap(a, b, min_chars):
+    """
+    Length of the longest suffix of a that is a prefix of b, or len(b) if
+    b is contained in a; 0 if shorter than min_chars.
+    """
+    if b in a:
+        return len(b)
+    probe = b[:min_chars]
+    if len(probe) < min_chars:
+        return 0
+    pos = a.find(probe, max(0, len(a) - len(b)))
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(probe, pos + 1)
+    return 0
+
+
+def merge_chunks(chunks, min_overlap=None):
+    """
+    Merge (chunk_id, text, score) triples of one paper into passages
+    [first_id, last_id, text, score], in document order. Neighbouring or
+    overlapping chunks become one passage scored by its best chunk.
+    """
+    min_overlap = min_overlap or config.CONTEXT_MIN_OVERLAP
+    passages = []
+    for chunk_id, text, score in sorted(chunks, key=lambda c: c[0]):
+        if passages and chunk_id == passages[-1][1] + 1:
+            last = passages[-1]
+            shared = _overlap(last[2], text, min_overlap)
+            # overlapping text joins at the overlap; plain neighbours abut
+            last[2] = last[2] + text[shared:] if shared else f"{last[2]} {text}"
+            last[1] = chunk_id
+            last[3] = max(last[3], score)
+        else:
+            passages.append([chunk_id, chunk_id, text, score])
+    return passages
+
+
+def _strip_seen(text, seen, min_chars):
+    """text without sentences already in `seen` (which it extends)."""
+    kept = []
+    for sentence in _SENTENCE.split(text):
+        key = _SPACE.sub(" ", sentence).strip().lower()
+        if len(key) >= min_chars:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(sentence)
+    return " ".join(kept).strip()
+
+
+def _truncate(text, max_tokens):
+    """(leading sentences of text within max_tokens tokens, their tokens)."""
+    sentences = _SENTENCE.split(text)
+    n = total = 0
+    for n_tokens in count_tokens(sentences):
+        if total + n_tokens > max_tokens:
+            break
+        total += n_tokens
+        n += 1
+    # joined sentences can count differently from the sum of their parts
+    while n:
+        head = " ".join(sentences[:n])
+        n_tokens = count_tokens([head])[0]
+        if n_tokens <= max_tokens:
+            return head, n_tokens
+        n -= 1
+    return "", 0
+
+
+def pack_context(results, budget=None):
+    """
+    Pack search results (papers with chunk_ids / chunk_texts) into at most
+    `budget` tokens. Returns (packed results, stats). Packed papers keep
+    their order and fields; chunk_texts become merged passages in document
+    order with "chunk_spans" giving the (first, last) chunk_id of each and
+    "chunk_scores" the best score of the chunks merged into each.
+    """
+    budget = budget or config.CONTEXT_TOKEN_BUDGET
+    min_chars = config.CONTEXT_MIN_OVERLAP
+
+    # 1. merge neighbouring chunks per paper
+    candidates = []
+    raw_texts = []
+    for p, entry in enumerate(results):
+        texts = entry.get("chunk_texts", [])
+        ids = entry.get("chunk_ids") or list(range(len(texts)))
+        scores = entry.get("chunk_scores") or [entry.get("score", 0.0)] * len(texts)
+        raw_texts.extend(texts)
+        for first, last, text, score in merge_chunks(zip(ids, texts, scores)):
+            candidates.append({"paper": p, "span": (first, last), "text": text, "score": score})
+
+    # 2. strip duplicated sentences, keeping them in the best passage
+    candidates.sort(key=lambda c: -c["score"])
+    seen = set()
+    for c in candidates:
+        text = _strip_seen(c["text"], seen, min_chars)
+        # a passage reduced to sentence fragments is dropped
+        c["text"] = text if len(text) >= min_chars or text == c["text"].strip() else ""
+    candidates = [c for c in candidates if c["text"]]
+
+    # 3. fill the budget in score order
+    used = 0
+    packed = []
+    truncated = 0
+    for c, n_tokens in zip(candidates, count_tokens([c["text"] for c in candidates])):
+        if used + n_tokens > budget:
+            text, n_tokens = _truncate(c["text"], budget - used)
+            if len(text) < min_chars:
+                continue
+            c["text"] = text
+            truncated += 1
+        used += n_tokens
+        packed.append(c)
+
+    out = []
+    for p, entry in enumerate(results):
+        passages = sorted((c for c in packed if c["paper"] == p), key=lambda c: c["span"])
+        if not passages:
+            continue
+        out.append(
+            {
+                **entry,
+                "chunk_ids": [c["span"][0] for c in passages],
+                "chunk_spans": [c["span"] for c in passages],
+                "chunk_texts": [c["text"] for c in passages],
+                "chunk_scores": [c["score"] for c in passages],
+            }
+        )
+
+    tokens_before = sum(count_tokens(raw_texts))
+    stats = {
+        "chunks": len(raw_texts),
+        "passages": len(packed),
+        "dropped_passages": len(candidates) - len(packed),
+        "truncated_passages": truncated,
+        "tokens_before": tokens_before,
+        "tokens_after": used,
+        "tokens_saved": tokens_before - used,
+        "budget": budget,
+    }
+    return out, stats
@@ -0,0 +1,267 @@
+"""
+Background jobs for long-running pipeline steps.
+
+A Job runs in a daemon thread, so the Streamlit script that started it can
+finish (and rerun on every widget interaction) while the job keeps going;
+the app keeps the Job object in session state and renders its progress on
+each rerun. Jobs are cancelled cooperatively: cancel() sets a flag that the
+job checks between steps.
+
+FullTextJob downloads, extracts, chunks, embeds and ranks a set of papers as
+one overlapping pipeline:
+
+    download_papers ──> extraction ──> chunking ──> embedding + index ──> search
+    (threads)           (processes)    (per paper)  (batches, prefetched)
+
+Each PDF goes to extraction as soon as its download finishes, and chunks are
+embedded while later downloads are still in flight. The index update is
+committed only if every stage finished; a cancelled or failed job leaves the
+index as it was.
+"""
+
+import os
+import queue
+import threading
+import time
+
+import config
+from rag.collections import get_collection
+from rag.index.build_index_paper import chunk_paper_texts
+from rag.index.search_paper import search_fulltext
+from rag.index.streaming import stream_into_index
+from rag.io.fetch_paper import download_papers, pdf_url_for
+from rag.io.pdf_extract import iter_extracted_as_completed
+from rag.tracing import bind, span, trace, traced_iter
+
+_DONE = object()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    Runs self.run() in a background thread. state is "pending", "running",
+    "done", "failed" or "cancelled"; result / error hold the outcome.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.state = "pending"
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self.started = time.time()
+        self.state = "running"
+        self._thread = threading.Thread(target=bind(self._main), daemon=True)
+        self._thread.start()
+        return self
+
+    def _main(self):
+        try:
+            self.result = self.run()
+            self.state = "done"
+        except JobCancelled:
+            self.state = "cancelled"
+        except Exception as e:
+            self.error = e
+            self.state = "failed"
+            print(f"Job {self.name} failed: {e!r}")
+        finally:
+            self.finished = time.time()
+
+    def run(self):
+        raise NotImplementedError
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    @property
+    def running(self):
+        return self.state in ("pending", "running")
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.state
+
+
+class FullTextJob(Job):
+    """
+    Full-text retrieval for a query over the given papers: download,
+    extraction, chunking and indexing overlap, then the query is searched
+    over the papers that made it into the index. With query=None the papers
+    are only indexed and the result is the ids of those with a PDF.
+    progress() reports the status of every paper.
+    """
+
+    def __init__(
+        self,
+        papers,
+        query,
+        collection=None,
+        top_k_raw=None,
+        top_k_final=None,
+        trace_enabled=None,
+        profile=None,
+    ):
+        super().__init__("full_text_retrieval")
+        self.papers = list(papers)
+        self.query = query
+        self.collection = collection
+        self.top_k_raw = top_k_raw or config.TOP_K_RAW
+        self.top_k_final = top_k_final or config.TOP_K_FINAL
+        self.trace_enabled = trace_enabled
+        self.profile = profile
+        self.trace = None
+        self._status = {
+            p["paperId"]: "queued" if pdf_url_for(p) else "no PDF" for p in self.papers
+        }
+        self._chunks = {}  # paperId -> [chunks, indexed]
+
+    def _set(self, paper_id, status):
+        with self._lock:
+            self._status[paper_id] = status
+
+    def progress(self):
+        """Per-paper rows: paperId, title, status, chunks and indexed chunks."""
+        with self._lock:
+            return [
+                {
+                    "paperId": p["paperId"],
+                    "title": p.get("title", ""),
+                    "status": self._status[p["paperId"]],
+                    "chunks": self._chunks.get(p["paperId"], [0, 0])[0],
+                    "indexed": self._chunks.get(p["paperId"], [0, 0])[1],
+                }
+                for p in self.papers
+            ]
+
+    def run(self):
+        t = trace(self.name, enabled=self.trace_enabled, profile=self.profile)
+        try:
+            with t:
+                return self._pipeline()
+        finally:
+            self.trace = t.record
+
+    def _pipeline(self):
+        downloaded = queue.Queue()
+        paper_of = {}
+        download_error = []
+
+        def on_done(paper, ok):
+            self._set(paper["paperId"], "downloaded" if ok else "download failed")
+            if ok:
+                path = os.path.join(config.PDF_DIR, f"{paper['paperId']}.pdf")
+                paper_of[path] = paper["paperId"]
+                downloaded.put(path)
+
+        def download():
+            try:
+                download_papers(
+                    self.papers, config.PDF_DIR, on_done=on_done, cancel=self._cancel
+                )
+            except Exception as e:
+                # re-raised by arrived_pdfs, so the job fails
+                download_error.append(e)
+            finally:
+                downloaded.put(_DONE)
+
+        def arrived_pdfs():
+            # PDFs as their downloads finish; stops early on cancel
+            while not self.cancelled:
+                try:
+                    path = downloaded.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if path is _DONE:
+                    if download_error:
+                        raise download_error[0]
+                    return
+                yield path
+
+        def paper_chunks():
+            # each step waits for the next PDF to be downloaded and extracted
+            extracted = traced_iter(
+                iter_extracted_as_completed(arrived_pdfs()),
+                "extract_text_from_pdf",
+                size=lambda item: os.path.getsize(item[0]),
+            )
+            for path, text in extracted:
+                self.check_cancelled()
+                paper_id = paper_of[path]
+                self._set(paper_id, "chunking")
+                chunks = chunk_paper_texts({paper_id: text}).get(paper_id)
+                if not chunks:
+                    self._set(paper_id, "no text")
+                    continue
+                with self._lock:
+                    self._chunks[paper_id] = [len(chunks), 0]
+                self._set(paper_id, "embedding")
+                yield from chunks
+            self.check_cancelled()
+
+        def on_added(batch):
+            with self._lock:
+                for chunk in batch:
+                    counts = self._chunks[chunk["paperId"]]
+                    counts[1] += 1
+                    if counts[1] == counts[0]:
+                        self._status[chunk["paperId"]] = "indexed"
+            self.check_cancelled()
+
+        self.stage = "downloading and indexing"
+        threading.Thread(target=bind(download), daemon=True).start()
+        manager = get_collection(self.collection).manager
+        with span("build_chunk_index", items=len(self.papers)):
+            with manager.update("papers") as writer:
+                # papers with a PDF are re-indexed from scratch, like
+                # build_chunk_index; others keep whatever they had
+                writer.remove_papers(
+                    p["paperId"] for p in self.papers if pdf_url_for(p)
+                )
+                stream_into_index(writer, paper_chunks(), on_added=on_added)
+
+        with self._lock:
+            on_disk = [
+                paper_id
+                for paper_id, status in self._status.items()
+                if status not in ("no PDF", "download failed")
+            ]
+        if self.query is None:
+            return on_disk
+        if not on_disk:
+            return []
+
+        self.stage = "ranking chunks"
+        self.check_cancelled()
+        return search_fulltext(
+            self.query,
+            top_k_raw=self.top_k_raw,
+            top_k_final=self.top_k_final,
+            paper_ids=on_disk,
+            collection=self.collection,
+        )
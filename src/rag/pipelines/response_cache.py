@@ -0,0 +1,75 @@
+"""
+Cache of LLM responses keyed by (model, prompt hash).
+
+Completed responses are stored in a SQLite file, so re-running a summary for
+the same results (a Streamlit rerun, another session, a later day) returns
+the stored text instead of paying for the same request again.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+import config
+
+
+def response_key(model_name, prompt):
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=None):
+        self.path = config.SUMMARY_CACHE_FILE if path is None else path
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._db = None
+        self.stats = {"hits": 0, "misses": 0}
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, model TEXT, text TEXT, created REAL)"
+            )
+
+    def get(self, key):
+        """Cached response text, or None."""
+        with self._lock:
+            text = self._memory.get(key)
+            if text is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT text FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                text = row[0] if row else None
+            self.stats["hits" if text is not None else "misses"] += 1
+            return text
+
+    def put(self, key, text, model_name=None):
+        with self._lock:
+            if self._db is None:
+                self._memory[key] = text
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, text, created) "
+                "VALUES (?, ?, ?, julianday('now'))",
+                (key, model_name, text),
+            )
+            self._db.commit()
+
+
+_default = None
+
+
+def get_response_cache():
+    """Shared cache for ``config.SUMMARY_CACHE_FILE``."""
+    global _default
+    if _default is None:
+        _default = ResponseCache()
+    return _default
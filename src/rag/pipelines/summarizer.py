@@ -1,60 +1,245 @@
-from openai import OpenAI
+"""
+Summarize search results with an LLM in a map-reduce pass.
+
+Map: each paper's passages are summarized on their own, concurrently (at
+most ``config.SUMMARY_CONCURRENCY`` requests in flight). Reduce: the
+per-paper summaries are synthesized into one answer to the query, streamed
+token by token. A single paper is summarized in one streamed call.
+
+Passages are packed first (see context): overlapping chunks of a paper are
+merged, duplicated sentences dropped and the rest cut to
+``config.CONTEXT_TOKEN_BUDGET`` tokens.
+
+Every response is cached by (model, prompt hash), see response_cache, so an
+identical request is answered from the cache. The OpenAI client is created
+per call, not at import; ``config.OPENAI_BASE_URL`` points it at any
+compatible server (e.g. a local stand-in).
+"""
+
+import asyncio
+import queue
+import threading
+
 import config as config
+from rag.pipelines.context import pack_context
+from rag.pipelines.response_cache import get_response_cache, response_key
+from rag.tracing import bind, span
+
+_DONE = object()
 
-client = OpenAI()  # Your key must be in OPENAI_API_KEY env variable
+MAP_PROMPT = """
+    You are an expert scientific research assistant.
 
+    Read the retrieved passages from one research paper and summarize what
+    they say that is relevant to the user's query.
 
-def summarize_papers(results, query):
-    paper_blocks = []
-    for entry in results:
-        title = entry.get("title", "Unknown Title")
-        # paper_id = entry.get("paperId", "Unknown")
-        score = entry.get("score", 0.0)
-        chunks = entry.get("chunk_texts", [])
+    User query:
+    "{query}"
 
-        block_lines = [
-            f"paper title: {title}",
-            # f"Paper ID: {paper_id}",
-            f"Relevance score: {score:.4f}\n",
-        ]
+    The passages may be incomplete, may overlap, or may not appear in the
+    original order. Do NOT invent information. Base all statements strictly
+    on the given text.
 
-        for i, chunk in enumerate(chunks, 1):
-            block_lines.append(f"Chunk {i}:\n{chunk}\n")
+    - First, infer the paper's topic based only on the provided passages.
+    - Then summarize the key findings relevant to the query.
+    - If the passages do not provide enough information to infer a finding, say so.
 
-        paper_blocks.append("\n".join(block_lines))
+    When referring to specific evidence, cite as: ({paper_id}, chunk #).
 
-    paper_blocks_text = "\n---\n\n".join(paper_blocks)
+    {paper_block}
+"""
 
-    prompt = f"""
+REDUCE_PROMPT = """
     You are an expert scientific research assistant.
 
-    Your task is to read the retrieved passages from multiple research papers and
-    produce a concise, accurate, and well-organized summary that answers the user’s query.
+    Below are summaries of several research papers, each written from the
+    retrieved passages of one paper with respect to the user's query. Produce
+    a concise, accurate, and well-organized answer to the query.
+
+    User query:
+    "{query}"
+
+    Do NOT invent information. Base all statements strictly on the summaries,
+    and keep their citations of the form (paper_id, chunk #).
+
+    Provide:
+    1. **Per-paper findings**: one or two sentences per paper.
+    2. **Cross-paper synthesis**: What themes, methods, or results appear across papers?
+    3. **Contradictions or differences** between papers.
+    4. **Answer to the original query** using only supported claims.
+    5. **Open questions or limitations**, if detectable from the summaries.
+
+    Here are the paper summaries:
+    {summaries}
+"""
+
+SINGLE_PROMPT = """
+    You are an expert scientific research assistant.
+
+    Your task is to read the retrieved passages from a research paper and
+    produce a concise, accurate, and well-organized summary that answers the user's query.
 
     User query:
     "{query}"
 
-    You are given the most relevant passages from several papers. 
     These passages may be incomplete, may overlap, or may not appear in the original order.
     Do NOT invent information. Base all statements strictly on the given text.
 
-    For each paper:
-    - First, infer the paper’s topic based only on the provided passages.
+    - First, infer the paper's topic based only on the provided passages.
     - Then summarize the key findings relevant to the query.
-    - If the passages do not provide enough information to infer a finding, say so.
+    - Answer the original query using only supported claims.
+    - Note open questions or limitations, if detectable from the passages.
 
-    After analyzing all papers, provide:
-    1. **Cross-paper synthesis**: What themes, methods, or results appear across papers?
-    2. **Contradictions or differences** between papers.
-    3. **Answer to the original query** using only supported claims.
-    4. **Open questions or limitations**, if detectable from the passages.
+    When referring to specific evidence, cite as: ({paper_id}, chunk #).
 
-    When referring to specific evidence, cite as: (paper_id, chunk #).  
-    Example: “The model significantly improved accuracy (P12345, chunk 2).”
-
-    Here are the retrieved passages:
-    {paper_blocks_text}
+    {paper_block}
 """
-    response = client.responses.create(model=config.OPENAI_MODEL_NAME, input=prompt)
 
-    return response.output_text
\ No newline at end of file
+
+def paper_block(entry):
+    """Title, relevance score and numbered passages of one search result."""
+    block_lines = [
+        f"paper title: {entry.get('title', 'Unknown Title')}",
+        f"Paper ID: {entry.get('paperId', 'Unknown')}",
+        f"Relevance score: {entry.get('score', 0.0):.4f}\n",
+    ]
+    spans = entry.get("chunk_spans")
+    for i, chunk in enumerate(entry.get("chunk_texts", []), 1):
+        if spans:
+            # packed passages are labelled with the chunk ids they cover
+            first, last = spans[i - 1]
+            label = f"Chunk {first}" if first == last else f"Chunks {first}-{last}"
+        else:
+            label = f"Chunk {i}"
+        block_lines.append(f"{label}:\n{chunk}\n")
+    return "\n".join(block_lines)
+
+
+def make_client():
+    """Async OpenAI client (the key must be in OPENAI_API_KEY)."""
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(base_url=config.OPENAI_BASE_URL)
+
+
+async def complete(client, prompt, on_token=None, cache=None):
+    """
+    Response text for a prompt, streamed through on_token(delta) as it
+    arrives. Cached responses are passed to on_token in one piece.
+    """
+    model_name = config.OPENAI_MODEL_NAME
+    key = response_key(model_name, prompt)
+    if cache is not None:
+        text = cache.get(key)
+        if text is not None:
+            if on_token is not None:
+                on_token(text)
+            return text
+
+    parts = []
+    stream = await client.responses.create(model=model_name, input=prompt, stream=True)
+    async for event in stream:
+        if event.type == "response.output_text.delta":
+            parts.append(event.delta)
+            if on_token is not None:
+                on_token(event.delta)
+        elif event.type in ("response.failed", "error"):
+            raise RuntimeError(f"LLM request failed: {event}")
+    text = "".join(parts)
+    if cache is not None:
+        cache.put(key, text, model_name)
+    return text
+
+
+async def summarize_papers_async(results, query, on_token=None, client=None):
+    """
+    Map-reduce summary of search results for a query. Tokens of the final
+    answer are passed to on_token(delta) as they arrive; returns the text.
+    """
+    if not results:
+        return ""
+    cache = get_response_cache() if config.SUMMARY_CACHE else None
+    own_client = client is None
+    client = client or make_client()
+    try:
+        with span("summarize_papers", items=len(results)):
+            if config.CONTEXT_PACKING:
+                with span("pack_context", items=len(results)):
+                    results, stats = pack_context(results)
+                print(
+                    f"Packed context: {stats['tokens_after']} of "
+                    f"{stats['tokens_before']} tokens ({stats['tokens_saved']} saved)"
+                )
+                if not results:
+                    return ""
+            if len(results) == 1:
+                entry = results[0]
+                prompt = SINGLE_PROMPT.format(
+                    query=query,
+                    paper_id=entry.get("paperId", "Unknown"),
+                    paper_block=paper_block(entry),
+                )
+                with span("summarize_reduce", nbytes=len(prompt)):
+                    return await complete(client, prompt, on_token, cache)
+
+            # map: one summary per paper, a bounded number in flight
+            limit = asyncio.Semaphore(config.SUMMARY_CONCURRENCY)
+
+            async def summarize_one(entry):
+                prompt = MAP_PROMPT.format(
+                    query=query,
+                    paper_id=entry.get("paperId", "Unknown"),
+                    paper_block=paper_block(entry),
+                )
+                async with limit:
+                    with span("summarize_map", items=1, nbytes=len(prompt)):
+                        return await complete(client, prompt, cache=cache)
+
+            summaries = await asyncio.gather(*(summarize_one(e) for e in results))
+
+            # reduce: synthesize the per-paper summaries, streamed
+            blocks = [
+                f"paper title: {e.get('title', 'Unknown Title')}\n"
+                f"Paper ID: {e.get('paperId', 'Unknown')}\n\n{summary}"
+                for e, summary in zip(results, summaries)
+            ]
+            prompt = REDUCE_PROMPT.format(
+                query=query, summaries="\n---\n\n".join(blocks)
+            )
+            with span("summarize_reduce", nbytes=len(prompt)):
+                return await complete(client, prompt, on_token, cache)
+    finally:
+        if own_client:
+            await client.close()
+
+
+def summarize_papers(results, query):
+    """Blocking map-reduce summary; returns the final text."""
+    return asyncio.run(summarize_papers_async(results, query))
+
+
+def stream_summary(results, query):
+    """
+    Yield the final summary's tokens as they arrive (e.g. for
+    st.write_stream). The async pipeline runs in a background thread;
+    errors are re-raised in the caller.
+    """
+    tokens = queue.Queue()
+
+    def run():
+        try:
+            asyncio.run(summarize_papers_async(results, query, tokens.put))
+            tokens.put(_DONE)
+        except BaseException as e:
+            tokens.put(e)
+
+    thread = threading.Thread(target=bind(run), daemon=True)
+    thread.start()
+    while True:
+        item = tokens.get()
+        if item is _DONE:
+            break
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+    thread.join()
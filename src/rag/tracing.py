@@ -0,0 +1,323 @@
+"""
+Lightweight per-request tracing of the pipeline stages.
+
+A request (a button press in the app, a search call) runs inside
+``trace(name)``; the stages inside it open ``span(name, items=..., nbytes=...)``
+blocks. Each span records its wall time, item and byte counts and the
+process RSS (current and peak) when it ends. When the trace ends it is
+appended as one JSON line to ``config.TRACE_FILE``, and ``breakdown()``
+sums its spans per stage for display.
+
+Tracing is off unless ``config.TRACE`` is set or ``trace(enabled=True)`` is
+used. Outside an active trace ``span()`` returns a shared no-op object, so
+instrumented code costs one context-variable lookup per stage.
+
+``trace(profile="cprofile")`` (or ``"pyinstrument"``, if installed) also
+profiles that single run and writes the profile to ``config.PROFILE_DIR``.
+cProfile only sees the thread that opened the trace.
+
+Spans opened in worker threads belong to the trace only if the work was
+wrapped with ``bind()``; otherwise they are no-ops.
+"""
+
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+import config
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+_trace = contextvars.ContextVar("trace", default=None)
+_span = contextvars.ContextVar("span", default=None)
+_write_lock = threading.Lock()
+
+
+def rss_bytes():
+    """Current resident set size of this process in bytes (best effort)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # no /proc (macOS, Windows): the peak is the closest we have
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes (0 if unknown)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _NoopSpan:
+    """Stand-in for spans and traces while tracing is off."""
+
+    record = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, items=0, nbytes=0):
+        pass
+
+    def annotate(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = (
+        "trace", "name", "items", "nbytes", "attrs", "parent", "start", "_token"
+    )
+
+    def __init__(self, trace, name, items=None, nbytes=None, attrs=None):
+        self.trace = trace
+        self.name = name
+        self.items = items
+        self.nbytes = nbytes
+        self.attrs = attrs
+
+    def add(self, items=0, nbytes=0):
+        """Count items / bytes processed inside the span."""
+        if items:
+            self.items = (self.items or 0) + items
+        if nbytes:
+            self.nbytes = (self.nbytes or 0) + nbytes
+
+    def annotate(self, **attrs):
+        """Add attributes to the span's record, e.g. counts known at the end."""
+        self.attrs = {**(self.attrs or {}), **attrs}
+
+    def __enter__(self):
+        self.parent = _span.get()
+        self._token = _span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _span.reset(self._token)
+        record = {
+            "name": self.name,
+            "parent": self.parent.name if self.parent is not None else None,
+            "offset": self.start - self.trace.start,
+            "seconds": end - self.start,
+            "items": self.items,
+            "bytes": self.nbytes,
+            "rss_mb": rss_bytes() / 2**20,
+            "peak_rss_mb": peak_rss_bytes() / 2**20,
+        }
+        if threading.current_thread() is not threading.main_thread():
+            record["thread"] = threading.current_thread().name
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.attrs:
+            record.update(self.attrs)
+        # list.append is atomic, so spans from bound worker threads are safe
+        self.trace.spans.append(record)
+        return False
+
+
+class Trace:
+    def __init__(self, name, attrs=None, profile=None):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(
+                f"Unknown profiler {profile!r}, expected one of {PROFILERS}"
+            )
+        self.name = name
+        self.attrs = attrs or {}
+        self.profile = profile
+        self.id = uuid.uuid4().hex[:16]
+        self.spans = []
+        self.record = None
+        self._profiler = None
+
+    def __enter__(self):
+        self._token = _trace.set(self)
+        self.started_at = time.time()
+        self.rss_before = rss_bytes()
+        if self.profile:
+            self._profiler = _start_profiler(self.profile)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        profile_path = None
+        if self._profiler is not None:
+            profile_path = _save_profile(self.profile, self._profiler, self.id)
+        _trace.reset(self._token)
+
+        self.record = {
+            "trace_id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "seconds": seconds,
+            "rss_mb": rss_bytes() / 2**20,
+            "rss_delta_mb": (rss_bytes() - self.rss_before) / 2**20,
+            "peak_rss_mb": peak_rss_bytes() / 2**20,
+            "attrs": self.attrs,
+            "spans": sorted(self.spans, key=lambda s: s["offset"]),
+            "profile": profile_path,
+        }
+        if exc_type is not None:
+            self.record["error"] = exc_type.__name__
+        if config.TRACE_FILE:
+            _append(config.TRACE_FILE, self.record)
+        return False
+
+
+def trace(name, enabled=None, profile=None, **attrs):
+    """
+    Context manager tracing one request. Yields the Trace (whose ``record``
+    is set on exit), or a no-op object when tracing is off. Inside an
+    active trace it opens a span instead, so traced functions can nest.
+    """
+    if _trace.get() is not None:
+        return span(name, **attrs)
+    if profile is None and not (config.TRACE if enabled is None else enabled):
+        return _NOOP
+    return Trace(name, attrs, profile)
+
+
+def span(name, items=None, nbytes=None, **attrs):
+    """Context manager timing one stage of the active trace (no-op without one)."""
+    trace = _trace.get()
+    if trace is None:
+        return _NOOP
+    return Span(trace, name, items, nbytes, attrs)
+
+
+def traced_iter(iterable, name, count=None, size=None):
+    """
+    Iterate over `iterable`, timing each step (i.e. the wait for a lazy
+    producer such as PDF extraction) as a span. count(item) and size(item)
+    give the items and bytes each step contributes (default: 1 item).
+    """
+    if _trace.get() is None:
+        return iterable
+    return _traced_iter(iter(iterable), name, count, size)
+
+
+def _traced_iter(it, name, count, size):
+    while True:
+        with span(name) as s:
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            s.add(
+                items=count(item) if count else 1,
+                nbytes=size(item) if size else 0,
+            )
+        yield item
+
+
+def bind(fn):
+    """
+    fn wrapped to run in the caller's trace context, for handing work to
+    threads. Returns fn unchanged when no trace is active.
+    """
+    if _trace.get() is None:
+        return fn
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # each call gets its own copy: a context can't be entered twice at once
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def current_trace():
+    """The active Trace, or None."""
+    return _trace.get()
+
+
+def breakdown(record):
+    """
+    Per-stage totals of a trace record, in order of first appearance:
+    calls, seconds, items, bytes and the peak RSS seen by the stage.
+    Nested stages are also counted in their parents.
+    """
+    stages = {}
+    for s in record["spans"]:
+        row = stages.setdefault(
+            s["name"],
+            {
+                "stage": s["name"],
+                "calls": 0,
+                "seconds": 0.0,
+                "items": 0,
+                "bytes": 0,
+                "peak_rss_mb": 0.0,
+            },
+        )
+        row["calls"] += 1
+        row["seconds"] += s["seconds"]
+        row["items"] += s["items"] or 0
+        row["bytes"] += s["bytes"] or 0
+        row["peak_rss_mb"] = max(row["peak_rss_mb"], s["peak_rss_mb"])
+    return list(stages.values())
+
+
+def load_traces(path=None, limit=None):
+    """Trace records from a JSONL trace log, oldest first."""
+    path = path or config.TRACE_FILE
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return records[-limit:] if limit else records
+
+
+def _append(path, record):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = json.dumps(record) + "\n"
+    with _write_lock, open(path, "a") as f:
+        f.write(line)
+
+
+def _start_profiler(kind):
+    if kind == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+    return profiler
+
+
+def _save_profile(kind, profiler, trace_id):
+    """Stop the profiler and write its output; returns the file path."""
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    if kind == "cprofile":
+        profiler.disable()
+        path = os.path.join(config.PROFILE_DIR, f"{trace_id}.prof")
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = os.path.join(config.PROFILE_DIR, f"{trace_id}.html")
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+    return path
@@ -0,0 +1,104 @@
+"""
+Cross-request micro-batching.
+
+Requests handled on different threads submit single items; one worker
+thread gathers them into batches of at most ``max_size`` items, waiting at
+most ``max_wait`` seconds after the first item for others to join, and runs
+each batch with one call. Items are grouped by a key (e.g. the search
+parameters), since only items with the same key can share a call.
+
+While a batch runs, new items queue up and form the next batch, so batches
+grow with load and a lone request pays at most ``max_wait`` of extra
+latency.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import config
+
+
+class MicroBatcher:
+    """
+    run_batch(key, items) must return one result per item, in order.
+
+        batcher = MicroBatcher(lambda key, queries: search(queries, *key))
+        result = batcher.submit(key, query).result()
+    """
+
+    def __init__(self, run_batch, max_size=None, max_wait=None):
+        self.run_batch = run_batch
+        self.max_size = max_size or config.SERVICE_BATCH_SIZE
+        self.max_wait = (
+            config.SERVICE_BATCH_WAIT_MS / 1000 if max_wait is None else max_wait
+        )
+        self.stats = {"items": 0, "batches": 0, "calls": 0, "largest": 0}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def submit(self, key, item):
+        """Future for the result of `item`."""
+        future = Future()
+        self._queue.put((key, item, future))
+        return future
+
+    def __call__(self, key, item, timeout=None):
+        """Blocking submit; raises TimeoutError after `timeout` seconds."""
+        timeout = config.SERVICE_BATCH_TIMEOUT if timeout is None else timeout
+        return self.submit(key, item).result(timeout)
+
+    def _gather(self):
+        """Next batch: the first queued item plus whatever arrives in time."""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                batch.append(
+                    self._queue.get(timeout=timeout)
+                    if timeout > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._gather()
+            groups = {}
+            for key, item, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    groups.setdefault(key, []).append((item, future))
+                except Exception as e:
+                    # e.g. an unhashable key: fail this item, keep the worker
+                    future.set_exception(e)
+
+            for key, entries in groups.items():
+                try:
+                    results = self.run_batch(key, [item for item, _ in entries])
+                except BaseException as e:
+                    for _, future in entries:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(entries, results):
+                    future.set_result(result)
+
+            with self._lock:
+                self.stats["items"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["calls"] += len(groups)
+                self.stats["largest"] = max(self.stats["largest"], len(batch))
+
+    def snapshot(self):
+        """Counters plus the mean batch size."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["mean_size"] = stats["items"] / max(stats["batches"], 1)
+        return stats
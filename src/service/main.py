@@ -0,0 +1,281 @@
+"""
+Headless HTTP service for fetching, indexing, searching and summarizing.
+
+Models are loaded once at startup and index snapshots stay in memory
+between requests (rebuilt indexes are picked up on the next search).
+Concurrent /search requests are gathered into micro-batches (see
+batching.py): one query encode, one FAISS search and one reranker pass per
+batch instead of per request.
+
+    PYTHONPATH=src python src/service/main.py --port 8000
+    curl -s localhost:8000/search -d '{"query": "graph neural networks",
+        "collection": "gnn", "index": "abstracts"}'
+
+Endpoints (JSON in, JSON out):
+
+    GET  /health     models, micro-batching counters
+    POST /fetch      {"topic", "limit"?, "collection"?} fetch papers for a
+                     topic into a collection and index their abstracts
+    POST /index      {"paper_ids", "collection"?} download, extract and
+                     index the full text of papers already in the collection
+    POST /search     {"query", "index"?: "fulltext" | "abstracts",
+                     "top_k_raw"?, "top_k_final"?, "paper_ids"?,
+                     "collection"?: name or list of names}
+    POST /summarize  {"query", "results", "stream"?} summary of search
+                     results; with "stream": true the answer is sent as
+                     server-sent events {"delta": ...} as it is generated
+"""
+
+import argparse
+import json
+import sys
+from http.server import BaseHTTPRequestHandler
+
+import numpy as np
+
+import config
+from rag.collections import collection_name, get_collection
+from rag.index.build_index_abs import build_abstract_index
+from rag.index.retrieval import search_batch
+from rag.io.fetch_abs import fetch_papers
+from rag.io.fetch_paper import lookup_papers_by_id
+from rag.io.http import ThreadedServer
+from rag.models import model_stats, warmup
+from rag.pipelines.jobs import FullTextJob
+from rag.pipelines.summarizer import stream_summary, summarize_papers
+from service.batching import MicroBatcher
+
+INDEXES = {"fulltext": "papers", "abstracts": "abs_chunk"}
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _names(body, field, single=True):
+    """
+    None, a string (if `single`) or a tuple of strings from a request field;
+    anything else is a bad request.
+    """
+    value = body.get(field)
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value if single else (value,)
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        return tuple(value)
+    raise ValueError(f"{field} must be a string or a list of strings")
+
+
+def _positive_int(body, field, default):
+    """A positive integer request field (default if missing)."""
+    value = body.get(field)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"{field} must be a positive integer")
+    return value
+
+
+def _search(key, queries):
+    index_name, top_k_raw, top_k_final, paper_ids, collection = key
+    return search_batch(
+        index_name,
+        queries,
+        top_k_raw,
+        top_k_final,
+        list(paper_ids) if paper_ids is not None else None,
+        collection=list(collection) if isinstance(collection, tuple) else collection,
+    )
+
+
+class SearchService:
+    """The endpoints, independent of HTTP."""
+
+    def __init__(self, batch_size=None, batch_wait=None):
+        self.batcher = MicroBatcher(_search, batch_size, batch_wait)
+
+    def health(self, body=None):
+        return {
+            "status": "ok",
+            "models": model_stats(),
+            "batching": self.batcher.snapshot(),
+        }
+
+    def fetch(self, body):
+        topic = body["topic"]
+        collection = body.get("collection") or collection_name(topic)
+        papers = fetch_papers(topic, limit=body.get("limit", 20), collection=collection)
+        build_abstract_index(collection=collection)
+        return {"collection": collection, "paper_ids": [p["paperId"] for p in papers]}
+
+    def index(self, body):
+        collection = body.get("collection")
+        if collection is not None and not isinstance(collection, str):
+            raise ValueError("collection must be a string")
+        paper_ids = _names(body, "paper_ids", single=False)
+        if paper_ids is None:
+            raise ValueError("paper_ids is required")
+        papers = [p for p in lookup_papers_by_id(list(paper_ids), collection) if p]
+        job = FullTextJob(papers, None, collection=collection).start()
+        job.join()
+        if job.state != "done":
+            raise RuntimeError(f"Indexing {job.state}: {job.error!r}")
+        return {"indexed": job.result, "papers": job.progress()}
+
+    def search(self, body):
+        query = body["query"]
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError("query must be a non-empty string")
+        index = body.get("index", "fulltext")
+        if index not in INDEXES:
+            raise ValueError(f"index must be one of {sorted(INDEXES)}")
+        key = (
+            INDEXES[index],
+            _positive_int(body, "top_k_raw", config.TOP_K_RAW),
+            _positive_int(body, "top_k_final", config.TOP_K_FINAL),
+            _names(body, "paper_ids", single=False),
+            _names(body, "collection"),
+        )
+        return {"results": self.batcher(key, query)}
+
+    def summarize(self, body):
+        return {"summary": summarize_papers(body["results"], body["query"])}
+
+
+class ServiceServer(ThreadedServer):
+    def __init__(self, address, service, verbose=False):
+        super().__init__(address, _Handler)
+        self.service = service
+        self.verbose = verbose
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes; with Nagle on, keep-alive
+    # clients wait for a delayed ACK (~40 ms) on every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self, method):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        routes = {
+            "GET": {"/health": "health"},
+            "POST": {
+                "/fetch": "fetch",
+                "/index": "index",
+                "/search": "search",
+                "/summarize": "summarize",
+            },
+        }
+        name = routes[method].get(path)
+        if name is None:
+            self._send_json(404, {"error": f"no route {method} {path}"})
+            return
+
+        try:
+            body = {}
+            if method == "POST":
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("request body must be a JSON object")
+            if name == "summarize" and body.get("stream"):
+                self._stream_summary(body)
+                return
+            payload = getattr(self.server.service, name)(body)
+        except (KeyError, ValueError, TypeError) as e:
+            self._send_json(400, {"error": f"bad request: {e!r}"})
+        except FileNotFoundError as e:
+            self._send_json(404, {"error": str(e)})
+        except TimeoutError:
+            self._send_json(504, {"error": "timed out waiting for the search batch"})
+        except Exception as e:
+            print(f"{method} {path} failed: {e!r}", file=sys.stderr)
+            self._send_json(500, {"error": repr(e)})
+        else:
+            self._send_json(200, payload)
+
+    def _stream_summary(self, body):
+        tokens = stream_summary(body["results"], body["query"])
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for delta in tokens:
+                self._event({"delta": delta})
+            self._event({"done": True})
+        except Exception as e:
+            self._event({"error": repr(e)})
+
+    def _event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+
+def make_server(host=None, port=None, batch_size=None, batch_wait=None, verbose=False):
+    """Service bound to host:port (port 0 picks a free port); not started."""
+    host = host or config.SERVICE_HOST
+    port = config.SERVICE_PORT if port is None else port
+    return ServiceServer((host, port), SearchService(batch_size, batch_wait), verbose)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default=config.SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVICE_PORT)
+    parser.add_argument("--batch-size", type=int, default=config.SERVICE_BATCH_SIZE)
+    parser.add_argument(
+        "--batch-wait-ms", type=float, default=config.SERVICE_BATCH_WAIT_MS
+    )
+    parser.add_argument(
+        "--preload", default="", help="comma-separated collections to load now"
+    )
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    for stats in warmup():
+        print(f"Loaded {stats['kind']} {stats['name']} in {stats['load_seconds']:.1f}s")
+    for name in filter(None, args.preload.split(",")):
+        collection = get_collection(name)
+        for index_name in INDEXES.values():
+            collection.manager.get(index_name)
+
+    server = make_server(
+        args.host, args.port, args.batch_size, args.batch_wait_ms / 1000, args.verbose
+    )
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
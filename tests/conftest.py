@@ -0,0 +1,190 @@
+"""
+Shared fixtures. Tests run offline: every data path in config points into a
+per-test temporary directory (see benchmarks/offline.py) and the stub
+models stand in for the embedder and cross-encoder.
+
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "src"), os.path.join(ROOT, "benchmarks")]
+
+import config  # noqa: E402
+import offline  # noqa: E402
+from rag.io.http import ThreadedServer  # noqa: E402
+from rag.io.s2_client import S2Client  # noqa: E402
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    """
+    Scratch data directory with stub models. The module-level singletons
+    (index manager, caches, S2 client, downloader) start empty so they are
+    built from the sandboxed config; config and singletons are restored after.
+    """
+    saved = {k: v for k, v in vars(config).items() if k.isupper()}
+    saved_env = os.environ.get("HF_HUB_OFFLINE")
+    from rag import collections
+    from rag.index import embed_cache, index_manager, query_cache, rerank_cache
+    from rag.io import downloader, s2_client
+    from rag.pipelines import response_cache
+
+    for module in (
+        index_manager,
+        query_cache,
+        rerank_cache,
+        response_cache,
+        s2_client,
+        downloader,
+    ):
+        monkeypatch.setattr(module, "_default", None)
+    monkeypatch.setattr(embed_cache, "_caches", {})
+    offline.sandbox_config(str(tmp_path))
+    offline.install_stub_models()
+    collections._collections.clear()
+    yield tmp_path
+    collections._collections.clear()
+    for key, value in saved.items():
+        setattr(config, key, value)
+    if saved_env is None:
+        os.environ.pop("HF_HUB_OFFLINE", None)
+    else:
+        os.environ["HF_HUB_OFFLINE"] = saved_env
+
+
+def s2_item(pid, abstract=True):
+    return {
+        "paperId": pid,
+        "title": f"Paper {pid}",
+        "abstract": f"Abstract of {pid}." if abstract else None,
+        "authors": [{"name": "A. Author"}],
+        "year": 2020,
+    }
+
+
+class FakeS2:
+    """
+    Local stand-in for the Graph API over a small citation graph. Edge pages
+    hold at most `edge_page` entries (with a `next` offset), bulk search
+    pages hold `bulk_page` results (with a `token`), and the first `busy`
+    requests are answered with 429.
+    """
+
+    def __init__(self, total=1000, refs=None, cites=None, no_abstract=(), busy=0):
+        self.total = total
+        self.refs = refs or {}
+        self.cites = cites or {}
+        self.no_abstract = set(no_abstract)
+        self.busy = busy
+        self.edge_page = 2
+        self.bulk_page = 600
+        self.requests = []  # (method, path, params or body)
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                fake._answer(self, "GET", url.path, params)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                length = int(self.headers["Content-Length"])
+                fake._answer(self, "POST", url.path, json.loads(self.rfile.read(length)))
+
+        self.server = ThreadedServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _answer(self, handler, method, path, args):
+        with self._lock:
+            self.requests.append((method, path, args))
+            busy = len(self.requests) <= self.busy
+        if busy:
+            return self._send(handler, 429, {"message": "Too Many Requests"})
+        self._send(handler, 200, self._route(method, path, args))
+
+    def _route(self, method, path, args):
+        parts = path.strip("/").split("/")
+        if method == "POST":  # /graph/v1/paper/batch
+            return [
+                s2_item(pid, pid not in self.no_abstract) if pid in self._known() else None
+                for pid in args["ids"]
+            ]
+        if parts[-1] == "search":
+            offset, limit = int(args["offset"]), int(args["limit"])
+            stop = min(offset + limit, self.total)
+            return {
+                "total": self.total,
+                "data": [s2_item(f"S{i}") for i in range(offset, stop)],
+            }
+        if parts[-1] == "bulk":
+            start = int(args.get("token", 0))
+            stop = min(start + self.bulk_page, self.total)
+            page = {"data": [s2_item(f"S{i}") for i in range(start, stop)]}
+            if stop < self.total:
+                page["token"] = str(stop)
+            return page
+
+        edges, key = {
+            "references": (self.refs, "citedPaper"),
+            "citations": (self.cites, "citingPaper"),
+        }[parts[-1]]
+        ids = edges.get(parts[-2], [])
+        offset = int(args["offset"])
+        stop = min(offset + int(args["limit"]), offset + self.edge_page, len(ids))
+        page = {"data": [{key: {"paperId": pid}} for pid in ids[offset:stop]]}
+        if stop < len(ids):
+            page["next"] = stop
+        return page
+
+    def _known(self):
+        ids = set(self.refs) | set(self.cites)
+        for edges in (self.refs, self.cites):
+            for targets in edges.values():
+                ids.update(targets)
+        return ids
+
+    def _send(self, handler, status, data):
+        body = json.dumps(data).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            handler.send_header("Retry-After", "0")
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def client(self, **kwargs):
+        """Uncached, unthrottled S2Client for this server."""
+        return S2Client(base_url=self.base_url, min_interval=0, cache_dir="", **kwargs)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_s2():
+    servers = []
+
+    def start(**kwargs):
+        servers.append(FakeS2(**kwargs))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from service.batching import MicroBatcher
+
+
+class Recorder:
+    """run_batch that records its calls and fails on items named "bad"."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, key, items):
+        self.calls.append((key, list(items)))
+        if "bad" in items:
+            raise ValueError("bad item")
+        return [f"{key}:{item}" for item in items]
+
+
+def submit_together(batcher, requests):
+    """Submit (key, item) pairs from one thread each; returns their futures."""
+    futures = [None] * len(requests)
+    start = threading.Barrier(len(requests))
+
+    def submit(i, key, item):
+        start.wait()
+        futures[i] = batcher.submit(key, item)
+
+    threads = [
+        threading.Thread(target=submit, args=(i, key, item))
+        for i, (key, item) in enumerate(requests)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return futures
+
+
+def test_requests_are_grouped_by_key():
+    run = Recorder()
+    batcher = MicroBatcher(run, max_size=16, max_wait=0.2)
+    requests = [("a", 1), ("b", 2), ("a", 3), ("a", 4)]
+
+    futures = submit_together(batcher, requests)
+
+    assert [f.result(5) for f in futures] == ["a:1", "b:2", "a:3", "a:4"]
+    assert sorted((key, sorted(items)) for key, items in run.calls) == [
+        ("a", [1, 3, 4]),
+        ("b", [2]),
+    ]
+    assert batcher.snapshot()["batches"] == 1
+
+
+def test_a_lone_request_waits_at_most_max_wait():
+    batcher = MicroBatcher(Recorder(), max_size=16, max_wait=0.1)
+
+    start = time.perf_counter()
+    assert batcher("a", 1, timeout=5) == "a:1"
+    assert 0.1 <= time.perf_counter() - start < 1.0
+
+
+def test_a_full_batch_runs_without_waiting():
+    run = Recorder()
+    batcher = MicroBatcher(run, max_size=2, max_wait=5)
+
+    futures = submit_together(batcher, [("a", 1), ("a", 2)])
+
+    assert [f.result(1) for f in futures] == ["a:1", "a:2"]
+
+
+def test_unhashable_keys_fail_only_their_request():
+    batcher = MicroBatcher(Recorder(), max_size=16, max_wait=0.05)
+
+    with pytest.raises(TypeError):
+        batcher(["not", "hashable"], 1, timeout=5)
+    assert batcher("a", 2, timeout=5) == "a:2"
+
+
+def test_run_batch_errors_reach_the_batch_and_the_worker_keeps_going():
+    batcher = MicroBatcher(Recorder(), max_size=16, max_wait=0.2)
+    good, bad, other = submit_together(batcher, [("a", 1), ("a", "bad"), ("b", 3)])
+
+    # the failing call fails its own group only
+    for future in (good, bad):
+        with pytest.raises(ValueError):
+            future.result(5)
+    assert other.result(5) == "b:3"
+    assert batcher("a", 4, timeout=5) == "a:4"
+
+
+def test_result_times_out():
+    release = threading.Event()
+    batcher = MicroBatcher(lambda key, items: release.wait() and items, max_wait=0)
+
+    with pytest.raises(TimeoutError):
+        batcher("a", 1, timeout=0.1)
+    release.set()
@@ -0,0 +1,57 @@
+import pytest
+
+from rag.pipelines import context
+from rag.pipelines.context import pack_context
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(context, "count_tokens", lambda texts: [len(t.split()) for t in texts])
+
+
+def sentences(tag, n):
+    return " ".join(f"Sentence {i} of passage {tag} is here." for i in range(n))
+
+
+def test_packed_passages_carry_their_scores():
+    results = [
+        {
+            "paperId": "P",
+            "score": 0.9,
+            "chunk_ids": [7, 3, 4],
+            "chunk_texts": [sentences("c", 2), sentences("a", 2), sentences("b", 2)],
+            "chunk_scores": [0.9, 0.2, 0.6],
+        }
+    ]
+    packed, _ = pack_context(results, budget=1000)
+
+    (paper,) = packed
+    assert paper["chunk_spans"] == [(3, 4), (7, 7)]
+    # chunks 3 and 4 merged into one passage scored by the better one
+    assert paper["chunk_scores"] == [0.6, 0.9]
+    assert len(paper["chunk_texts"]) == len(paper["chunk_scores"])
+
+
+def test_passage_over_the_budget_is_cut_at_a_sentence():
+    results = [
+        {"paperId": "A", "score": 0.9, "chunk_ids": [0], "chunk_texts": [sentences("a", 2)]},
+        {"paperId": "B", "score": 0.5, "chunk_ids": [0], "chunk_texts": [sentences("b", 4)]},
+    ]
+    # 7 words per sentence: A takes 14 tokens, 16 are left for B
+    packed, stats = pack_context(results, budget=30)
+
+    assert [p["paperId"] for p in packed] == ["A", "B"]
+    assert packed[1]["chunk_texts"] == [sentences("b", 2)]
+    assert stats["tokens_after"] == 28
+    assert stats["truncated_passages"] == 1
+
+
+def test_passage_is_skipped_if_no_sentence_fits():
+    results = [
+        {"paperId": "A", "score": 0.9, "chunk_ids": [0], "chunk_texts": [sentences("a", 2)]},
+        {"paperId": "B", "score": 0.5, "chunk_ids": [0], "chunk_texts": [sentences("b", 4)]},
+    ]
+    packed, stats = pack_context(results, budget=20)
+
+    assert [p["paperId"] for p in packed] == ["A"]
+    assert stats["dropped_passages"] == 1 and stats["truncated_passages"] == 0
@@ -0,0 +1,166 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from rag.io import downloader
+from rag.io.downloader import PDFDownloader
+from rag.io.http import ThreadedServer
+
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 64
+
+
+class PDFHost:
+    """
+    Local stand-in for a publisher: /pdf/<name> serves PDF (honouring Range),
+    /flaky/<n>/<name> answers 503 to the first n requests, /html answers 200
+    with a landing page and /slow/<name> takes `delay` seconds. Records every
+    request and the most requests it ever had in flight at once.
+    """
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        host = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with host._lock:
+                    host.requests.append((self.path, self.headers.get("Range")))
+                    host.in_flight += 1
+                    host.max_in_flight = max(host.max_in_flight, host.in_flight)
+                try:
+                    host.handle(self)
+                finally:
+                    with host._lock:
+                        host.in_flight -= 1
+
+        self.server = ThreadedServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def hits(self, path):
+        with self._lock:
+            return sum(p == path for p, _ in self.requests)
+
+    def handle(self, handler):
+        parts = handler.path.strip("/").split("/")
+        if parts[0] == "html":
+            return self._send(handler, 200, b"<html>Sign in</html>", "text/html")
+        if parts[0] == "flaky" and self.hits(handler.path) <= int(parts[1]):
+            return self._send(handler, 503, b"busy")
+        if parts[0] == "slow":
+            time.sleep(self.delay)
+
+        body, status = PDF, 200
+        byte_range = handler.headers.get("Range")
+        if byte_range:
+            body, status = PDF[int(byte_range[6:].rstrip("-")) :], 206
+        self._send(handler, status, body, "application/pdf")
+
+    def _send(self, handler, status, body, content_type="text/plain"):
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def host():
+    host = PDFHost()
+    yield host
+    host.close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    delays = []
+    monkeypatch.setattr(
+        downloader,
+        "backoff_delay",
+        lambda attempt, retry_after=None: delays.append(attempt) or 0,
+    )
+    return delays
+
+
+def test_retries_transient_errors_with_backoff(host, tmp_path, no_backoff):
+    save_path = str(tmp_path / "a.pdf")
+    result = PDFDownloader(retries=3).download(host.base_url + "/flaky/2/a", save_path)
+
+    assert result["ok"] and result["error"] is None
+    assert host.hits("/flaky/2/a") == 3
+    assert no_backoff == [0, 1]
+    assert open(save_path, "rb").read() == PDF
+
+
+def test_gives_up_after_the_last_retry(host, tmp_path, no_backoff):
+    save_path = tmp_path / "a.pdf"
+    result = PDFDownloader(retries=2).download(host.base_url + "/flaky/9/a", str(save_path))
+
+    assert not result["ok"] and result["error"] == "HTTP 503"
+    assert host.hits("/flaky/9/a") == 3
+    assert not save_path.exists()
+
+
+def test_resumes_a_partial_file(host, tmp_path):
+    save_path = tmp_path / "a.pdf"
+    (tmp_path / "a.pdf.part").write_bytes(PDF[:1000])
+
+    result = PDFDownloader().download(host.base_url + "/pdf/a", str(save_path))
+
+    assert result["ok"] and result["resumed"]
+    assert result["bytes"] == len(PDF) - 1000
+    assert host.requests == [("/pdf/a", "bytes=1000-")]
+    assert save_path.read_bytes() == PDF
+    assert not (tmp_path / "a.pdf.part").exists()
+
+
+def test_rejects_responses_that_are_not_pdfs(host, tmp_path):
+    save_path = tmp_path / "a.pdf"
+    result = PDFDownloader().download(host.base_url + "/html", str(save_path))
+
+    assert not result["ok"] and result["error"] == "response is not a PDF"
+    assert not save_path.exists()
+    assert not (tmp_path / "a.pdf.part").exists()
+
+
+def test_caps_concurrent_downloads_per_host(host, tmp_path):
+    jobs = [
+        (i, f"{host.base_url}/slow/{i}", str(tmp_path / f"{i}.pdf")) for i in range(6)
+    ]
+    results = PDFDownloader(max_workers=6, default_host_limit=2).download_many(jobs)
+
+    assert all(r["ok"] for r in results.values())
+    assert host.max_in_flight == 2
+
+
+def test_concurrent_downloads_of_one_file_take_turns(host, tmp_path):
+    save_path = str(tmp_path / "a.pdf")
+    jobs = [(i, host.base_url + "/slow/a", save_path) for i in range(4)]
+    results = PDFDownloader(max_workers=4).download_many(jobs)
+
+    assert all(r["ok"] for r in results.values())
+    assert host.hits("/slow/a") == 1
+    assert open(save_path, "rb").read() == PDF
+
+
+def test_cancel_skips_downloads_not_started(host, tmp_path):
+    cancel = threading.Event()
+    cancel.set()
+    jobs = [(i, f"{host.base_url}/pdf/{i}", str(tmp_path / f"{i}.pdf")) for i in range(3)]
+    results = PDFDownloader().download_many(jobs, cancel=cancel)
+
+    assert [r["error"] for r in results.values()] == ["cancelled"] * 3
+    assert host.requests == []
@@ -0,0 +1,54 @@
+import json
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import config
+from rag.index.embed_cache import EmbeddingCache, encode_cached, get_cache, text_hash
+
+
+def vector(key):
+    rng = np.random.default_rng(int(key[1:]))
+    return rng.standard_normal(8).astype("float32")
+
+
+def _add_from_process(cache_dir, dtype, n):
+    cache = EmbeddingCache("m", cache_dir=cache_dir, dtype=dtype)
+    for start in range(0, 200, 10):
+        # every process also adds some keys of the others
+        keys = [f"k{n * 150 + i}" for i in range(start, start + 10)]
+        cache.add(keys, np.stack([vector(k) for k in keys]))
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_processes_sharing_a_cache_keep_keys_on_their_rows(tmp_path, dtype):
+    ctx = multiprocessing.get_context("fork")
+    procs = [
+        ctx.Process(target=_add_from_process, args=(str(tmp_path), dtype, n))
+        for n in range(4)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    cache = EmbeddingCache("m", cache_dir=str(tmp_path))
+    keys = sorted(cache.rows)
+    assert len(keys) == 3 * 150 + 200
+    assert sorted(cache.rows.values()) == list(range(len(keys)))
+    expected = np.stack([vector(k) for k in keys])
+    np.testing.assert_allclose(cache.get_many(keys), expected, atol=0.05)
+
+
+def test_each_inference_backend_has_its_own_cache(sandbox, monkeypatch):
+    encode_cached(["Proteins fold."], log=False)
+    torch_cache = get_cache()
+    monkeypatch.setattr(config, "INFERENCE_BACKEND", "onnx")
+    onnx_cache = get_cache()
+
+    assert onnx_cache is not torch_cache and onnx_cache.path != torch_cache.path
+    assert text_hash("Proteins fold.") not in onnx_cache
+    encode_cached(["Proteins fold."], log=False)
+    with open(onnx_cache.meta_path) as f:
+        assert json.load(f)["backend"] == "onnx"
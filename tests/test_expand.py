@@ -0,0 +1,64 @@
+from rag.collections import get_collection
+from rag.io.expand import expand_corpus, fetch_metadata, neighbour_ids
+
+
+def test_edges_follow_the_next_offset(fake_s2):
+    server = fake_s2(refs={"P": ["A", "B", "C", "D", "E"]})
+    ids = neighbour_ids(server.client(), "P", "references", limit=100)
+
+    assert ids == ["A", "B", "C", "D", "E"]
+    assert [int(args["offset"]) for _, _, args in server.requests] == [0, 2, 4]
+
+
+def test_batch_requests_are_chunked(fake_s2):
+    server = fake_s2(refs={"P": ["A", "B", "C", "D", "E", "F"]})
+    items = fetch_metadata(
+        server.client(), ["A", "B", "C", "D", "E", "F", "unknown"], batch_size=3
+    )
+
+    assert sorted(i["paperId"] for i in items) == ["A", "B", "C", "D", "E", "F"]
+    batches = sorted(args["ids"] for m, _, args in server.requests if m == "POST")
+    assert batches == [["A", "B", "C"], ["D", "E", "F"], ["unknown"]]
+
+
+GRAPH = {
+    # S cites A and B; A cites B and C; C cites E; D cites S
+    "refs": {"S": ["A", "B"], "A": ["B", "C"], "C": ["E"]},
+    "cites": {"S": ["D"], "A": ["S"]},
+}
+
+
+def batched_ids(server):
+    return [pid for m, _, args in server.requests if m == "POST" for pid in args["ids"]]
+
+
+def test_expansion_stops_at_the_depth_limit(sandbox, fake_s2):
+    server = fake_s2(**GRAPH)
+    added, stats = expand_corpus(["S"], depth=1, client=server.client())
+
+    assert sorted(p["paperId"] for p in added) == ["A", "B", "D", "S"]
+    assert "C" not in get_collection().store
+    assert [level["level"] for level in stats["levels"]] == [1]
+
+
+def test_expansion_fetches_each_paper_once(sandbox, fake_s2):
+    server = fake_s2(no_abstract=["B"], **GRAPH)
+    get_collection().store.upsert([{"paperId": "D", "title": "Paper D"}])
+
+    added, stats = expand_corpus(["S"], depth=3, client=server.client())
+
+    # B is reached from S and A and D is already in the store: neither is
+    # fetched twice; B has no abstract and is dropped
+    fetched = batched_ids(server)
+    assert sorted(fetched) == ["A", "B", "C", "E", "S"]
+    assert sorted(p["paperId"] for p in added) == ["A", "C", "E", "S"]
+    assert stats["already_in_store"] == 1 and stats["no_abstract"] == 1
+
+
+def test_expansion_respects_the_paper_budget(sandbox, fake_s2):
+    server = fake_s2(**GRAPH)
+    added, _ = expand_corpus(["S"], depth=3, max_papers=2, client=server.client())
+
+    # the seed fills the first slot, one neighbour the second
+    assert len(added) == 2
+    assert len(batched_ids(server)) == 2
@@ -0,0 +1,55 @@
+import pytest
+import requests
+
+from rag.collections import get_collection
+from rag.io import s2_client
+from rag.io.fetch_abs import fetch_papers
+
+
+def test_relevance_search_pages_by_offset(sandbox, fake_s2):
+    server = fake_s2(total=1000)
+    papers = fetch_papers("graphs", limit=250, client=server.client())
+
+    assert [p["paperId"] for p in papers] == [f"S{i}" for i in range(250)]
+    pages = sorted(
+        (int(args["offset"]), int(args["limit"])) for _, _, args in server.requests
+    )
+    assert pages == [(0, 100), (100, 100), (200, 50)]
+    assert len(get_collection().store) == 250
+
+
+def test_bulk_search_follows_the_token(sandbox, fake_s2):
+    server = fake_s2(total=2000)
+    papers = fetch_papers("graphs", limit=1500, client=server.client())
+
+    assert [p["paperId"] for p in papers] == [f"S{i}" for i in range(1500)]
+    tokens = [args.get("token") for _, _, args in server.requests]
+    assert tokens == [None, "600", "1200"]
+
+
+def test_backs_off_on_429(fake_s2, monkeypatch):
+    delays = []
+    real_delay = s2_client.backoff_delay
+    monkeypatch.setattr(
+        s2_client,
+        "backoff_delay",
+        lambda attempt, retry_after=None: delays.append((attempt, retry_after))
+        or real_delay(attempt, retry_after),
+    )
+    server = fake_s2(busy=2)
+    client = server.client(retries=3)
+
+    data = client.get("/graph/v1/paper/search", {"query": "q", "offset": 0, "limit": 5})
+
+    assert len(data["data"]) == 5
+    assert delays == [(0, "0"), (1, "0")]
+    assert client.stats["requests"] == 3 and client.stats["retries"] == 2
+
+
+def test_gives_up_after_the_last_retry(fake_s2):
+    server = fake_s2(busy=10)
+    client = server.client(retries=2)
+
+    with pytest.raises(requests.HTTPError):
+        client.get("/graph/v1/paper/search", {"query": "q", "offset": 0, "limit": 5})
+    assert len(server.requests) == 3 and client.stats["errors"] == 1
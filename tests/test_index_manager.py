@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+import pytest
+
+import config
+from rag.index import ann
+from rag.index.index_manager import IndexManager, get_manager
+
+
+def _chunks(paper_id, n=3):
+    return [{"paperId": paper_id, "chunk_id": i, "text": f"{paper_id} text {i}"} for i in range(n)]
+
+
+def _embeddings(n, seed):
+    x = np.random.default_rng(seed).normal(size=(n, 8)).astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_interleaved_writers_keep_every_update(sandbox):
+    manager = IndexManager(str(sandbox / "index"))
+    opened = threading.Barrier(2, timeout=1)
+
+    def write(paper_id, seed):
+        with manager.update("papers") as writer:
+            try:
+                # both writers try to be open at once; the second must wait
+                opened.wait()
+            except threading.BrokenBarrierError:
+                pass
+            writer.add(_chunks(paper_id), _embeddings(3, seed))
+
+    with manager.update("papers") as writer:
+        writer.add(_chunks("A"), _embeddings(3, 0))
+    threads = [threading.Thread(target=write, args=(p, s)) for p, s in (("B", 1), ("C", 2))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    snapshot = manager.get("papers")
+    assert snapshot.paper_ids() == {"A", "B", "C"}
+    assert snapshot.ntotal == 9
+    assert manager.current_version("papers") == "v000003"
+
+
+@pytest.mark.parametrize("run", [1, 2])
+def test_default_manager_follows_each_sandbox(sandbox, run):
+    # the second run must not get the manager built for the first sandbox
+    assert get_manager().index_dir == config.INDEX_DIR
+    assert get_manager().index_dir.startswith(str(sandbox))
+
+
+def test_hnsw_removals_are_masked_until_the_rebuild(sandbox, monkeypatch):
+    monkeypatch.setattr(config, "INDEX_TYPE", "hnsw")
+    monkeypatch.setattr(config, "ANN_MIN_VECTORS", 10)
+    monkeypatch.setattr(config, "HNSW_MAX_REMOVED", 0.3)
+    manager = IndexManager(str(sandbox / "index"))
+    papers = [f"P{i}" for i in range(10)]
+    with manager.update("papers") as writer:
+        for i, paper_id in enumerate(papers):
+            writer.add(_chunks(paper_id), _embeddings(3, i))
+
+    # re-index P0: its old rows stay in the graph, masked
+    new_p0 = _embeddings(3, 100)
+    with manager.update("papers") as writer:
+        writer.remove_papers(["P0"])
+        writer.add(_chunks("P0"), new_p0)
+    snapshot = manager.get("papers")
+    assert snapshot.index.ntotal == 33 and snapshot.ntotal == 30
+    assert len(snapshot.deleted) == 3
+
+    # the masked rows share ids with the new ones but never match
+    old_p0 = _embeddings(3, 0)
+    scores, ids = snapshot.search(np.vstack([new_p0, old_p0]), 1)
+    assert scores[:3, 0] == pytest.approx(1.0)
+    assert (scores[3:, 0] < 0.99).all()
+    _, ids = snapshot.search(old_p0, 3, paper_ids={"P1"})
+    assert {c["paperId"] for c in snapshot.lookup(ids.ravel())} == {"P1"}
+
+    # passing HNSW_MAX_REMOVED rebuilds the graph from the live rows
+    with manager.update("papers") as writer:
+        writer.remove_papers(papers[1:5])
+    snapshot = manager.get("papers")
+    assert snapshot.deleted is None and ann.index_kind(snapshot.index) == "hnsw"
+    assert snapshot.index.ntotal == snapshot.ntotal == 18
+    assert snapshot.paper_ids() == {"P0", *papers[5:]}
@@ -0,0 +1,58 @@
+import os
+import threading
+
+import config
+import offline
+from rag.pipelines import jobs
+from rag.pipelines.jobs import FullTextJob
+
+PAPERS = [{"paperId": "P1", "title": "One", "pdf_url": "http://127.0.0.1:9/p1.pdf"}]
+
+
+def test_download_errors_fail_the_job(sandbox, monkeypatch):
+    def broken(papers, save_dir, on_done=None, cancel=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(jobs, "download_papers", broken)
+    job = FullTextJob(PAPERS, query=None).start()
+
+    assert job.join(timeout=30) == "failed"
+    assert isinstance(job.error, OSError)
+
+
+def test_cancel_reaches_the_downloads(sandbox, monkeypatch):
+    started = threading.Event()
+    stopped = []
+
+    def waiting(papers, save_dir, on_done=None, cancel=None):
+        started.set()
+        stopped.append(cancel.wait(timeout=30))
+        return []
+
+    monkeypatch.setattr(jobs, "download_papers", waiting)
+    job = FullTextJob(PAPERS, query=None).start()
+    assert started.wait(timeout=30)
+    job.cancel()
+
+    assert job.join(timeout=30) == "cancelled"
+    assert stopped == [True]
+
+
+def test_extraction_is_traced(sandbox, monkeypatch):
+    def write(papers, save_dir, on_done=None, cancel=None):
+        for paper in papers:
+            path = os.path.join(save_dir, f"{paper['paperId']}.pdf")
+            offline.write_pdf(path, "Proteins fold into shapes. " * 200)
+            on_done(paper, True)
+        return papers
+
+    monkeypatch.setattr(jobs, "download_papers", write)
+    os.makedirs(config.PDF_DIR, exist_ok=True)
+    job = FullTextJob(PAPERS, query=None, trace_enabled=True).start()
+
+    assert job.join(timeout=60) == "done"
+    steps = [s for s in job.trace["spans"] if s["name"] == "extract_text_from_pdf"]
+    assert sum(s["items"] or 0 for s in steps) == 1
+    assert sum(s["bytes"] or 0 for s in steps) == os.path.getsize(
+        os.path.join(config.PDF_DIR, "P1.pdf")
+    )
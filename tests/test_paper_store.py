@@ -0,0 +1,42 @@
+import multiprocessing
+import threading
+
+from rag.io.paper_store import PaperStore
+
+
+def test_concurrent_upserts_keep_every_paper(tmp_path):
+    path = str(tmp_path / "papers.json")
+    start = threading.Barrier(8)
+
+    def worker(n):
+        # one store per thread, like separate processes sharing the file
+        store = PaperStore(path)
+        start.wait()
+        for i in range(10):
+            store.upsert([{"paperId": f"{n}-{i}", "title": "t"}])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(PaperStore(path)) == 80
+
+
+def _upsert_from_process(path, n):
+    store = PaperStore(path)
+    for i in range(10):
+        store.upsert([{"paperId": f"{n}-{i}", "title": "t"}])
+
+
+def test_upserts_from_several_processes(tmp_path):
+    path = str(tmp_path / "papers.json")
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_upsert_from_process, args=(path, n)) for n in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    assert len(PaperStore(path)) == 40
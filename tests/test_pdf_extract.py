@@ -0,0 +1,29 @@
+import os
+import threading
+
+from rag.io import pdf_extract
+
+
+def test_threads_caching_the_same_text_do_not_clash(sandbox):
+    errors = []
+    start = threading.Barrier(8)
+
+    def worker():
+        start.wait()
+        try:
+            for _ in range(50):
+                pdf_extract._write_cache("ab" * 32, "extracted text")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert pdf_extract._read_cache("ab" * 32) == "extracted text"
+    assert os.listdir(os.path.dirname(pdf_extract._cache_path("ab" * 32))) == [
+        os.path.basename(pdf_extract._cache_path("ab" * 32))
+    ]
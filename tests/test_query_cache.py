@@ -0,0 +1,87 @@
+import os
+import threading
+
+import numpy as np
+
+import config
+from rag.index import query_cache, rerank_cache, retrieval
+from rag.index.query_cache import QueryEmbeddingCache
+from rag.index.retrieval import encode_queries, rerank
+
+
+def test_concurrent_saves_leave_one_loadable_file(tmp_path):
+    path = str(tmp_path / "query_cache.npz")
+    cache = QueryEmbeddingCache(path=path)
+    errors = []
+    start = threading.Barrier(16)
+
+    def worker(n):
+        start.wait()
+        try:
+            for i in range(20):
+                cache.put("m", f"query {n} {i}", np.full(4, n, dtype="float32"))
+                cache.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == ["query_cache.npz"]
+    assert len(QueryEmbeddingCache(path=path)) == 16 * 20
+
+
+def test_encode_queries_saves_in_the_background(sandbox, monkeypatch):
+    path = str(sandbox / "query_cache.npz")
+    monkeypatch.setattr(config, "QUERY_CACHE", True)
+    monkeypatch.setattr(config, "QUERY_CACHE_FILE", path)
+    monkeypatch.setattr(config, "QUERY_CACHE_SAVE_EVERY", 3)
+
+    encode_queries(["alpha", "beta"])
+    cache = query_cache.get_query_cache()
+    assert not os.path.exists(path)
+
+    encode_queries(["gamma"])
+    for _ in range(100):
+        if not cache._saving and os.path.exists(path):
+            break
+        threading.Event().wait(0.02)
+    assert len(QueryEmbeddingCache(path=path)) == 3
+
+
+def test_switching_backend_misses_the_query_and_rerank_caches(sandbox, monkeypatch):
+    monkeypatch.setattr(config, "QUERY_CACHE", True)
+    monkeypatch.setattr(config, "RERANK_CACHE", True)
+    pairs = [["folding", "Proteins fold."]]
+
+    encode_queries(["folding"])
+    rerank(pairs)
+    monkeypatch.setattr(config, "INFERENCE_BACKEND", "onnx")
+    encode_queries(["folding"])
+    rerank(pairs)
+
+    assert query_cache.get_query_cache().hits == 0
+    assert rerank_cache.get_rerank_cache().hit_rate() == 0.0
+
+
+def test_queries_are_encoded_as_typed(sandbox, monkeypatch):
+    monkeypatch.setattr(config, "QUERY_CACHE", True)
+    embedder = retrieval.get_embedder()
+    encoded = []
+
+    class Recording:
+        def encode(self, texts, **kwargs):
+            encoded.extend(texts)
+            return embedder.encode(texts, **kwargs)
+
+    monkeypatch.setattr(retrieval, "get_embedder", Recording)
+
+    encode_queries(["BRCA1  Mutations"])
+    encode_queries(["brca1 mutations"])
+
+    # case is kept for the model; only the cache key is normalized
+    assert encoded == ["BRCA1  Mutations"]
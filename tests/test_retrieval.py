@@ -0,0 +1,118 @@
+import threading
+
+import numpy as np
+
+import config
+from rag.index import retrieval
+from rag.index.retrieval import (
+    fuse_hybrid,
+    merge_candidates,
+    prune_candidates,
+    rerank,
+    rerank_candidates,
+    rerank_stats,
+)
+from rag.tracing import span, trace
+
+
+def chunks(paper_ids):
+    return [{"paperId": pid, "chunk_id": 0, "text": pid} for pid in paper_ids]
+
+
+def test_fan_out_keeps_keyword_hits_by_fused_rank():
+    # shard a: "kw" is BM25-only, fused to the top with the floor dense score
+    ids, scores = fuse_hybrid(
+        np.array([1, 2, 3]), np.array([0.5, 0.45, 0.4]), np.array([9, 9, 9]), 3
+    )
+    assert ids.tolist()[0] == 9 and scores[0] == np.float32(0.4)
+    shard_a = (chunks(["kw", "a1", "a2"]), [scores])
+    shard_b = (chunks(["b1", "b2", "b3"]), [np.array([0.9, 0.8, 0.7])])
+
+    candidates, bi_scores = merge_candidates(
+        [("a", [shard_a[0]], shard_a[1]), ("b", [shard_b[0]], shard_b[1])],
+        top_k_raw=4,
+        by_rank=True,
+    )
+
+    assert [c["paperId"] for c in candidates[0]] == ["kw", "b1", "a1", "b2"]
+    assert [c["collection"] for c in candidates[0]] == ["a", "b", "a", "b"]
+    assert bi_scores[0].tolist() == np.float32([0.4, 0.9, 0.5, 0.8]).tolist()
+
+
+def test_dense_only_fan_out_merges_by_score():
+    shards = [
+        ("a", [chunks(["a1", "a2"])], [np.array([0.5, 0.3])]),
+        ("b", [chunks(["b1", "a1"])], [np.array([0.9, 0.5])]),
+    ]
+    candidates, bi_scores = merge_candidates(shards, top_k_raw=3, by_rank=False)
+
+    assert [c["paperId"] for c in candidates[0]] == ["b1", "a1", "a2"]
+    assert bi_scores[0].tolist() == np.float32([0.9, 0.5, 0.3]).tolist()
+
+
+def test_chunk_in_several_collections_is_kept_once():
+    shards = [
+        ("a", [chunks(["x", "a1"])], [np.array([0.5, 0.4])]),
+        ("b", [chunks(["b1", "x"])], [np.array([0.6, 0.5])]),
+    ]
+    candidates, _ = merge_candidates(shards, top_k_raw=3, by_rank=True)
+
+    # x is in both rankings, so it fuses above the shard leaders
+    assert [c["paperId"] for c in candidates[0]] == ["x", "b1", "a1"]
+    assert candidates[0][0]["collection"] == "a"
+
+
+def test_pruning_is_relative_to_the_best_bi_score(monkeypatch):
+    monkeypatch.setattr(config, "RERANK_MIN_CANDIDATES", 2)
+    monkeypatch.setattr(config, "RERANK_MARGIN", 0.15)
+    # fused order: the first candidate is not the best by bi-encoder score
+    bi_scores = np.array([0.2, 0.9, 0.85, 0.3, 0.1], dtype="float32")
+
+    assert prune_candidates(bi_scores, top_k_final=1) == 2
+
+
+def test_adaptive_rerank_visits_candidates_by_bi_score(monkeypatch):
+    monkeypatch.setattr(config, "RERANK_MIN_CANDIDATES", 2)
+    monkeypatch.setattr(config, "RERANK_MARGIN", 0.15)
+    monkeypatch.setattr(config, "RERANK_STEP", 1)
+    scored = []
+
+    def fake_rerank(pairs):
+        scored.extend(text for _, text in pairs)
+        return np.array([float(text[1:]) for _, text in pairs], dtype="float32")
+
+    monkeypatch.setattr(retrieval, "rerank", fake_rerank)
+    candidates = [[{"text": t} for t in ["c1", "c2", "c3", "c4", "c5"]]]
+    bi_scores = [np.array([0.2, 0.9, 0.85, 0.3, 0.1], dtype="float32")]
+
+    (scores,) = rerank_candidates(["q"], candidates, bi_scores, 1, adaptive=True)
+
+    assert scored == ["c2", "c3"]
+    assert scores.tolist() == [-np.inf, 2.0, 3.0, -np.inf, -np.inf]
+
+
+def test_rerank_counters_add_up_across_threads(sandbox):
+    before = rerank_stats()["pairs"]
+    start = threading.Barrier(8)
+
+    def worker(n):
+        start.wait()
+        for i in range(50):
+            rerank([[f"q{n}", f"passage {i}"], [f"q{n}", "other"]])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert rerank_stats()["pairs"] - before == 8 * 50 * 2
+
+
+def test_spans_take_attributes_known_at_the_end(sandbox):
+    with trace("search", enabled=True) as t:
+        with span("rerank_candidates") as s:
+            s.annotate(scored=3, cached=1)
+
+    (record,) = [r for r in t.record["spans"] if r["name"] == "rerank_candidates"]
+    assert record["scored"] == 3 and record["cached"] == 1
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+import requests
+
+from service import main
+
+
+@pytest.fixture
+def service(sandbox, monkeypatch):
+    calls = []
+
+    def fake_search(index_name, queries, top_k_raw, top_k_final, paper_ids, collection):
+        calls.append((index_name, list(queries), top_k_raw, top_k_final, paper_ids))
+        if "explode" in queries:
+            raise ValueError("cannot search for that")
+        return [[{"paperId": q}] for q in queries]
+
+    monkeypatch.setattr(main, "search_batch", fake_search)
+    server = main.make_server("127.0.0.1", 0, batch_size=8, batch_wait=0.01)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield base, calls
+    server.shutdown()
+    server.server_close()
+
+
+def post(base, path, body):
+    return requests.post(base + path, json=body, timeout=10)
+
+
+def test_search(service):
+    base, calls = service
+    response = post(base, "/search", {"query": "q", "paper_ids": "P1", "top_k_final": 3})
+
+    assert response.status_code == 200
+    assert response.json() == {"results": [{"paperId": "q"}]}
+    assert calls == [("papers", ["q"], 20, 3, ["P1"])]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"query": ""},
+        {"query": "q", "index": "nope"},
+        {"query": "q", "paper_ids": [1, 2]},
+        {"query": "q", "collection": {"name": "x"}},
+        {"query": "q", "top_k_raw": 0},
+        {"query": "q", "top_k_final": -1},
+        {"query": "q", "top_k_final": "5"},
+    ],
+)
+def test_bad_search_requests(service, body):
+    base, calls = service
+    assert post(base, "/search", body).status_code == 400
+    assert calls == []
+
+
+@pytest.mark.parametrize(
+    "body",
+    [{}, {"paper_ids": 5}, {"paper_ids": ["P1", None]}, {"paper_ids": [], "collection": 1}],
+)
+def test_bad_index_requests(service, body):
+    base, _ = service
+    assert post(base, "/index", body).status_code == 400
+
+
+def test_search_errors_are_bad_requests_and_the_service_keeps_going(service):
+    base, _ = service
+    response = post(base, "/search", {"query": "explode"})
+
+    assert response.status_code == 400
+    assert "cannot search for that" in response.json()["error"]
+    assert post(base, "/search", {"query": "fine"}).status_code == 200
+    assert requests.get(base + "/health", timeout=10).json()["batching"]["batches"] == 2
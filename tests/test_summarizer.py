@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+
+import config
+from offline import StandInLLM
+from rag.pipelines.summarizer import stream_summary, summarize_papers_async
+
+pytest.importorskip("openai")
+
+
+class RecordingLLM(StandInLLM):
+    """StandInLLM that records prompts; map prompts of `slow` papers lag."""
+
+    def __init__(self, slow=(), **kwargs):
+        super().__init__(**kwargs)
+        self.slow = slow
+        self.prompts = []
+
+    def reply(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        if any(f"Paper ID: {pid}\n" in prompt for pid in self.slow) and (
+            "summaries of several" not in prompt
+        ):
+            time.sleep(0.3)
+        return super().reply(prompt)
+
+
+def paper(pid):
+    return {
+        "paperId": pid,
+        "title": f"Title {pid}",
+        "score": 1.0,
+        "chunk_ids": [0],
+        "chunk_texts": [f"Passage of {pid} about protein folding. " * 5 + f"END{pid}"],
+    }
+
+
+@pytest.fixture
+def llm(sandbox, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    config.SUMMARY_CACHE = True
+    server = RecordingLLM(slow=["P1"], latency=0.01, token_delay=0).start()
+    config.OPENAI_BASE_URL = server.base_url
+    yield server
+    server.stop()
+
+
+def summarize(results, query, on_token=None):
+    return asyncio.run(summarize_papers_async(results, query, on_token))
+
+
+def test_reduce_keeps_the_order_of_the_results(llm):
+    results = [paper("P1"), paper("P2"), paper("P3")]
+    summarize(results, "folding")
+
+    # P1's summary arrives last but is still listed first
+    reduce_prompt = llm.prompts[-1]
+    assert len(llm.prompts) == 4 and "summaries of several" in reduce_prompt
+    positions = [reduce_prompt.index(f"Paper ID: P{i}\n") for i in (1, 2, 3)]
+    assert positions == sorted(positions)
+    for i in (1, 2, 3):
+        # each paper's map summary (the tail of its prompt) follows its header
+        block = reduce_prompt[positions[i - 1] :].split("---")[0]
+        assert f"ENDP{i}" in block
+
+
+def test_final_answer_is_streamed(llm):
+    tokens = []
+    text = summarize([paper("P1"), paper("P2")], "folding", tokens.append)
+
+    assert len(tokens) > 1 and "".join(tokens) == text
+    assert "".join(stream_summary([paper("P3")], "folding")) != ""
+
+
+def test_cached_responses_are_reused(llm):
+    first = summarize([paper("P1"), paper("P2")], "folding")
+    assert llm.requests == 3
+
+    tokens = []
+    assert summarize([paper("P1"), paper("P2")], "folding", tokens.append) == first
+    assert llm.requests == 3
+    assert tokens == [first]
+
+
+def test_cache_misses_when_the_prompt_or_model_changes(llm):
+    summarize([paper("P1"), paper("P2")], "folding")
+    assert llm.requests == 3
+
+    # a new query changes every prompt
+    summarize([paper("P1"), paper("P2")], "misfolding")
+    assert llm.requests == 6
+
+    # a new paper adds one map request and changes the reduce prompt
+    summarize([paper("P1"), paper("P2"), paper("P3")], "folding")
+    assert llm.requests == 8
+
+    config.OPENAI_MODEL_NAME = "another-model"
+    summarize([paper("P1"), paper("P2")], "folding")
+    assert llm.requests == 11
@@ -0,0 +1,20 @@
+import config
+from rag.io.text_utils import chunk_text, chunk_texts, token_offsets
+
+TEXT = " ".join(f"w{i}" for i in range(20))
+
+
+def test_chunk_text_keeps_positional_word_windows():
+    chunks = chunk_text(TEXT, 8, 2)
+
+    assert [len(c.split()) for c in chunks] == [8, 8, 8]
+    assert chunks[0].split()[-2:] == chunks[1].split()[:2]
+    assert chunks[-1].endswith("w19")
+
+
+def test_chunk_texts_counts_model_tokens(sandbox):
+    text = "Proteins fold into stable structures. " * 40
+    (chunks,) = chunk_texts([text], sentences=False)
+
+    assert len(chunks) > 1
+    assert max(len(o) for o in token_offsets(chunks)) <= config.CHUNK_MAX_TOKENS